@@ -1,9 +1,29 @@
-from flask import Flask, jsonify, render_template, request
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import Flask, Response, jsonify, render_template, request
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import func, make_url, select, text
+
+from db.storage import READER_POOL_SIZE, connect_reader
 
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:////db/scrahp.db"
+# The database mounted by docker-compose, overridable to serve another one (benchmarks, local runs)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("SCRAHP_DATABASE_URI", "sqlite:////db/scrahp.db")
+DATABASE_FILE = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).database
+# The API never writes: a pool of read-only connections, tuned for reading while the crawlers commit
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"creator": lambda: connect_reader(DATABASE_FILE), "pool_size": READER_POOL_SIZE}
+# Total size in bytes of the responses kept by the response cache, 0 to disable it
+app.config["RESPONSE_CACHE_BYTES"] = int(os.environ.get("SCRAHP_RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Seconds between two reads of the database version: cached responses may lag a commit by as much
+app.config["RESPONSE_CACHE_CHECK_INTERVAL"] = float(os.environ.get("SCRAHP_RESPONSE_CACHE_CHECK_INTERVAL", "0.1"))
 db = SQLAlchemy(app)
 
 
@@ -12,18 +32,203 @@ class Articles(db.Model):
     Represents an article record in the database.
 
     Attributes:
+        id (int): Stable id of the article, referred to by the full-text search index and the export cursors.
         url (str): Unique URL of the article, serving as the primary key.
         title (str): Title of the article.
         author (str): Author of the article.
         content (str): Content of the article.
     """
 
+    id = db.Column(db.Integer, unique=True, nullable=False)
     url = db.Column(db.String(255), unique=True, nullable=False, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     author = db.Column(db.String(255), nullable=False)
     content = db.Column(db.String(), nullable=False)
 
 
+class Authors(db.Model):
+    """
+    Represents the number of articles of an author, maintained by the triggers created by db/db_service.py.
+
+    Attributes:
+        name (str): Name of the author, serving as the primary key.
+        article_count (int): Number of articles of the author.
+    """
+
+    name = db.Column(db.String(255), primary_key=True)
+    article_count = db.Column(db.Integer, nullable=False, index=True)
+
+
+class AuthorDays(db.Model):
+    """
+    Represents the number of articles of an author stored on a given day (UTC).
+
+    Attributes:
+        day (str): The day, as YYYY-MM-DD.
+        name (str): Name of the author.
+        article_count (int): Number of articles of the author stored that day.
+    """
+
+    __tablename__ = "author_days"
+    day = db.Column(db.String(10), primary_key=True)
+    name = db.Column(db.String(255), primary_key=True)
+    article_count = db.Column(db.Integer, nullable=False)
+
+
+# Smallest cached body worth compressing
+GZIP_MIN_SIZE = 1024
+
+
+class ResponseCache:
+    """
+    LRU cache of the serialized responses of the read endpoints, valid until the database changes.
+
+    The version of the database is its 'PRAGMA data_version', read on a dedicated connection
+    which never writes: it changes whenever a crawler commits new articles, and every response
+    cached before is then stale. The version is read by a single request at most once per check
+    interval, the other requests use the last version read without waiting for it, so that the
+    requests served by the pooled connections are never serialized on the dedicated one.
+
+    Bodies are stored with their gzip compression and a strong ETag, the least recently used
+    ones are evicted beyond the maximum total size of the cache.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty cache, the connection is opened on the first request.
+        """
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        self.version_lock = threading.Lock()
+        self.current_version = None
+        self.checked_at = 0.0
+
+    def version(self, interval):
+        """
+        Get the version of the database, read again once the check interval has elapsed.
+
+        Args:
+            interval (float): Seconds during which the last version read is used.
+
+        Returns:
+            int: The data version of the dedicated connection.
+        """
+        if self.current_version is not None and time.monotonic() - self.checked_at < interval:
+            return self.current_version
+        # Only the first request reads it, the others keep the last version meanwhile
+        if not self.version_lock.acquire(blocking=self.current_version is None):
+            return self.current_version
+        try:
+            if self.connection is None:
+                self.connection = connect_reader(DATABASE_FILE)
+            self.current_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+            self.checked_at = time.monotonic()
+            return self.current_version
+        finally:
+            self.version_lock.release()
+
+    def get(self, key, version):
+        """
+        Get a cached response of the current version of the database.
+
+        Args:
+            key (str): The path and query string of the request.
+            version (int): The version of the database.
+
+        Returns:
+            dict: The cached body, compressed body and ETag, or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry["version"] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, body, max_bytes):
+        """
+        Cache a response body, evicting the least recently used ones beyond the size of the cache.
+
+        Args:
+            key (str): The path and query string of the request.
+            version (int): The version of the database the body was read from.
+            body (bytes): The JSON body.
+            max_bytes (int): Maximum total size of the cached bodies.
+
+        Returns:
+            dict: The entry, which is not cached when it is larger than the cache.
+        """
+        compressed = gzip.compress(body, 6) if len(body) >= GZIP_MIN_SIZE else None
+        entry = {
+            "version": version,
+            "body": body,
+            "gzip": compressed,
+            "etag": hashlib.blake2b(body, digest_size=16).hexdigest(),
+            "size": len(body) + len(compressed or b""),
+        }
+        if entry["size"] > max_bytes:
+            return entry
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous["size"]
+            self.entries[key] = entry
+            self.size += entry["size"]
+            while self.size > max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted["size"]
+        return entry
+
+
+response_cache = ResponseCache()
+
+
+def cached(view):
+    """
+    Serve the successful responses of a read endpoint from the response cache.
+
+    Responses carry a strong ETag and requests whose If-None-Match matches it are
+    answered with an empty 304. Clients polling the endpoints thus only get a body,
+    and the database is only queried, when a crawl committed new articles.
+
+    Args:
+        view (function): The view, returning a JSON response.
+
+    Returns:
+        function: The cached view.
+    """
+
+    @functools.wraps(view)
+    def cached_view(*args, **kwargs):
+        max_bytes = app.config["RESPONSE_CACHE_BYTES"]
+        if not max_bytes:
+            return view(*args, **kwargs)
+        key = request.full_path
+        # The version is read before the query, a commit in between only makes the entry stale sooner
+        version = response_cache.version(app.config["RESPONSE_CACHE_CHECK_INTERVAL"])
+        entry = response_cache.get(key, version)
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = response_cache.put(key, version, response.get_data(), max_bytes)
+
+        compressed = entry["gzip"] is not None and "gzip" in request.headers.get("Accept-Encoding", "")
+        response = Response(entry["gzip"] if compressed else entry["body"], mimetype="application/json")
+        # Both encodings of a body are different representations, with different strong ETags
+        response.set_etag(entry["etag"] + ("-gzip" if compressed else ""))
+        if compressed:
+            response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+        # Clients may keep the response but must revalidate it, which costs a 304
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    return cached_view
+
+
 @app.route("/", methods=["GET"])
 def home():
     """
@@ -35,47 +240,324 @@ def home():
     return render_template("landing_page.html")
 
 
+# Page size of /articles, when no limit is given, and largest accepted limit
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Number of authors returned by /top_authors when no limit is given
+DEFAULT_TOP_AUTHORS = 5
+# Largest number of URLs of a /articles/batch request, and number of URLs looked up per IN query
+MAX_BATCH_URLS = 1000
+BATCH_CHUNK_SIZE = 500
+ARTICLE_FIELDS = ("url", "title", "author", "content")
+# Rows fetched from the database cursor and sent to the client at once by /export
+EXPORT_CHUNK_SIZE = 1000
+# Number of tokens of the content excerpts returned by /search
+SNIPPET_TOKENS = 24
+# Results of /search, best ranked first. articles_search is the full-text index created by db/db_service.py,
+# 'rank' is its BM25 score weighted by column (lower is better), the articles are only read for the returned rows.
+SEARCH_QUERY = text(
+    "SELECT articles.url, articles.title, articles.author, "
+    f"snippet(articles_search, 2, '<b>', '</b>', '...', {SNIPPET_TOKENS}) AS snippet, articles_search.rank AS score "
+    "FROM articles_search JOIN articles ON articles.id = articles_search.rowid "
+    "WHERE articles_search MATCH :query ORDER BY articles_search.rank LIMIT :limit OFFSET :offset"
+)
+
+
+def parse_fields(value):
+    """
+    Parse the comma separated list of fields of the 'fields' parameter.
+
+    Args:
+        value (str): The parameter, or None for every field.
+
+    Returns:
+        list: The requested fields, always starting with url which identifies the article and serves as cursor.
+
+    Raises:
+        ValueError: If a field is not an article field.
+    """
+    if not value:
+        return list(ARTICLE_FIELDS)
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in ARTICLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}, expected some of {', '.join(ARTICLE_FIELDS)}")
+    return ["url"] + [field for field in fields if field != "url"]
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE):
+    """
+    Parse the 'limit' parameter.
+
+    Args:
+        value (str): The parameter, or None for the default.
+        default (int): The limit when none is given.
+
+    Returns:
+        int: The number of articles of the page.
+
+    Raises:
+        ValueError: If the limit is not an integer between 1 and MAX_PAGE_SIZE.
+    """
+    if value is None:
+        return default
+    if not value.isdigit() or not 1 <= int(value) <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+    return int(value)
+
+
+def parse_query(value):
+    """
+    Turn the 'q' parameter into a full-text query matching every one of its words.
+
+    Every word is quoted so that punctuation (e.g. "U.S.") is never taken for the query syntax,
+    a trailing '*' is kept to match the words starting with it (e.g. elect*).
+
+    Args:
+        value (str): The parameter.
+
+    Returns:
+        str: The FTS5 query.
+
+    Raises:
+        ValueError: If the parameter holds no word.
+    """
+    terms = []
+    for word in (value or "").split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("q must hold the words to search for")
+    return " ".join(terms)
+
+
 @app.route("/articles", methods=["GET"])
+@cached
 def get_articles():
     """
     Retrieve articles from the database. Can choose to optionally filter by a specific URL.
 
+    A specific article is fetched by primary key. Otherwise the articles are listed
+    by pages of 'limit' articles in URL order: the 'next' value of a page is passed
+    as the 'after' parameter to get the next one, and is null on the last page.
+    Each page is a range scan of the primary key index, whatever its position.
+    The 'fields' parameter (e.g. fields=url,title,author) only reads the given columns.
+
     Returns:
-        json: A list of articles or a specific article if a URL parameter is provided.
+        json: A list of articles or a specific article if a URL parameter is provided, or an error with a 400 status.
     """
-    article_url = request.args.get("url")
-    articles = Articles.query.all()
+    try:
+        fields = parse_fields(request.args.get("fields"))
+        limit = parse_limit(request.args.get("limit"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    query = db.session.query(*[getattr(Articles, field) for field in fields])
 
     # Check if a specific article is asked for using an url
+    article_url = request.args.get("url")
     if article_url:
-        specific_article = [
-            {"url": article.url, "title": article.title, "author": article.author, "content": article.content}
-            for article in articles
-            if article.url == article_url
-        ]
-        return jsonify({"articles": specific_article})
-    else:
-        articles_list = [{"url": article.url, "title": article.title, "author": article.author, "content": article.content} for article in articles]
-        return jsonify({"articles": articles_list})
+        article = query.filter(Articles.url == article_url).first()
+        return jsonify({"articles": [dict(zip(fields, article))] if article is not None else []})
+
+    after = request.args.get("after")
+    if after:
+        query = query.filter(Articles.url > after)
+    # One more row tells whether there is a next page
+    rows = query.order_by(Articles.url).limit(limit + 1).all()
+    articles_list = [dict(zip(fields, row)) for row in rows[:limit]]
+    return jsonify({"articles": articles_list, "next": rows[limit - 1][0] if len(rows) > limit else None})
+
+
+@app.route("/articles/batch", methods=["POST"])
+def get_articles_batch():
+    """
+    Retrieve many articles by URL in a single request.
+
+    The body is a JSON object: {"urls": [...], "fields": "title,author"}, with up to
+    MAX_BATCH_URLS URLs, 'fields' being optional like for /articles. The URLs are looked
+    up on the primary key by chunks of BATCH_CHUNK_SIZE with IN queries, whatever their number.
+
+    Returns:
+        json: The articles found, in the order of the URLs, and the URLs which were not found, or an error with a 400 status.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": 'The body must be a JSON object such as {"urls": ["https://www.bbc.com/news/..."]}'}), 400
+    urls = body.get("urls")
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        return jsonify({"error": "urls must be a list of article URLs"}), 400
+    if len(urls) > MAX_BATCH_URLS:
+        return jsonify({"error": f"At most {MAX_BATCH_URLS} urls can be looked up at once"}), 400
+    fields = body.get("fields")
+    if isinstance(fields, list) and all(isinstance(field, str) for field in fields):
+        fields = ",".join(fields)
+    if fields is not None and not isinstance(fields, str):
+        return jsonify({"error": "fields must be a comma separated string or a list of fields"}), 400
+    try:
+        fields = parse_fields(fields)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    columns = [getattr(Articles, field) for field in fields]
+    unique_urls = list(dict.fromkeys(urls))
+    found = {}
+    for start in range(0, len(unique_urls), BATCH_CHUNK_SIZE):
+        chunk = unique_urls[start : start + BATCH_CHUNK_SIZE]
+        for row in db.session.query(*columns).filter(Articles.url.in_(chunk)):
+            found[row[0]] = dict(zip(fields, row))
+
+    return jsonify({"articles": [found[url] for url in urls if url in found], "missing": [url for url in unique_urls if url not in found]})
+
+
+def export_lines(engine, statement, fields):
+    """
+    Stream the rows of a query as JSON lines, fetching them from the cursor chunk by chunk.
+
+    Args:
+        engine (Engine): The engine of the database, the generator runs after the request context is gone.
+        statement (Select): The query, selecting the id then the fields.
+        fields (list): The names of the selected fields.
+
+    Yields:
+        bytes: The JSON lines of up to EXPORT_CHUNK_SIZE articles.
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(statement)
+        while True:
+            rows = result.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            lines = [json.dumps({"id": row[0], **dict(zip(fields, row[1:]))}) for row in rows]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """
+    Compress a stream of chunks into a single gzip stream, without buffering it.
+
+    Args:
+        chunks (iterable): The chunks to compress.
+
+    Yields:
+        bytes: The compressed chunks.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+@app.route("/export", methods=["GET"])
+def export_articles():
+    """
+    Export the articles as newline delimited JSON, streamed in insertion order.
+
+    Every line carries the 'id' of the article: passing the last one received as
+    the 'since' parameter resumes the export after it, e.g. to only fetch the
+    articles added since the previous export. Articles can be filtered by 'author'
+    and 'fields' restricts the exported fields. The response is gzip compressed
+    when the client accepts it. Memory stays constant whatever the size of the table.
+
+    Returns:
+        Response: The streamed articles, or an error with a 400 status.
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    since = request.args.get("since", "0")
+    if not since.isdigit():
+        return jsonify({"error": "since must be an id returned by a previous export"}), 400
+
+    columns = Articles.__table__.c
+    statement = select(columns.id, *[columns[field] for field in fields]).where(columns.id > int(since)).order_by(columns.id)
+    author = request.args.get("author")
+    if author:
+        statement = statement.where(Articles.author == author)
+
+    chunks = export_lines(db.engine, statement, fields)
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype="application/x-ndjson", headers=headers)
+
+
+@app.route("/search", methods=["GET"])
+@cached
+def search_articles():
+    """
+    Search the title, author and content of the articles for the words of the 'q' parameter.
+
+    Articles holding every word (or a form of it, e.g. "elections" for "election") are
+    ranked by BM25, best first, with an excerpt of their content around the matches.
+    Results are returned by pages of 'limit' articles: the 'next' value of a page is
+    passed as the 'offset' parameter to get the next one, and is null on the last page.
+
+    Returns:
+        json: The matching articles and their score, or an error with a 400 status.
+    """
+    try:
+        query = parse_query(request.args.get("q"))
+        limit = parse_limit(request.args.get("limit"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    offset = request.args.get("offset", "0")
+    if not offset.isdigit():
+        return jsonify({"error": "offset must be a non negative integer"}), 400
+
+    # One more row tells whether there is a next page
+    rows = db.session.execute(SEARCH_QUERY, {"query": query, "limit": limit + 1, "offset": int(offset)}).all()
+    results = [dict(row._mapping) for row in rows[:limit]]
+    return jsonify({"articles": results, "next": int(offset) + limit if len(rows) > limit else None})
 
 
 @app.route("/top_authors", methods=["GET"])
+@cached
 def top_authors():
     """
     Retrieve the top authors based on the number of articles written.
 
+    The counts are read from the author statistics kept up to date as the articles are
+    written: the top 'limit' authors (5 by default) are the first entries of an index,
+    whatever the number of articles. With 'days', only the articles stored during the
+    last 'days' days (UTC, today included) are counted.
+
     Returns:
-        json: A list of top authors and their article count, excluding 'n/a'.
+        json: A list of top authors and their article count, excluding 'n/a', or an error with a 400 status.
     """
+    try:
+        limit = parse_limit(request.args.get("limit"), DEFAULT_TOP_AUTHORS)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    days = request.args.get("days")
+    if days is not None and (not days.isdigit() or int(days) < 1):
+        return jsonify({"error": "days must be a positive integer"}), 400
+
     # Exclude authors with the value "n/a"
-    top_authors = (
-        db.session.query(Articles.author, func.count(Articles.author).label("article_count"))
-        .filter(Articles.author != "n/a")
-        .group_by(Articles.author)
-        .order_by(func.count(Articles.author).desc())
-        .limit(5)
-        .all()
-    )
+    if days is None:
+        top_authors = (
+            db.session.query(Authors.name, Authors.article_count)
+            .filter(Authors.name != "n/a")
+            .order_by(Authors.article_count.desc())
+            .limit(limit)
+            .all()
+        )
+    else:
+        article_count = func.sum(AuthorDays.article_count).label("article_count")
+        top_authors = (
+            db.session.query(AuthorDays.name, article_count)
+            .filter(AuthorDays.day >= func.date("now", f"-{int(days) - 1} days"), AuthorDays.name != "n/a")
+            .group_by(AuthorDays.name)
+            .order_by(article_count.desc())
+            .limit(limit)
+            .all()
+        )
 
     result = [{"author": author, "article_count": article_count} for author, article_count in top_authors]
     return jsonify({"top_authors": result})
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks of the spiders, the pipelines and the API.
+
+Run with ``python -m benchmarks.run``, see its ``--help``.
+"""
@@ -0,0 +1,278 @@
+"""
+Concurrent read/write benchmark of the articles database.
+
+A writer process inserts articles in batches, like the SQLiteBatchWriter of a
+crawl, while reader processes run the queries of the API endpoints (lookup by
+URL, keyset page, top authors) on the same database. Both storage profiles are
+measured on a copy of the same synthetic database:
+
+    - default: rollback journal and default pragmas, how the database was opened
+      before db.storage
+    - tuned: WAL mode, the writer and read-only reader pragmas of db.storage
+
+and the write throughput, the read throughput and the read latency of every
+profile are reported, and compared with a baseline like the other benchmarks.
+
+Usage:
+    python -m benchmarks.concurrency [--articles 100000] [--readers 4] [--duration 10]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.corpus import article_url
+from benchmarks.database import build_database, synthetic_rows
+from benchmarks.run import Result, compare, result
+from db.storage import connect_reader, connect_writer
+from scrahp.autotune import percentile
+from scrahp.writers import INSERT_ARTICLE
+
+logger = logging.getLogger(__name__)
+
+# Queries of the /articles lookup, /articles page and /top_authors endpoints
+LOOKUP_QUERY = "SELECT url, title, author, content FROM articles WHERE url = ?"
+PAGE_QUERY = "SELECT url, title, author, content FROM articles WHERE url > ? ORDER BY url LIMIT 100"
+TOP_AUTHORS_QUERY = "SELECT name, article_count FROM authors WHERE name != 'n/a' ORDER BY article_count DESC LIMIT 5"
+
+PROFILES = ("default", "tuned")
+
+
+def connect(profile: str, path: str, writer: bool) -> sqlite3.Connection:
+    """
+    Open a connection of a storage profile.
+
+    Args:
+        profile (str): Either "default" or "tuned".
+        path (str): The path of the database.
+        writer (bool): Whether the connection writes the articles.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    if profile == "default":
+        return sqlite3.connect(path)
+    return connect_writer(path) if writer else connect_reader(path)
+
+
+def prepare_database(source: str, path: str, profile: str) -> None:
+    """
+    Copy the synthetic database and set the journal mode of a profile, which is stored in the database.
+
+    Args:
+        source (str): The path of the synthetic database.
+        path (str): The path of the copy.
+        profile (str): Either "default" or "tuned".
+    """
+    with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+        src.backup(dst)
+        dst.execute(f"PRAGMA journal_mode={'DELETE' if profile == 'default' else 'WAL'}").fetchall()
+
+
+def write_articles(profile: str, path: str, articles: int, batch_size: int, interval: float, start: Any, stop: Any, results: Any) -> None:
+    """
+    Insert new articles in batches until stopped, in a process of its own.
+
+    Args:
+        profile (str): Either "default" or "tuned".
+        path (str): The path of the database.
+        articles (int): Number of articles already in the database, the new ones follow them.
+        batch_size (int): Number of articles inserted per transaction.
+        interval (float): Pause between the transactions, in seconds.
+        start (Any): Event set when every process should start.
+        stop (Any): Event set when every process should stop.
+        results (Any): Queue receiving the number of rows written and of lock errors.
+    """
+    conn = connect(profile, path, writer=True)
+    rows = synthetic_rows(10_000_000, seed=1, start=articles)
+    written = errors = 0
+    start.wait()
+    while not stop.is_set():
+        batch = [next(rows) for _ in range(batch_size)]
+        try:
+            with conn:
+                conn.executemany(INSERT_ARTICLE, batch)
+            written += len(batch)
+        except sqlite3.OperationalError:
+            # "database is locked" once the busy timeout expired
+            errors += 1
+        if interval:
+            time.sleep(interval)
+    conn.close()
+    results.put({"role": "writer", "rows": written, "errors": errors})
+
+
+def read_articles(profile: str, path: str, articles: int, seed: int, start: Any, stop: Any, results: Any) -> None:
+    """
+    Run the queries of the API endpoints until stopped, in a process of its own.
+
+    Args:
+        profile (str): Either "default" or "tuned".
+        path (str): The path of the database.
+        articles (int): Number of articles of the synthetic database.
+        seed (int): Seed of the random generator picking the queries.
+        start (Any): Event set when every process should start.
+        stop (Any): Event set when every process should stop.
+        results (Any): Queue receiving the latencies of the queries and the number of lock errors.
+    """
+    conn = connect(profile, path, writer=False)
+    rng = random.Random(seed)
+    queries: List[Callable[[], Any]] = [
+        lambda: conn.execute(LOOKUP_QUERY, (article_url(rng.randrange(articles)),)).fetchall(),
+        lambda: conn.execute(PAGE_QUERY, (article_url(rng.randrange(articles)),)).fetchall(),
+        lambda: conn.execute(TOP_AUTHORS_QUERY).fetchall(),
+    ]
+    latencies: List[float] = []
+    errors = 0
+    start.wait()
+    while not stop.is_set():
+        query = rng.choice(queries)
+        begin = time.perf_counter()
+        try:
+            query()
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - begin)
+    conn.close()
+    results.put({"role": "reader", "latencies": latencies, "errors": errors})
+
+
+def run_profile(profile: str, source: str, args: argparse.Namespace) -> Dict[str, Result]:
+    """
+    Measure a storage profile: start the writer and the readers, let them run and collect their counts.
+
+    Args:
+        profile (str): Either "default" or "tuned".
+        source (str): The path of the synthetic database.
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Result]: The write and read throughputs, the read latencies and the lock errors of the profile.
+    """
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="scrahp-concurrency-") as directory:
+        path = os.path.join(directory, "scrahp.db")
+        prepare_database(source, path, profile)
+        start, stop, queue = context.Event(), context.Event(), context.Queue()
+        processes = [
+            context.Process(
+                target=write_articles,
+                args=(profile, path, args.articles, args.batch_size, args.write_interval, start, stop, queue),
+            )
+        ]
+        processes += [
+            context.Process(target=read_articles, args=(profile, path, args.articles, seed, start, stop, queue)) for seed in range(args.readers)
+        ]
+        for process in processes:
+            process.start()
+        # Let every process open its connection before the clock starts
+        time.sleep(1.0)
+        start.set()
+        time.sleep(args.duration)
+        stop.set()
+        reports = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    written = sum(report["rows"] for report in reports if report["role"] == "writer")
+    latencies = [latency for report in reports if report["role"] == "reader" for latency in report["latencies"]]
+    errors = sum(report["errors"] for report in reports)
+    return {
+        f"{profile}_write_rows_per_second": result(written / args.duration, "rows/s", True),
+        f"{profile}_read_queries_per_second": result(len(latencies) / args.duration, "queries/s", True),
+        f"{profile}_read_latency_p50": result(percentile(latencies, 0.5) * 1000, "ms", False),
+        f"{profile}_read_latency_p99": result(percentile(latencies, 0.99) * 1000, "ms", False),
+        f"{profile}_read_latency_max": result(max(latencies, default=0.0) * 1000, "ms", False),
+        f"{profile}_lock_errors": result(errors, "errors", False),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Build the synthetic database and measure every selected profile.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Any]: The environment of the run and the results of every profile.
+    """
+    elapsed = build_database(args.database, args.articles)
+    if elapsed:
+        logger.info("Built a database of %d articles in %.1fs", args.articles, elapsed)
+
+    results: Dict[str, Result] = {}
+    for profile in args.profiles.split(","):
+        logger.info("Measuring the %s profile for %.0fs", profile, args.duration)
+        results.update(run_profile(profile, args.database, args))
+
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "threshold")},
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse the command line, run the profiles and compare them with the baseline.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit code, 1 if a result regressed compared to the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark concurrent reads and writes of the articles database.")
+    parser.add_argument("--articles", type=int, default=100_000, help="number of articles of the synthetic database")
+    parser.add_argument(
+        "--database",
+        default=os.path.join(tempfile.gettempdir(), "scrahp-concurrency.db"),
+        help="path of the synthetic database, reused when its size matches",
+    )
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma separated storage profiles: default, tuned")
+    parser.add_argument("--readers", type=int, default=4, help="number of reader processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of every profile")
+    parser.add_argument("--batch-size", type=int, default=500, help="articles inserted per transaction")
+    parser.add_argument("--write-interval", type=float, default=0.0, help="pause of the writer between its transactions, in seconds")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change considered a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    report = run(args)
+    for name, value in report["results"].items():
+        logger.info("%-32s %12.3f %s", name, value["value"], value["unit"])
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(report["results"], baseline, args.threshold)
+        for regression in regressions:
+            logger.error("Regression: %s", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
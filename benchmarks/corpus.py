@@ -0,0 +1,194 @@
+"""
+Synthetic BBC-like pages used as benchmark fixtures.
+
+Article pages follow the layouts targeted by the author and content queries of
+ArticlesSpider, and are padded with navigation and script boilerplate to the size
+of a real page. Index pages hold ``a.gs-c-promo-heading`` links like the BBC news
+front page. Pages stored in a page archive by previous crawls can be used as well.
+"""
+
+import random
+from html import escape
+from typing import List, Optional, Tuple
+
+from scrahp.archive import PageArchiveReader
+
+BASE_URL = "https://www.bbc.com"
+
+WORDS: List[str] = (
+    "the government said on monday that talks would resume after officials from both sides met in the capital to discuss "
+    "a new agreement on trade energy prices and security while analysts warned that the economy could slow further this year "
+    "as inflation remains high and households face rising costs for food housing and transport across the country"
+).split()
+
+FIRST_NAMES: List[str] = ["James", "Sarah", "Mohamed", "Laura", "David", "Aisha", "Tom", "Emma", "Ravi", "Chloe", "Paul", "Nadia"]
+LAST_NAMES: List[str] = ["Smith", "Jones", "Khan", "Taylor", "Brown", "Williams", "Patel", "Wilson", "Evans", "Thomas", "Clarke", "Hughes"]
+
+# Layouts matched by the author and content queries of ArticlesSpider
+LAYOUTS: Tuple[str, ...] = ("rich_text", "author_unit", "qa_story", "article_wrapper")
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    """
+    Build a random sentence.
+
+    Args:
+        rng (random.Random): The random generator.
+        words (int): Number of words.
+
+    Returns:
+        str: The sentence, capitalized and ending with a period.
+    """
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + "."
+
+
+def author_name(rng: random.Random, authors: int = 500) -> str:
+    """
+    Pick an author, the first ones being much more frequent than the others like on a news site.
+
+    Args:
+        rng (random.Random): The random generator.
+        authors (int): Number of distinct authors.
+
+    Returns:
+        str: The name of the author.
+    """
+    index = min(int(rng.paretovariate(1.2)) - 1, authors - 1)
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    suffix = f" {index // (len(FIRST_NAMES) * len(LAST_NAMES))}" if index >= len(FIRST_NAMES) * len(LAST_NAMES) else ""
+    return f"{first} {last}{suffix}"
+
+
+def article_url(index: int) -> str:
+    """
+    Build the URL of a synthetic article.
+
+    Args:
+        index (int): The number of the article.
+
+    Returns:
+        str: The absolute URL of the article.
+    """
+    return f"{BASE_URL}/news/world-{60000000 + index}"
+
+
+def boilerplate(rng: random.Random, size: int) -> str:
+    """
+    Build navigation links and inline scripts of about the given size, ignored by the queries.
+
+    Args:
+        rng (random.Random): The random generator.
+        size (int): Number of characters to produce.
+
+    Returns:
+        str: The boilerplate HTML.
+    """
+    parts: List[str] = []
+    produced = 0
+    while produced < size:
+        part = (
+            f'<li class="ssrcss-1n7hynb-NavItem"><a href="/news/topics/c{rng.randrange(10**9)}">{rng.choice(WORDS)}</a></li>'
+            f'<script>window.__DATA__=window.__DATA__||[];window.__DATA__.push({{"id":{rng.randrange(10**9)}}});</script>'
+        )
+        parts.append(part)
+        produced += len(part)
+    return f'<nav><ul>{"".join(parts)}</ul></nav>'
+
+
+def render_article(index: int, rng: random.Random, layout: Optional[str] = None, paragraphs: int = 12, page_bytes: int = 150_000) -> str:
+    """
+    Render a synthetic article page.
+
+    Args:
+        index (int): The number of the article.
+        rng (random.Random): The random generator.
+        layout (Optional[str]): One of LAYOUTS, picked at random when None.
+        paragraphs (int): Number of paragraphs of the article.
+        page_bytes (int): Approximate size of the page, reached with boilerplate.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    layout = layout or rng.choice(LAYOUTS)
+    title = escape(sentence(rng, 8)[:-1])
+    author = escape(author_name(rng))
+    body = "".join(f"<p>{sentence(rng, rng.randint(10, 30))} {sentence(rng)}</p>" for _ in range(paragraphs))
+
+    if layout == "rich_text":
+        article = (
+            f'<article class="ssrcss-pv1rh6-ArticleWrapper"><h1>{title}</h1>'
+            f'<div class="ssrcss-68pt20-Text-TextContributorName">By {author}</div>'
+            f'<div class="ssrcss-11r1m41-RichTextComponentWrapper">{body}</div>'
+            f'<h2 class="ssrcss-y2fd7s-StyledHeading">{title}</h2></article>'
+        )
+    elif layout == "author_unit":
+        article = f'<h1>{title}</h1><div class="author-unit">{author}</div><div class="article__body-content">{body}</div>'
+    elif layout == "qa_story":
+        article = f'<h1>{title}</h1><div class="qa-contributor-name">{author}</div><div class="qa-story-body">{body}</div>'
+    else:
+        article = (
+            f'<article class="ssrcss-pv1rh6-ArticleWrapper"><h1>{title}</h1>'
+            f'<div class="ssrcss-h3c0s8-ContributorContainer">{author}</div>{body}</article>'
+        )
+
+    head = f'<head><title>{title}</title><link rel="canonical" href="{article_url(index)}"></head>'
+    padding = boilerplate(rng, max(page_bytes - len(head) - len(article), 0))
+    return f"<!DOCTYPE html><html>{head}<body>{padding}<main>{article}</main></body></html>"
+
+
+def render_index(links: List[Tuple[str, str]], page_bytes: int = 0, seed: int = 0) -> str:
+    """
+    Render an index page linking to articles.
+
+    Args:
+        links (List[Tuple[str, str]]): The (href, title) of every promoted article.
+        page_bytes (int): Approximate size of the page, reached with boilerplate.
+        seed (int): Seed of the boilerplate.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    promos = "".join(f'<a class="gs-c-promo-heading" href="{escape(href)}"><h3>{escape(title)}</h3></a>' for href, title in links)
+    padding = boilerplate(random.Random(seed), max(page_bytes - len(promos), 0))
+    return f"<!DOCTYPE html><html><body>{padding}<main>{promos}</main></body></html>"
+
+
+def synthetic_corpus(pages: int, page_bytes: int = 150_000, seed: int = 0) -> List[Tuple[str, bytes]]:
+    """
+    Build a corpus of synthetic article pages, the same for a given seed.
+
+    Args:
+        pages (int): Number of pages.
+        page_bytes (int): Approximate size of every page.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        List[Tuple[str, bytes]]: The (url, body) of every page.
+    """
+    rng = random.Random(seed)
+    return [(article_url(index), render_article(index, rng, page_bytes=page_bytes).encode("utf-8")) for index in range(pages)]
+
+
+def archived_corpus(directory: str, limit: int) -> List[Tuple[str, bytes]]:
+    """
+    Read pages stored by previous crawls in a page archive.
+
+    Args:
+        directory (str): The directory of the page archive.
+        limit (int): Maximum number of pages to read.
+
+    Returns:
+        List[Tuple[str, bytes]]: The (url, body) of every page.
+    """
+    reader = PageArchiveReader(directory)
+    try:
+        corpus: List[Tuple[str, bytes]] = []
+        for url, body in reader:
+            if len(corpus) >= limit:
+                break
+            corpus.append((url, body))
+        return corpus
+    finally:
+        reader.close()
@@ -0,0 +1,228 @@
+"""
+End-to-end crawl throughput harness against the local stand-in origin.
+
+Starts the synthetic site of benchmarks.origin, then runs the real ``urls`` and
+``articles`` spiders on it, each in its own process with the project settings,
+in a scratch directory. Reports, for every crawl, the pages/s and items/s, the
+p50/p99 item latency (from the request reaching the downloader to the item
+leaving the pipelines), the peak RSS of the crawl process, and the number of
+database rows written. Settings can be overridden to compare concurrency or
+pipeline changes, and the report is compared with a baseline like the offline
+benchmarks.
+
+Usage:
+    python -m benchmarks.crawl [--articles 2000] [--latency 0.05] [--error-rate 0.01] [-s CONCURRENT_REQUESTS=32]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from benchmarks.database import CREATE_ARTICLES
+from benchmarks.origin import OriginServer, start_origin
+from benchmarks.run import Result, compare, result
+from db.db_service import create_author_stats, create_search_index
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_workdir(directory: str) -> None:
+    """
+    Lay out a scratch project directory: scrapy.cfg, an empty database and the data directory.
+
+    Args:
+        directory (str): The scratch directory.
+    """
+    shutil.copy(os.path.join(ROOT_DIR, "scrapy.cfg"), directory)
+    os.makedirs(os.path.join(directory, "db"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+    with sqlite3.connect(os.path.join(directory, "db", "scrahp.db")) as conn:
+        conn.execute(CREATE_ARTICLES)
+        create_search_index(conn)
+        create_author_stats(conn)
+
+
+def run_spider(directory: str, spider: str, arguments: List[str], settings: List[str]) -> Dict[str, Any]:
+    """
+    Run a spider of the project in its own process and collect its metrics.
+
+    Args:
+        directory (str): The scratch directory, working directory of the crawl.
+        spider (str): The name of the spider.
+        arguments (List[str]): The spider arguments, as NAME=VALUE.
+        settings (List[str]): The settings overrides, as NAME=VALUE.
+
+    Returns:
+        Dict[str, Any]: The last metrics export of the crawl, its wall time and the peak RSS of the process.
+
+    Raises:
+        RuntimeError: If the crawl process failed.
+    """
+    metrics_file = os.path.join(directory, f"metrics-{spider}.jsonl")
+    command = [
+        sys.executable,
+        "-m",
+        "scrapy",
+        "crawl",
+        spider,
+        "-s",
+        "METRICS_FORMAT=jsonl",
+        "-s",
+        f"METRICS_FILE={metrics_file}",
+        "-s",
+        "LOG_LEVEL=INFO",
+    ]
+    for argument in arguments:
+        command += ["-a", argument]
+    for setting in settings:
+        command += ["-s", setting]
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get("PYTHONPATH")])))
+    with open(os.path.join(directory, f"{spider}.log"), "wb") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"The {spider} crawl failed, see {os.path.join(directory, f'{spider}.log')}")
+
+    with open(metrics_file) as file:
+        lines = file.read().splitlines()
+    metrics = json.loads(lines[-1])
+    # ru_maxrss is in kilobytes on Linux
+    metrics["peak_rss_mb"] = usage.ru_maxrss / 1024
+    metrics["wall_time"] = wall_time
+    return metrics
+
+
+def crawl_results(name: str, metrics: Dict[str, Any]) -> Dict[str, Result]:
+    """
+    Turn the metrics of a crawl into benchmark results.
+
+    Args:
+        name (str): The name of the crawl, prefixing the results.
+        metrics (Dict[str, Any]): The metrics returned by run_spider.
+
+    Returns:
+        Dict[str, Result]: The throughputs, item latencies and peak RSS of the crawl.
+    """
+    stats = metrics["stats"]
+    elapsed = stats.get("elapsed_time_seconds") or metrics["wall_time"]
+    latency = metrics["histograms"].get("item/latency_seconds", {})
+    return {
+        f"{name}_pages_per_second": result(stats.get("response_received_count", 0) / elapsed, "pages/s", True),
+        f"{name}_items_per_second": result(stats.get("item_scraped_count", 0) / elapsed, "items/s", True),
+        f"{name}_item_latency_p50": result(latency.get("p50", 0.0) * 1000, "ms", False),
+        f"{name}_item_latency_p99": result(latency.get("p99", 0.0) * 1000, "ms", False),
+        f"{name}_peak_rss": result(metrics["peak_rss_mb"], "MB", False),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Start the origin and crawl it with the urls and articles spiders.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Any]: The environment of the run, the results and the responses served by the origin.
+    """
+    origin: OriginServer = start_origin(
+        articles=args.articles,
+        sections=args.sections,
+        page_bytes=args.page_bytes,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    directory = tempfile.mkdtemp(prefix="scrahp-crawl-")
+    results: Dict[str, Result] = {}
+    try:
+        prepare_workdir(directory)
+        urls = run_spider(directory, "urls", [f"urls={','.join(origin.section_urls())}"], args.set)
+        results.update(crawl_results("urls", urls))
+        articles = run_spider(directory, "articles", [], args.set)
+        results.update(crawl_results("articles", articles))
+
+        with sqlite3.connect(os.path.join(directory, "db", "scrahp.db")) as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        results["db_rows"] = result(rows, "rows", True)
+    finally:
+        origin.shutdown()
+        origin.server_close()
+        if args.keep:
+            logger.info("Crawl directory kept in %s", directory)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "threshold", "keep")},
+        "origin": dict(origin.counts),
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse the command line, run the crawls and compare them with the baseline.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit code, 1 if a result regressed compared to the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Crawl a local synthetic news site with the real spiders and report the throughput.")
+    parser.add_argument("--articles", type=int, default=2000, help="number of articles of the site")
+    parser.add_argument("--sections", type=int, default=4, help="number of section pages")
+    parser.add_argument("--page-bytes", type=int, default=150_000, help="size of the article pages")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean delay of the responses, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="relative spread of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of the article responses answered with a 503")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="NAME=VALUE", help="override a setting of both crawls")
+    parser.add_argument("--keep", action="store_true", help="keep the crawl directory, with the logs, the database and the metrics")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change considered a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    report = run(args)
+    logger.info("Origin responses: %s", report["origin"])
+    for name, value in report["results"].items():
+        logger.info("%-30s %12.3f %s", name, value["value"], value["unit"])
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(report["results"], baseline, args.threshold)
+        for regression in regressions:
+            logger.error("Regression: %s", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Synthetic article database of a configurable size, for the API and storage benchmarks.
+"""
+
+import os
+import random
+import sqlite3
+import time
+from typing import Iterator, List, Tuple
+
+from benchmarks.corpus import article_url, author_name, sentence
+from db.db_service import CREATE_ARTICLES, create_articles, create_author_stats, create_search_index
+
+ArticleRow = Tuple[str, str, str, str]
+
+
+def synthetic_rows(articles: int, content_bytes: int = 1000, seed: int = 0, start: int = 0) -> Iterator[ArticleRow]:
+    """
+    Generate article rows, about 10% of them without author like the crawled ones.
+
+    Args:
+        articles (int): Number of rows.
+        content_bytes (int): Approximate size of the content of every row.
+        seed (int): Seed of the random generator.
+        start (int): Index of the URL of the first row, to generate rows which are not in a database yet.
+
+    Yields:
+        ArticleRow: The (title, url, author, content) rows, in the column order of the writers.
+    """
+    rng = random.Random(seed)
+    # Contents are assembled from a pool of sentences, generating every word of a million rows would dominate the build
+    sentences = [sentence(rng, rng.randint(8, 25)) for _ in range(2000)]
+    for index in range(start, start + articles):
+        content: List[str] = []
+        size = 0
+        while size < content_bytes:
+            content.append(rng.choice(sentences))
+            size += len(content[-1]) + 1
+        author = "n/a" if rng.random() < 0.1 else author_name(rng)
+        yield sentence(rng, 8)[:-1], article_url(index), author, " ".join(content)
+
+
+def build_database(path: str, articles: int, content_bytes: int = 1000, seed: int = 0, batch_size: int = 10000) -> float:
+    """
+    Create a synthetic article database, reused as is if it already holds the requested number of articles.
+
+    The full-text search index and the author statistics are built once the rows are inserted, which is much faster than through their triggers.
+
+    Args:
+        path (str): The path of the database.
+        articles (int): Number of articles.
+        content_bytes (int): Approximate size of the content of every article.
+        seed (int): Seed of the random generator.
+        batch_size (int): Number of rows inserted per statement.
+
+    Returns:
+        float: The time spent building the database, 0 if it was reused.
+    """
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            try:
+                if conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] == articles:
+                    create_articles(conn)
+                    create_search_index(conn)
+                    create_author_stats(conn)
+                    return 0.0
+            except sqlite3.Error:
+                pass
+        os.remove(path)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(CREATE_ARTICLES)
+        batch: List[ArticleRow] = []
+        for row in synthetic_rows(articles, content_bytes, seed):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT INTO articles (title, url, author, content) VALUES (?, ?, ?, ?)", batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO articles (title, url, author, content) VALUES (?, ?, ?, ?)", batch)
+        conn.commit()
+        create_search_index(conn)
+        create_author_stats(conn)
+    finally:
+        conn.close()
+    return time.perf_counter() - start
@@ -0,0 +1,231 @@
+"""
+Local stand-in for the BBC origin, serving a synthetic news site.
+
+Section pages (``/news/section-<n>``) link to the articles with
+``a.gs-c-promo-heading`` anchors, article pages (``/news/world-<n>``) follow the
+layouts of benchmarks.corpus. Every response can be delayed, and a share of them
+answered with a 503, to reproduce a slow or overloaded origin.
+
+Usage:
+    python -m benchmarks.origin [--port 8800] [--articles 2000] [--latency 0.05] [--error-rate 0.01]
+"""
+
+import argparse
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import render_article, render_index
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_PATH = re.compile(r"^/news/world-(\d+)$")
+SECTION_PATH = re.compile(r"^/news/section-(\d+)$")
+
+
+class OriginServer(ThreadingHTTPServer):
+    """
+    HTTP server of the synthetic site, one thread per connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        articles: int = 2000,
+        sections: int = 4,
+        page_bytes: int = 150_000,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """
+        Initialize the server.
+
+        Args:
+            address (Tuple[str, int]): The host and port to listen on, port 0 for any free port.
+            articles (int): Number of articles of the site, spread over the sections.
+            sections (int): Number of section pages.
+            page_bytes (int): Approximate size of the article pages.
+            latency (float): Mean delay of every response, in seconds.
+            jitter (float): Relative spread of the delay around its mean, e.g. 0.5 for +/- 50%.
+            error_rate (float): Share of the article responses answered with a 503.
+            seed (int): Seed of the pages and of the delays.
+        """
+        super().__init__(address, OriginRequestHandler)
+        self.articles = articles
+        self.sections = sections
+        self.page_bytes = page_bytes
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        """
+        The URL of the site.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def section_urls(self) -> List[str]:
+        """
+        List the URLs of the section pages, the start URLs of the urls spider.
+
+        Returns:
+            List[str]: The absolute URLs of the sections.
+        """
+        return [f"{self.base_url}/news/section-{section}" for section in range(self.sections)]
+
+    def count(self, outcome: str) -> None:
+        """
+        Count a response.
+
+        Args:
+            outcome (str): The kind of response, e.g. "article" or "error".
+        """
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def draw(self) -> Tuple[float, bool]:
+        """
+        Draw the delay of a response and whether it fails.
+
+        Returns:
+            Tuple[float, bool]: The delay in seconds and True if a 503 should be answered.
+        """
+        with self.lock:
+            delay = self.latency * (1 + self.jitter * (2 * self.rng.random() - 1))
+            return max(delay, 0.0), self.rng.random() < self.error_rate
+
+
+class OriginRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the synthetic site.
+    """
+
+    server: OriginServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802
+        """
+        Serve a section page, an article page or robots.txt.
+        """
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        if path == "/robots.txt":
+            self.respond(200, b"User-agent: *\nAllow: /\n", "text/plain")
+            return
+
+        section = SECTION_PATH.match(path)
+        article = ARTICLE_PATH.match(path)
+        if section is None and article is None:
+            server.count("not_found")
+            self.respond(404, b"Not found", "text/plain")
+            return
+
+        delay, failed = server.draw()
+        time.sleep(delay)
+        if section is not None:
+            number = int(section.group(1))
+            links = [(f"/news/world-{60000000 + index}", f"Story {index}") for index in range(number, server.articles, server.sections)]
+            server.count("section")
+            self.respond(200, render_index(links, seed=number).encode("utf-8"))
+        elif failed:
+            server.count("error")
+            self.respond(503, b"Service unavailable", "text/plain")
+        else:
+            index = int(article.group(1)) - 60000000 if article is not None else 0
+            if not 0 <= index < server.articles:
+                server.count("not_found")
+                self.respond(404, b"Not found", "text/plain")
+                return
+            server.count("article")
+            body = render_article(index, random.Random(server.seed * 1_000_003 + index), page_bytes=server.page_bytes)
+            self.respond(200, body.encode("utf-8"))
+
+    def respond(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8") -> None:
+        """
+        Send a complete response.
+
+        Args:
+            status (int): The HTTP status.
+            body (bytes): The body.
+            content_type (str): The content type.
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """
+        Silence the access log of every request.
+        """
+
+
+def start_origin(port: int = 0, **options: Any) -> OriginServer:
+    """
+    Start the origin in a background thread.
+
+    Args:
+        port (int): The port to listen on, 0 for any free port.
+        **options (Any): The options of OriginServer.
+
+    Returns:
+        OriginServer: The running server, stopped with shutdown().
+    """
+    server = OriginServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, name="origin", daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Parse the command line and serve the synthetic site until interrupted.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Serve a synthetic BBC-like news site.")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--articles", type=int, default=2000, help="number of articles")
+    parser.add_argument("--sections", type=int, default=4, help="number of section pages")
+    parser.add_argument("--page-bytes", type=int, default=150_000, help="size of the article pages")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean delay of the responses, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="relative spread of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of the article responses answered with a 503")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    server = OriginServer(
+        ("127.0.0.1", args.port),
+        articles=args.articles,
+        sections=args.sections,
+        page_bytes=args.page_bytes,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    logger.info("Serving %d articles, start URLs: %s", args.articles, ",".join(server.section_urls()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
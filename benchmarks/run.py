@@ -0,0 +1,409 @@
+"""
+Offline benchmark suite of the spiders, the pipelines and the API.
+
+Measures, without any network access:
+    - extract: pages/s parsed by the ArticlesSpider extraction and Loader
+    - article_pipeline: items/s cleaned by the ArticlePipeline
+    - url_pipeline: items/s cleaned and canonicalized by the UrlPipeline
+    - insert: rows/s written by the SQLiteBatchWriter
+    - api_*: latency of the /articles, /articles/batch, /search and /top_authors endpoints on a synthetic database,
+      and of their revalidation by polling clients
+
+Results are written as JSON. When a baseline file is given, every result is
+compared with it and the run fails if one regressed by more than the threshold.
+
+Usage:
+    python -m benchmarks.run [--articles 1000000] [--output results.json] [--baseline baseline.json] [--threshold 0.1]
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scrapy.http import HtmlResponse
+
+from benchmarks.corpus import BASE_URL, WORDS, archived_corpus, article_url, synthetic_corpus
+from benchmarks.database import CREATE_ARTICLES, build_database, synthetic_rows
+from db.db_service import create_author_stats, create_search_index
+from db.storage import connect_writer
+from scrahp.autotune import percentile
+from scrahp.items import Article, Url
+from scrahp.pipelines import ArticlePipeline, UrlPipeline
+from scrahp.spiders.articles import ArticlesSpider
+from scrahp.writers import SQLiteBatchWriter
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+
+# {"value": float, "unit": str, "higher_is_better": bool}
+Result = Dict[str, Any]
+
+
+def result(value: float, unit: str, higher_is_better: bool) -> Result:
+    """
+    Build a benchmark result.
+
+    Args:
+        value (float): The measured value.
+        unit (str): The unit of the value.
+        higher_is_better (bool): Whether a higher value is an improvement (throughputs) or a regression (latencies).
+
+    Returns:
+        Result: The result.
+    """
+    return {"value": round(value, 3), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_throughput(function: Callable[[], int], repeat: int) -> float:
+    """
+    Run a function several times and keep its best throughput, the least disturbed by the rest of the machine.
+
+    Args:
+        function (Callable[[], int]): The function, returning the number of processed elements.
+        repeat (int): Number of runs.
+
+    Returns:
+        float: The best number of elements per second.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = function()
+        elapsed = time.perf_counter() - start
+        best = max(best, count / elapsed if elapsed else 0.0)
+    return best
+
+
+def bench_extract(corpus: List[Tuple[str, bytes]], repeat: int) -> Tuple[Result, List[Article]]:
+    """
+    Measure the extraction of the articles of the corpus pages.
+
+    Args:
+        corpus (List[Tuple[str, bytes]]): The (url, body) of the pages.
+        repeat (int): Number of runs.
+
+    Returns:
+        Tuple[Result, List[Article]]: The pages/s, and the loaded articles used by the next benchmarks.
+    """
+    spider = ArticlesSpider()
+    articles: List[Article] = []
+
+    def run() -> int:
+        articles.clear()
+        for url, body in corpus:
+            response = HtmlResponse(url=url, body=body, encoding="utf-8")
+            articles.append(spider.load_article(url, spider.extractor.extract(response.selector.root)))
+        return len(corpus)
+
+    return result(best_throughput(run, repeat), "pages/s", True), list(articles)
+
+
+def bench_article_pipeline(articles: List[Article], repeat: int) -> Result:
+    """
+    Measure the cleaning of loaded articles by the ArticlePipeline.
+
+    Args:
+        articles (List[Article]): The loaded, not yet cleaned articles.
+        repeat (int): Number of runs.
+
+    Returns:
+        Result: The items/s.
+    """
+    spider = ArticlesSpider()
+    pipeline = ArticlePipeline()
+    # The pipeline replaces the fields of the items, every run cleans fresh copies
+    valid = [article for article in articles if "title" in article]
+
+    def run() -> int:
+        for article in [Article(article) for article in valid]:
+            pipeline.process_item(article, spider)
+        return len(valid)
+
+    return result(best_throughput(run, repeat), "items/s", True)
+
+
+def bench_url_pipeline(count: int, repeat: int) -> Result:
+    """
+    Measure the cleaning and canonicalization of discovered URLs by the UrlPipeline.
+
+    Args:
+        count (int): Number of URL items.
+        repeat (int): Number of runs.
+
+    Returns:
+        Result: The items/s.
+    """
+    spider = ArticlesSpider()
+    pipeline = UrlPipeline()
+    hrefs = [
+        "/news/world-{0}",
+        "https://www.bbc.com/news/uk-{0}?at_medium=RSS&xtor=AL-1",
+        "www.bbc.co.uk/news/business-{0}#comments",
+        "/sport/football/{0}?intlink_from_url=https://www.bbc.com/sport",
+    ]
+    raw = [
+        {"title": [f"Story {index}"], "base_url": [BASE_URL], "url": [hrefs[index % len(hrefs)].format(60000000 + index)]} for index in range(count)
+    ]
+
+    def run() -> int:
+        for fields in raw:
+            pipeline.process_item(Url(fields), spider)
+        return count
+
+    return result(best_throughput(run, repeat), "items/s", True)
+
+
+def bench_insert(count: int, repeat: int) -> Result:
+    """
+    Measure the rows written by the SQLiteBatchWriter in a fresh database, with the search index and author statistics of db_service.
+
+    Args:
+        count (int): Number of rows.
+        repeat (int): Number of runs.
+
+    Returns:
+        Result: The rows/s.
+    """
+    rows = list(synthetic_rows(count, seed=1))
+
+    def run() -> int:
+        with tempfile.TemporaryDirectory() as directory:
+            conn = connect_writer(os.path.join(directory, "insert.db"), check_same_thread=False)
+            conn.execute(CREATE_ARTICLES)
+            create_search_index(conn)
+            create_author_stats(conn)
+            writer = SQLiteBatchWriter(conn, queue_size=0)
+            writer.start()
+            for row in rows:
+                writer.put(row)
+            writer.close()
+        return count
+
+    return result(best_throughput(run, repeat), "rows/s", True)
+
+
+def load_api(database: str) -> Any:
+    """
+    Import the Flask application of the API, serving the given database.
+
+    Args:
+        database (str): The path of the database.
+
+    Returns:
+        Any: The Flask application.
+    """
+    os.environ["SCRAHP_DATABASE_URI"] = f"sqlite:///{os.path.abspath(database)}"
+    if API_DIR not in sys.path:
+        sys.path.insert(0, API_DIR)
+    return importlib.import_module("app").app
+
+
+def bench_api(database: str, articles: int, requests: int, full_requests: int) -> Dict[str, Result]:
+    """
+    Measure the latency of the API endpoints with the Flask test client, without any HTTP server.
+
+    Args:
+        database (str): The path of the synthetic database.
+        articles (int): Number of articles of the database.
+        requests (int): Number of requests of the lookup, search and top authors endpoints, a tenth of them for the batch lookup.
+        full_requests (int): Number of requests listing every article, much slower on large databases.
+
+    Returns:
+        Dict[str, Result]: The p50 and p95 latency of every endpoint, in milliseconds.
+    """
+    app = load_api(database)
+    client = app.test_client()
+    endpoints = {
+        "api_articles": ["/articles"] * full_requests,
+        "api_article_lookup": [f"/articles?url={article_url((index * 7919) % articles)}" for index in range(requests)],
+        "api_top_authors": ["/top_authors"] * requests,
+        "api_search": [f"/search?q={WORDS[(index * 7) % len(WORDS)]}+{WORDS[(index * 13) % len(WORDS)]}" for index in range(requests)],
+    }
+    results: Dict[str, Result] = {}
+    # The queries are measured without the response cache, which would answer all but the first request
+    cache_bytes = app.config["RESPONSE_CACHE_BYTES"]
+    app.config["RESPONSE_CACHE_BYTES"] = 0
+    try:
+        for name, paths in endpoints.items():
+            results.update(request_latencies(client, name, paths))
+    finally:
+        app.config["RESPONSE_CACHE_BYTES"] = cache_bytes
+
+    # Enrichment of a feed: the articles of 1000 URLs, 1% of them unknown, in a single request
+    urls = [article_url((index * 7919) % articles) if index % 100 else f"{BASE_URL}/news/missing-{index}" for index in range(1000)]
+    batch = {"urls": urls, "fields": "title,author"}
+    results.update(request_latencies(client, "api_article_batch", ["/articles/batch"] * max(1, requests // 10), body=batch))
+
+    # Dashboard polling: revalidations of the cached responses, answered with a 304
+    for name, path in (("api_articles_poll", "/articles"), ("api_top_authors_poll", "/top_authors")):
+        etag = client.get(path).headers["ETag"]
+        results.update(request_latencies(client, name, [path] * requests, {"If-None-Match": etag}, 304))
+    return results
+
+
+def request_latencies(
+    client: Any,
+    name: str,
+    paths: List[str],
+    headers: Optional[Dict[str, str]] = None,
+    status: int = 200,
+    body: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Result]:
+    """
+    Measure the latency of requests to the API.
+
+    Args:
+        client (Any): The Flask test client.
+        name (str): The name of the endpoint, prefixing the results.
+        paths (List[str]): The paths and query strings of the requests.
+        headers (Optional[Dict[str, str]]): The headers of every request.
+        status (int): The expected status of the responses.
+        body (Optional[Dict[str, Any]]): The JSON body of the requests, which are then POST requests.
+
+    Returns:
+        Dict[str, Result]: The p50 and p95 latency of the requests, in milliseconds.
+
+    Raises:
+        RuntimeError: If a response has another status.
+    """
+    latencies: List[float] = []
+    for path in paths:
+        start = time.perf_counter()
+        response = client.get(path, headers=headers) if body is None else client.post(path, headers=headers, json=body)
+        response.get_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != status:
+            raise RuntimeError(f"{path} answered {response.status_code}")
+    return {
+        f"{name}_p50": result(percentile(latencies, 0.5), "ms", False),
+        f"{name}_p95": result(percentile(latencies, 0.95), "ms", False),
+    }
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result], threshold: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Args:
+        results (Dict[str, Result]): The results of this run.
+        baseline (Dict[str, Result]): The results of the baseline run.
+        threshold (float): The relative change considered a regression, e.g. 0.1 for 10%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions: List[str] = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None or not reference["value"]:
+            continue
+        change = (current["value"] - reference["value"]) / reference["value"]
+        regressed = change < -threshold if current["higher_is_better"] else change > threshold
+        logger.info("%-26s %12.3f %-8s baseline %12.3f (%+.1f%%)", name, current["value"], current["unit"], reference["value"], change * 100)
+        if regressed:
+            regressions.append(f"{name}: {current['value']} {current['unit']} against {reference['value']} ({change:+.1%})")
+    return regressions
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the selected benchmarks.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Any]: The environment of the run and the results of every benchmark.
+    """
+    results: Dict[str, Result] = {}
+    selected = set(args.only.split(",")) if args.only else None
+
+    def enabled(name: str) -> bool:
+        return selected is None or name in selected
+
+    if enabled("extract") or enabled("article_pipeline"):
+        corpus = archived_corpus(args.archive, args.pages) if args.archive else synthetic_corpus(args.pages, args.page_bytes)
+        logger.info("Extracting %d pages", len(corpus))
+        results["extract"], articles = bench_extract(corpus, args.repeat)
+        if enabled("article_pipeline"):
+            results["article_pipeline"] = bench_article_pipeline(articles, args.repeat)
+    if enabled("url_pipeline"):
+        results["url_pipeline"] = bench_url_pipeline(args.items, args.repeat)
+    if enabled("insert"):
+        results["insert"] = bench_insert(args.items, args.repeat)
+    if enabled("api"):
+        elapsed = build_database(args.database, args.articles)
+        if elapsed:
+            logger.info("Built a database of %d articles in %.1fs", args.articles, elapsed)
+        results.update(bench_api(args.database, args.articles, args.requests, args.full_requests))
+
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "threshold")},
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse the command line, run the benchmarks and compare them with the baseline.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit code, 1 if a result regressed compared to the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the spiders, the pipelines and the API offline.")
+    parser.add_argument("--only", default=None, help="comma separated benchmarks: extract, article_pipeline, url_pipeline, insert, api")
+    parser.add_argument("--pages", type=int, default=200, help="number of pages of the extraction corpus")
+    parser.add_argument("--page-bytes", type=int, default=150_000, help="size of the synthetic pages")
+    parser.add_argument("--archive", default=None, help="use the pages of this page archive instead of synthetic ones")
+    parser.add_argument("--items", type=int, default=20000, help="number of URL items and of inserted rows")
+    parser.add_argument("--articles", type=int, default=10000, help="number of articles of the synthetic database")
+    parser.add_argument(
+        "--database",
+        default=os.path.join(tempfile.gettempdir(), "scrahp-benchmark.db"),
+        help="path of the synthetic database, reused when its size matches",
+    )
+    parser.add_argument("--requests", type=int, default=50, help="number of requests per API endpoint")
+    parser.add_argument("--full-requests", type=int, default=3, help="number of requests listing every article")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of every throughput benchmark, the best is kept")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change considered a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    report = run(args)
+    for name, value in report["results"].items():
+        logger.info("%-26s %12.3f %s", name, value["value"], value["unit"])
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(report["results"], baseline, args.threshold)
+        for regression in regressions:
+            logger.error("Regression: %s", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
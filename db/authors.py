@@ -0,0 +1,34 @@
+"""
+Normalization of the author names, shared by the ArticlePipeline of the crawlers and the database service.
+
+The same author is always stored under the same name, so that the author statistics
+are not split across the spellings of a byline: "By Jane Doe", "JANE DOE" and
+"Jane Doe, BBC News" all give "Jane Doe".
+"""
+
+import re
+import string
+from typing import Optional
+
+# Byline prefix ("By Jane Doe", "Reporting by Jane Doe") and role suffix ("Jane Doe, BBC News", "Jane Doe - Political editor")
+AUTHOR_PREFIX = re.compile(r"^(?:(?:reporting|written|words)\s+)?by\s+", re.IGNORECASE)
+AUTHOR_ROLE = re.compile(r"\s*(?:,|\s[-|\u2013\u2014]\s).*$")
+
+
+def normalize_author(name: Optional[str]) -> str:
+    """
+    Normalize the name of an author.
+
+    Args:
+        name (Optional[str]): The byline, or the author name stored by an older version of the crawlers.
+
+    Returns:
+        str: The normalized name, or "n/a" when there is none.
+    """
+    name = " ".join((name or "").split())
+    if name.lower() == "by":
+        return "n/a"
+    name = AUTHOR_ROLE.sub("", AUTHOR_PREFIX.sub("", name)).strip(string.punctuation + " ")
+    if name.isupper():
+        name = name.title()
+    return name or "n/a"
@@ -2,6 +2,98 @@ import os
 import pdb
 import sqlite3
 
+from db.authors import normalize_author
+from db.storage import connect_writer
+
+# The articles, looked up by url. The id is an alias of the rowid, which VACUUM keeps unlike
+# an implicit rowid: the search index, the author statistics and the export cursors of the API refer to it. Ids are
+# never reused, so that an export resumed after the last id does not miss a new article.
+CREATE_ARTICLES = """
+    CREATE TABLE IF NOT EXISTS articles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT NOT NULL UNIQUE,
+        title TEXT,
+        author TEXT,
+        content TEXT
+    )
+"""
+
+# Full-text index of the articles. It is an external content table: it only stores
+# the index and reads the texts from the articles table, kept in sync by the triggers.
+SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_search USING fts5(
+        title,
+        author,
+        content,
+        content='articles',
+        content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_search_insert AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_search (rowid, title, author, content) VALUES (new.id, new.title, new.author, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_search_delete AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_search (articles_search, rowid, title, author, content) VALUES ('delete', old.id, old.title, old.author, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_search_update AFTER UPDATE ON articles BEGIN
+        INSERT INTO articles_search (articles_search, rowid, title, author, content) VALUES ('delete', old.id, old.title, old.author, old.content);
+        INSERT INTO articles_search (rowid, title, author, content) VALUES (new.id, new.title, new.author, new.content);
+    END
+    """,
+]
+# BM25 weights of the title, author and content columns, a match in the title ranks higher
+SEARCH_RANK = "bm25(10.0, 5.0, 1.0)"
+
+# Number of articles of every author, in total and per day (UTC) the articles were stored.
+# The triggers update them in the transaction inserting, updating or deleting the articles.
+# article_days remembers the day of every article, keyed by its stable id, to move it when its author changes.
+AUTHOR_STATS = [
+    "CREATE TABLE IF NOT EXISTS authors (name TEXT PRIMARY KEY, article_count INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS authors_article_count ON authors (article_count DESC)",
+    "CREATE TABLE IF NOT EXISTS author_days (day TEXT, name TEXT, article_count INTEGER NOT NULL, PRIMARY KEY (day, name)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS article_days (article INTEGER PRIMARY KEY, day TEXT NOT NULL)",
+    """
+    CREATE TRIGGER IF NOT EXISTS authors_insert AFTER INSERT ON articles WHEN new.author IS NOT NULL BEGIN
+        INSERT INTO authors (name, article_count) VALUES (new.author, 1)
+            ON CONFLICT(name) DO UPDATE SET article_count = article_count + 1;
+        INSERT INTO article_days (article, day) VALUES (new.id, date('now'));
+        INSERT INTO author_days (day, name, article_count) VALUES (date('now'), new.author, 1)
+            ON CONFLICT(day, name) DO UPDATE SET article_count = article_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS authors_delete AFTER DELETE ON articles WHEN old.author IS NOT NULL BEGIN
+        UPDATE authors SET article_count = article_count - 1 WHERE name = old.author;
+        DELETE FROM authors WHERE name = old.author AND article_count <= 0;
+        UPDATE author_days SET article_count = article_count - 1
+            WHERE day = (SELECT day FROM article_days WHERE article = old.id) AND name = old.author;
+        DELETE FROM author_days WHERE day = (SELECT day FROM article_days WHERE article = old.id) AND name = old.author AND article_count <= 0;
+        DELETE FROM article_days WHERE article = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS authors_update AFTER UPDATE OF author ON articles
+    WHEN old.author IS NOT new.author AND old.author IS NOT NULL AND new.author IS NOT NULL BEGIN
+        UPDATE authors SET article_count = article_count - 1 WHERE name = old.author;
+        DELETE FROM authors WHERE name = old.author AND article_count <= 0;
+        INSERT INTO authors (name, article_count) VALUES (new.author, 1)
+            ON CONFLICT(name) DO UPDATE SET article_count = article_count + 1;
+        UPDATE author_days SET article_count = article_count - 1
+            WHERE day = (SELECT day FROM article_days WHERE article = old.id) AND name = old.author;
+        DELETE FROM author_days WHERE day = (SELECT day FROM article_days WHERE article = old.id) AND name = old.author AND article_count <= 0;
+        INSERT INTO author_days (day, name, article_count) SELECT day, new.author, 1 FROM article_days WHERE article = new.id
+            ON CONFLICT(day, name) DO UPDATE SET article_count = article_count + 1;
+    END
+    """,
+]
+
 
 def is_database_initialized() -> bool:
     """
@@ -16,6 +108,79 @@ def is_database_initialized() -> bool:
     return os.path.exists("initialized.flag")
 
 
+def create_articles(conn: sqlite3.Connection) -> None:
+    """
+    Create the articles table, or give the articles table of an older database its id column.
+
+    Older databases keyed the articles by url only, and the search index and author statistics
+    referred to their implicit rowid, which VACUUM may renumber. Their table is rebuilt with
+    the rowids as ids, so that the existing references stay valid, and their search index is
+    dropped to be rebuilt on the id by create_search_index. Running it again does nothing.
+
+    Args:
+        conn (sqlite3.Connection): The connection to the database.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(articles)")]
+    if columns and "id" not in columns:
+        # Dropping the old table drops its triggers, create_search_index and create_author_stats create them again
+        conn.commit()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TABLE IF EXISTS articles_search")
+            conn.execute(CREATE_ARTICLES.replace("articles", "articles_migrated", 1))
+            conn.execute(
+                "INSERT INTO articles_migrated (id, url, title, author, content) SELECT rowid, url, title, author, content FROM articles ORDER BY rowid"
+            )
+            conn.execute("DROP TABLE articles")
+            conn.execute("ALTER TABLE articles_migrated RENAME TO articles")
+    conn.execute(CREATE_ARTICLES)
+    conn.commit()
+
+
+def create_search_index(conn: sqlite3.Connection) -> None:
+    """
+    Create the full-text index of the articles and its triggers, if they don't already exist.
+
+    When the index is created on a database which already holds articles, they are indexed
+    at once. Running it again on an indexed database does nothing, so it is safe on every start.
+
+    Args:
+        conn (sqlite3.Connection): The connection to the database holding the articles table.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_search'").fetchone()
+    for statement in SEARCH_INDEX:
+        conn.execute(statement)
+    if not exists:
+        conn.execute("INSERT INTO articles_search (articles_search, rank) VALUES ('rank', ?)", (SEARCH_RANK,))
+        conn.execute("INSERT INTO articles_search (articles_search) VALUES ('rebuild')")
+    conn.commit()
+
+
+def create_author_stats(conn: sqlite3.Connection) -> None:
+    """
+    Create the author statistics tables and their triggers, if they don't already exist.
+
+    When the tables are created on a database which already holds articles, their authors
+    are first normalized like the crawlers now store them, so that the spellings of a byline
+    stored by older crawlers are counted as one author, then counted at once. The day these
+    articles were stored is unknown, so they are only part of the totals, not of the per-day
+    counts. Running it again does nothing.
+
+    Args:
+        conn (sqlite3.Connection): The connection to the database holding the articles table.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'authors'").fetchone()
+    if not exists:
+        # The search index triggers reindex the normalized authors
+        conn.create_function("normalize_author", 1, normalize_author, deterministic=True)
+        conn.execute("UPDATE articles SET author = normalize_author(author) WHERE author IS NOT NULL AND author IS NOT normalize_author(author)")
+    for statement in AUTHOR_STATS:
+        conn.execute(statement)
+    if not exists:
+        conn.execute("INSERT INTO authors (name, article_count) SELECT author, COUNT(*) FROM articles WHERE author IS NOT NULL GROUP BY author")
+    conn.commit()
+
+
 def initialize_database() -> None:
     """
     Initialize the SQLite database.
@@ -24,21 +189,15 @@ def initialize_database() -> None:
     if they don't already exist. It also creates a flag file upon
     successful initialization to prevent re-initialization.
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect("scrahp.db")
-    c = conn.cursor()
+    # Connect to the SQLite database, switching it to WAL mode so that the API reads while the crawlers write
+    conn = connect_writer("scrahp.db")
 
     # Create a table for articles
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS articles (
-            url TEXT PRIMARY KEY,
-            title TEXT,
-            author TEXT,
-            content TEXT
-        )
-    """
-    )
+    create_articles(conn)
+
+    # Create the full-text search index of the articles and the author statistics
+    create_search_index(conn)
+    create_author_stats(conn)
 
     # Commit the changes and close the connection
     conn.commit()
@@ -50,8 +209,15 @@ def initialize_database() -> None:
 
 
 # Main
-if not is_database_initialized():
-    initialize_database()
-    print("Database initialization complete.")
-else:
-    print("Database has already been initialized. Skipping initialization.")
+if __name__ == "__main__":
+    if not is_database_initialized():
+        initialize_database()
+        print("Database initialization complete.")
+    else:
+        print("Database has already been initialized. Skipping initialization.")
+        # Databases initialized before the article ids, the search index or the author statistics existed get them on their next start
+        conn = connect_writer("scrahp.db")
+        create_articles(conn)
+        create_search_index(conn)
+        create_author_stats(conn)
+        conn.close()
@@ -0,0 +1,89 @@
+"""
+Storage configuration of the articles database, shared by the database service, the crawlers and the API.
+
+The database is in WAL mode: the API keeps reading while a crawl commits, from the
+last committed snapshot, instead of waiting for the rollback journal lock. Writers
+and readers are opened with their own pragmas:
+
+    - writers (SQLitePipeline, db_service.py) trade durability of the last commits on
+      a power loss for fewer fsyncs (synchronous=NORMAL is still safe in WAL mode) and
+      keep a large page cache for the index updates of the inserts
+    - readers (the API) open the database read-only, map it in memory so that the
+      pages are shared by every worker process through the OS page cache, and only
+      keep a small private page cache per connection
+"""
+
+import os
+import sqlite3
+from typing import Any, Dict, Union
+from urllib.request import pathname2url
+
+# Pragmas of the connections writing the articles
+WRITER_PRAGMAS: Dict[str, Union[int, str]] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # In KiB when negative: 64 MiB
+    "cache_size": -65536,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    # Keep the WAL file from growing past 64 MiB after a checkpoint
+    "journal_size_limit": 64 * 1024 * 1024,
+    # Wait for the other writers (e.g. db_service.py upgrading the schema) rather than failing
+    "busy_timeout": 10000,
+}
+
+# Pragmas of the read-only connections of the API
+READER_PRAGMAS: Dict[str, Union[int, str]] = {
+    # In KiB when negative: 16 MiB, the mmap serves most of the reads
+    "cache_size": -16384,
+    "mmap_size": 1024 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# Connections kept open by the pool of every API process
+READER_POOL_SIZE = 8
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Union[int, str]]) -> None:
+    """
+    Set pragmas on a connection.
+
+    Args:
+        conn (sqlite3.Connection): The connection.
+        pragmas (Dict[str, Union[int, str]]): The pragmas and their values.
+    """
+    for name, value in pragmas.items():
+        # Pragmas take no bound parameters, the names and values only come from this module
+        conn.execute(f"PRAGMA {name}={value}").fetchall()
+
+
+def connect_writer(path: str, **kwargs: Any) -> sqlite3.Connection:
+    """
+    Open a connection writing the articles, switching the database to WAL mode.
+
+    Args:
+        path (str): The path of the database.
+        **kwargs (Any): Arguments of sqlite3.connect, e.g. check_same_thread=False.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    conn = sqlite3.connect(path, **kwargs)
+    apply_pragmas(conn, WRITER_PRAGMAS)
+    return conn
+
+
+def connect_reader(path: str) -> sqlite3.Connection:
+    """
+    Open a read-only connection to the articles, usable from any thread of a pool.
+
+    Args:
+        path (str): The path of the database.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, check_same_thread=False)
+    apply_pragmas(conn, READER_PRAGMAS)
+    return conn
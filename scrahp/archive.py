@@ -0,0 +1,374 @@
+import gzip
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import IO, Iterator, List, Optional, Tuple
+
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
+
+from scrahp.writers import BatchingWriter
+
+logger = logging.getLogger(__name__)
+
+PageRecord = Tuple[str, bytes, str, str]
+SEGMENT_PATTERN = re.compile(r"^pages-(\d+)\.warc\.gz$")
+
+
+class PageArchive(BatchingWriter):
+    """
+    Append-only, content-addressed archive of crawled pages.
+
+    Pages are written by a background thread into ``pages-<seq>.warc.gz`` segments.
+    Every record is a WARC-like resource record compressed as its own gzip member,
+    so it can be read back alone from its offset. A SQLite index maps every body
+    digest (sha1) to its segment, offset and length, and every URL to the digest of
+    its last crawled body and the spider that parsed it: identical bodies are only
+    stored once.
+
+    Pages are queued without ever blocking the reactor thread: when the writer falls
+    behind, the pages that do not fit in the queue are not archived and counted in
+    ``archive/dropped``.
+    """
+
+    def __init__(
+        self,
+        directory: str = "pages",
+        max_segment_bytes: int = 512 * 1024 * 1024,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        queue_size: int = 1000,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
+        """
+        Initialize the archive and its writer thread.
+
+        Args:
+            directory (str): Directory holding the segments and the index.
+            max_segment_bytes (int): Compressed size after which a new segment is started.
+            batch_size (int): Number of pages written per index transaction.
+            flush_interval (float): Maximum number of seconds a page can stay buffered.
+            queue_size (int): Maximum number of pending pages, the next ones are dropped.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        super().__init__("page-archive", batch_size, flush_interval, queue_size)
+        self.directory = directory
+        self.index_file = os.path.join(directory, "index.db")
+        self.max_segment_bytes = max_segment_bytes
+        self.stats = stats
+        self.conn: Optional[sqlite3.Connection] = None
+        self.segment: Optional[IO[bytes]] = None
+        self.segment_name = ""
+
+    def open(self) -> None:
+        """
+        Create the index if needed, open a new segment and start the writer thread.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.index_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS bodies (digest TEXT PRIMARY KEY, segment TEXT, offset INTEGER, length INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, digest TEXT, fetched_at TEXT, spider TEXT)")
+        # Indexes created before the spider was recorded
+        if "spider" not in [row[1] for row in self.conn.execute("PRAGMA table_info(urls)")]:
+            self.conn.execute("ALTER TABLE urls ADD COLUMN spider TEXT")
+        self.conn.commit()
+        self.open_segment()
+        self.start()
+
+    def close(self) -> None:
+        """
+        Write the pending pages, stop the writer thread and close the files.
+        """
+        super().close()
+        if self.segment is not None:
+            self.segment.close()
+        if self.conn is not None:
+            self.conn.close()
+
+    def open_segment(self) -> None:
+        """
+        Start a new segment, numbered after the existing ones.
+        """
+        if self.segment is not None:
+            self.segment.close()
+        numbers = [int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(self.directory)) if match]
+        self.segment_name = f"pages-{max(numbers, default=0) + 1:06d}.warc.gz"
+        self.segment = open(os.path.join(self.directory, self.segment_name), "ab")
+        logger.info("Archiving pages to %s", self.segment_name)
+
+    def put_page(self, url: str, body: bytes, spider: str) -> bool:
+        """
+        Queue a page for archiving, unless the queue is full.
+
+        Args:
+            url (str): The URL of the page.
+            body (bytes): The body of the page.
+            spider (str): The name of the spider that parsed the page.
+
+        Returns:
+            bool: True if the page was queued, False if it was dropped.
+        """
+        try:
+            self.put((url, body, datetime.now(timezone.utc).isoformat(), spider), block=False)
+        except queue.Full:
+            if self.stats is not None:
+                self.stats.inc_value("archive/dropped")
+            return False
+        return True
+
+    def write_batch(self, batch: List[PageRecord]) -> None:
+        """
+        Append the new bodies of a batch to the current segment and index the batch.
+
+        Args:
+            batch (List[PageRecord]): The (url, body, fetch date, spider name) of the pages to archive.
+        """
+        assert self.conn is not None and self.segment is not None
+        stored = deduplicated = 0
+        with self.conn:
+            for url, body, fetched_at, spider in batch:
+                digest = hashlib.sha1(body).hexdigest()
+                known = self.conn.execute("SELECT 1 FROM bodies WHERE digest = ?", (digest,)).fetchone()
+                if known is None:
+                    record = gzip.compress(self.record_header(url, digest, fetched_at, len(body)) + body + b"\r\n\r\n", compresslevel=6)
+                    offset = self.segment.tell()
+                    self.segment.write(record)
+                    self.conn.execute("INSERT INTO bodies VALUES (?, ?, ?, ?)", (digest, self.segment_name, offset, len(record)))
+                    stored += 1
+                else:
+                    deduplicated += 1
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO urls (url, digest, fetched_at, spider) VALUES (?, ?, ?, ?)", (url, digest, fetched_at, spider)
+                )
+            # The index must never point to data that is not on disk yet
+            self.segment.flush()
+
+        if self.stats is not None:
+            self.stats.inc_value("archive/pages", len(batch))
+            self.stats.inc_value("archive/stored", stored)
+            self.stats.inc_value("archive/deduplicated", deduplicated)
+
+        if self.segment.tell() >= self.max_segment_bytes:
+            self.open_segment()
+
+    @staticmethod
+    def record_header(url: str, digest: str, fetched_at: str, length: int) -> bytes:
+        """
+        Build the WARC-like header of a resource record.
+
+        Args:
+            url (str): The URL of the page.
+            digest (str): The sha1 digest of the body.
+            fetched_at (str): The ISO date the page was fetched at.
+            length (int): The length of the body.
+
+        Returns:
+            bytes: The header, ending with an empty line.
+        """
+        return (
+            "WARC/1.0\r\n"
+            "WARC-Type: resource\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"WARC-Date: {fetched_at}\r\n"
+            f"WARC-Payload-Digest: sha1:{digest}\r\n"
+            "Content-Type: text/html\r\n"
+            f"Content-Length: {length}\r\n"
+            "\r\n"
+        ).encode("utf-8")
+
+
+def archive_page(spider: Spider, response: Response, parser: str) -> None:
+    """
+    Save a copy of a crawled page in the page archive of the spider, if any, for offline analysis and replay.
+
+    The page is queued to the archive writer thread, which compresses and
+    deduplicates it off the reactor thread. The page is recorded with the name of
+    the spider whose callback parsed it rather than the running spider: the stream
+    and feeds spiders fetch both the section pages of the urls spider and the
+    article pages of the articles spider.
+
+    Args:
+        spider (Spider): The spider that fetched the page.
+        response (Response): The response to save.
+        parser (str): The name of the spider whose callback parsed the page, recorded with it.
+    """
+    archive: Optional[PageArchive] = getattr(spider, "page_archive", None)
+    if archive is not None:
+        archive.put_page(response.url, response.body, parser)
+
+
+class PageArchiveReader:
+    """
+    Random-access reader of a PageArchive, usable while the archive is being written.
+    """
+
+    def __init__(self, directory: str = "pages") -> None:
+        """
+        Open the index of an archive in read-only mode.
+
+        Args:
+            directory (str): Directory holding the segments and the index.
+        """
+        self.directory = directory
+        self.conn = sqlite3.connect(f"file:{os.path.join(directory, 'index.db')}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        """
+        Close the index.
+        """
+        self.conn.close()
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        Read the last archived body of a URL.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            Optional[bytes]: The body, or None if the URL is not archived.
+        """
+        row = self.conn.execute(
+            "SELECT b.segment, b.offset, b.length FROM urls u JOIN bodies b ON b.digest = u.digest WHERE u.url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        with open(os.path.join(self.directory, row[0]), "rb") as segment:
+            return self.read_record(segment, row[1], row[2])
+
+    def locations(self, spiders: Optional[List[Optional[str]]] = None) -> Iterator[Tuple[str, str, int, int, Optional[str]]]:
+        """
+        Iterate over the location of the last body of every archived URL, in storage order.
+
+        Args:
+            spiders (Optional[List[Optional[str]]]): Only the pages fetched by these spiders, None standing for the pages
+            archived before the spider was recorded. Every page when not given.
+
+        Yields:
+            Tuple[str, str, int, int, Optional[str]]: The URL, the segment path, the record offset, its compressed length
+            and the name of the spider that fetched the page.
+        """
+        query = "SELECT u.url, b.segment, b.offset, b.length, u.spider FROM urls u JOIN bodies b ON b.digest = u.digest"
+        parameters: List[str] = []
+        if spiders is not None:
+            names = [name for name in spiders if name is not None]
+            conditions = [f"u.spider IN ({', '.join('?' * len(names))})"] if names else []
+            if None in spiders:
+                conditions.append("u.spider IS NULL")
+            query += f" WHERE {' OR '.join(conditions) or '0'}"
+            parameters = names
+        for url, name, offset, length, spider in self.conn.execute(f"{query} ORDER BY b.segment, b.offset", parameters):
+            yield url, os.path.join(self.directory, name), offset, length, spider
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Iterate over every archived URL and its last body, in storage order.
+
+        Yields:
+            Tuple[str, bytes]: The URL and the body of the page.
+        """
+        segment: Optional[IO[bytes]] = None
+        segment_path = None
+        try:
+            for url, path, offset, length, _ in self.locations():
+                if path != segment_path:
+                    if segment is not None:
+                        segment.close()
+                    segment, segment_path = open(path, "rb"), path
+                yield url, self.read_record(segment, offset, length)
+        finally:
+            if segment is not None:
+                segment.close()
+
+    @staticmethod
+    def read_record(segment: IO[bytes], offset: int, length: int) -> bytes:
+        """
+        Read and decompress a record, returning its body.
+
+        Args:
+            segment (IO[bytes]): The open segment file.
+            offset (int): The offset of the record in the segment.
+            length (int): The compressed length of the record.
+
+        Returns:
+            bytes: The body of the page.
+        """
+        segment.seek(offset)
+        record = gzip.decompress(segment.read(length))
+        header, _, rest = record.partition(b"\r\n\r\n")
+        length_match = re.search(rb"Content-Length: (\d+)", header)
+        return rest[: int(length_match.group(1))] if length_match else rest[:-4]
+
+
+class PageArchiveExtension:
+    """
+    Extension opening the PageArchive of the spiders and closing it at the end of the crawl.
+
+    The archive is exposed to the spider as its ``page_archive`` attribute.
+    """
+
+    def __init__(self, archive: PageArchive) -> None:
+        """
+        Initialize the extension.
+
+        Args:
+            archive (PageArchive): The archive shared by the spider.
+        """
+        self.archive = archive
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "PageArchiveExtension":
+        """
+        Create the extension from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            PageArchiveExtension: The configured extension.
+
+        Raises:
+            NotConfigured: If ARCHIVE_ENABLED is False.
+        """
+        settings = crawler.settings
+        if not settings.getbool("ARCHIVE_ENABLED", True):
+            raise NotConfigured
+        archive = PageArchive(
+            directory=settings.get("ARCHIVE_DIR", "pages"),
+            max_segment_bytes=settings.getint("ARCHIVE_SEGMENT_MAX_BYTES", 512 * 1024 * 1024),
+            queue_size=settings.getint("ARCHIVE_QUEUE_SIZE", 1000),
+            stats=crawler.stats,
+        )
+        extension = cls(archive)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider: Spider) -> None:
+        """
+        Open the archive and attach it to the spider.
+
+        Args:
+            spider (Spider): The spider that was opened.
+        """
+        self.archive.open()
+        spider.page_archive = self.archive  # type: ignore[attr-defined]
+
+    def spider_closed(self, spider: Spider) -> None:
+        """
+        Close the archive, writing the pending pages.
+
+        Args:
+            spider (Spider): The spider that was closed.
+        """
+        self.archive.close()
@@ -0,0 +1,127 @@
+from typing import List, Optional
+
+# Smallest non-zero download delay set by the controller, in seconds
+MIN_DELAY_STEP = 0.1
+
+
+def percentile(values: List[float], rank: float) -> float:
+    """
+    Compute a percentile with the nearest-rank method.
+
+    Args:
+        values (List[float]): The values, in any order.
+        rank (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The percentile of the values, 0 if there are none.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(rank * len(ordered))) - 1))]
+
+
+class HostController:
+    """
+    AIMD controller of the concurrency and download delay of a single downloader slot.
+
+    Responses are observed in windows of ``window`` requests. At the end of every
+    window, the controller compares the p95 latency and the error rate (429, 5xx and
+    timeouts) of the window with their targets:
+
+    - above target, the concurrency is cut multiplicatively, and once it reached its
+      minimum the delay is doubled;
+    - within target, the delay is halved first, then the concurrency grows by one.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        delay: float = 0.0,
+        target_latency: float = 2.0,
+        max_error_rate: float = 0.02,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        max_delay: float = 30.0,
+        window: int = 20,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        """
+        Initialize the controller.
+
+        Args:
+            concurrency (int): Initial concurrency of the slot.
+            delay (float): Initial download delay of the slot, in seconds.
+            target_latency (float): Target p95 download latency, in seconds.
+            max_error_rate (float): Maximum share of 429, 5xx and timed out requests.
+            min_concurrency (int): Lowest concurrency set by the controller.
+            max_concurrency (int): Highest concurrency set by the controller.
+            max_delay (float): Highest download delay set by the controller, in seconds.
+            window (int): Number of requests observed between two decisions.
+            decrease_factor (float): Factor applied to the concurrency when above target.
+        """
+        self.concurrency = min(max(concurrency, min_concurrency), max_concurrency)
+        self.delay = delay
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_delay = max_delay
+        self.window = window
+        self.decrease_factor = decrease_factor
+
+        self.latencies: List[float] = []
+        self.requests = 0
+        self.errors = 0
+        self.last_p95 = 0.0
+        self.last_error_rate = 0.0
+
+    def observe(self, latency: Optional[float], error: bool) -> Optional[str]:
+        """
+        Observe the outcome of a request and decide at the end of a window.
+
+        Args:
+            latency (Optional[float]): The download latency in seconds, None if the request timed out.
+            error (bool): Whether the request was throttled, failed on the server or timed out.
+
+        Returns:
+            Optional[str]: The decision taken, or None if the window is not complete.
+        """
+        if latency is not None:
+            self.latencies.append(latency)
+        self.requests += 1
+        if error:
+            self.errors += 1
+        if self.requests < self.window:
+            return None
+        return self.decide()
+
+    def decide(self) -> str:
+        """
+        Adjust the concurrency and delay from the observations of the window, and start a new window.
+
+        Returns:
+            str: The decision taken: "decrease_concurrency", "increase_delay",
+            "decrease_delay", "increase_concurrency" or "hold".
+        """
+        self.last_p95 = percentile(self.latencies, 0.95)
+        self.last_error_rate = self.errors / self.requests if self.requests else 0.0
+        self.latencies = []
+        self.requests = self.errors = 0
+
+        if self.last_error_rate > self.max_error_rate or self.last_p95 > self.target_latency:
+            if self.concurrency > self.min_concurrency:
+                self.concurrency = max(self.min_concurrency, int(self.concurrency * self.decrease_factor))
+                return "decrease_concurrency"
+            if self.delay < self.max_delay:
+                self.delay = min(self.max_delay, max(self.delay * 2, MIN_DELAY_STEP))
+                return "increase_delay"
+            return "hold"
+
+        if self.delay > 0:
+            self.delay = self.delay / 2 if self.delay / 2 >= MIN_DELAY_STEP else 0.0
+            return "decrease_delay"
+        if self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+            return "increase_concurrency"
+        return "hold"
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+MASK_64 = (1 << 64) - 1
+# Lookup tables turning a byte into 1 when its n-th most significant bit is set, 0 otherwise
+BIT_TABLES = [bytes(1 if value & (0x80 >> bit) else 0 for value in range(256)) for bit in range(8)]
+
+
+class SimHashIndex:
+    """
+    In-memory LSH index of 64 bit SimHash fingerprints, persisted to an append-only file.
+
+    Fingerprints are built from word 3-shingles of the article content. The index
+    splits every fingerprint into ``max_distance + 1`` bands: by the pigeonhole
+    principle two fingerprints within ``max_distance`` bits of each other share at
+    least one identical band, so a lookup only compares the few fingerprints stored
+    under the same band values instead of scanning the whole index.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: int = 3, min_tokens: int = 20, token_cache_size: int = 500000) -> None:
+        """
+        Initialize the index.
+
+        Args:
+            path (Optional[str]): File persisting the fingerprints between runs, or None to keep them in memory only.
+            max_distance (int): Maximum Hamming distance for two fingerprints to be near-duplicates.
+            min_tokens (int): Minimum number of words for a text to be fingerprinted.
+            token_cache_size (int): Maximum number of cached word hashes.
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.token_cache_size = token_cache_size
+        self.token_hashes: Dict[str, int] = {}
+
+        bands = max_distance + 1
+        width, extra = divmod(64, bands)
+        self.bands: List[Tuple[int, int]] = []
+        shift = 64
+        for band in range(bands):
+            size = width + (1 if band < extra else 0)
+            shift -= size
+            self.bands.append((shift, (1 << size) - 1))
+
+        self.fingerprints: List[int] = []
+        self.urls: List[str] = []
+        self.buckets: List[Dict[int, List[int]]] = [{} for _ in self.bands]
+        self.file = None
+
+    def open(self) -> None:
+        """
+        Load the persisted fingerprints and open the index file for appending.
+        """
+        if self.path is None:
+            return
+
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                for line in file:
+                    fingerprint, _, url = line.rstrip("\n").partition("\t")
+                    if url:
+                        self.insert(int(fingerprint, 16), url)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a")
+
+    def close(self) -> None:
+        """
+        Close the index file.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        """
+        Compute the SimHash fingerprint of a text.
+
+        Args:
+            text (str): The text to fingerprint.
+
+        Returns:
+            Optional[int]: The 64 bit fingerprint, or None if the text is too short to be compared reliably.
+        """
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) < self.min_tokens:
+            return None
+
+        cache = self.token_hashes
+        if len(cache) > self.token_cache_size:
+            cache.clear()
+        hashes = [cache.get(token) or self.token_hash(token) for token in tokens]
+
+        # Combine the word hashes of every 3-shingle with odd multipliers so that word order matters
+        shingles = {((a * 0x9E3779B97F4A7C15) ^ (b * 0xC2B2AE3D27D4EB4F) ^ c) & MASK_64 for a, b, c in zip(hashes, hashes[1:], hashes[2:])}
+        packed = b"".join([shingle.to_bytes(8, "big") for shingle in shingles])
+
+        # Majority vote of every bit position, counted column by column on the packed hashes
+        threshold = len(shingles) / 2
+        fingerprint = 0
+        for byte in range(8):
+            column = packed[byte::8]
+            for table in BIT_TABLES:
+                fingerprint <<= 1
+                if column.translate(table).count(1) > threshold:
+                    fingerprint |= 1
+        return fingerprint
+
+    def token_hash(self, token: str) -> int:
+        """
+        Compute and cache the stable 64 bit hash of a word.
+
+        Args:
+            token (str): The word to hash.
+
+        Returns:
+            int: The hash of the word.
+        """
+        value = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+        self.token_hashes[token] = value
+        return value
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """
+        Look up a near-duplicate of a fingerprint.
+
+        Args:
+            fingerprint (int): The fingerprint to look up.
+
+        Returns:
+            Optional[str]: The URL of the closest indexed fingerprint within the maximum distance, or None.
+        """
+        best: Optional[int] = None
+        best_distance = self.max_distance + 1
+        for (shift, mask), buckets in zip(self.bands, self.buckets):
+            for position in buckets.get((fingerprint >> shift) & mask, ()):
+                distance = bin(self.fingerprints[position] ^ fingerprint).count("1")
+                if distance < best_distance:
+                    best, best_distance = position, distance
+        return self.urls[best] if best is not None else None
+
+    def add(self, fingerprint: int, url: str) -> None:
+        """
+        Add a fingerprint to the index and persist it.
+
+        Args:
+            fingerprint (int): The fingerprint to add.
+            url (str): The URL of the article the fingerprint belongs to.
+        """
+        self.insert(fingerprint, url)
+        if self.file is not None:
+            self.file.write(f"{fingerprint:016x}\t{url}\n")
+
+    def insert(self, fingerprint: int, url: str) -> None:
+        """
+        Add a fingerprint to the in-memory band buckets.
+
+        Args:
+            fingerprint (int): The fingerprint to add.
+            url (str): The URL of the article the fingerprint belongs to.
+        """
+        position = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.urls.append(url)
+        for (shift, mask), buckets in zip(self.bands, self.buckets):
+            buckets.setdefault((fingerprint >> shift) & mask, []).append(position)
+
+    def __len__(self) -> int:
+        """
+        Return the number of indexed fingerprints.
+        """
+        return len(self.fingerprints)
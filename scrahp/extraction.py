@@ -0,0 +1,498 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+logger = logging.getLogger(__name__)
+
+# A selector made of an optional tag, optional classes and an optional pseudo-element,
+# e.g. "div.article__body-content ::text", "h1::text" or "a.promo::attr(href)"
+SIMPLE_SELECTOR = re.compile(r"^(?P<tag>[a-zA-Z][\w-]*|\*)?(?P<classes>(?:\.[\w-]+)*)(?P<space>\s*)(?P<pseudo>::text|::attr\((?P<attr>[\w-]+)\))?$")
+
+TEXT_CHILDREN = etree.XPath("text()")
+TEXT_DESCENDANTS = etree.XPath("descendant-or-self::text()")
+
+Extraction = Dict[str, Tuple[Optional[int], List[str]]]
+SelectorIndex = Dict[Tuple[Optional[str], Optional[str]], List[int]]
+
+
+class SimpleSelector:
+    """
+    A CSS selector simple enough to be matched against an element in Python.
+
+    Attributes:
+        tag (Optional[str]): The tag name, or None for any tag.
+        classes (Tuple[str, ...]): The classes the element must have.
+        mode (str): "children" or "descendants" for text, "attr" for an attribute, "html" for the element itself.
+        attr (Optional[str]): The attribute name when mode is "attr".
+    """
+
+    def __init__(self, tag: Optional[str], classes: Tuple[str, ...], mode: str, attr: Optional[str]) -> None:
+        """
+        Initialize the selector.
+
+        Args:
+            tag (Optional[str]): The tag name, or None for any tag.
+            classes (Tuple[str, ...]): The classes the element must have.
+            mode (str): How values are read from the matched elements.
+            attr (Optional[str]): The attribute name when mode is "attr".
+        """
+        self.tag = tag
+        self.classes = classes
+        self.mode = mode
+        self.attr = attr
+
+    @classmethod
+    def parse(cls, css: str) -> Optional["SimpleSelector"]:
+        """
+        Parse a CSS selector, if it is simple.
+
+        Args:
+            css (str): The CSS selector (without any comma).
+
+        Returns:
+            Optional[SimpleSelector]: The parsed selector, or None if it needs a full XPath translation.
+        """
+        match = SIMPLE_SELECTOR.match(css.strip())
+        if match is None or not (match["tag"] or match["classes"]):
+            return None
+
+        tag = match["tag"] if match["tag"] not in (None, "*") else None
+        classes = tuple(name for name in match["classes"].split(".") if name)
+        if match["pseudo"] is None:
+            mode, attr = "html", None
+        elif match["attr"] is not None:
+            mode, attr = "attr", match["attr"]
+        else:
+            mode, attr = ("descendants" if match["space"] else "children"), None
+        return cls(tag, classes, mode, attr)
+
+    def matches(self, element: Any) -> bool:
+        """
+        Check whether an element matches this selector.
+
+        Args:
+            element (Any): The lxml element to check.
+
+        Returns:
+            bool: True if the element matches.
+        """
+        if self.tag is not None and element.tag != self.tag:
+            return False
+        if self.classes:
+            classes = (element.get("class") or "").split()
+            return all(name in classes for name in self.classes)
+        return True
+
+    def values(self, element: Any) -> List[str]:
+        """
+        Read the values selected by the pseudo-element from a matched element.
+
+        Args:
+            element (Any): The matched lxml element.
+
+        Returns:
+            List[str]: The selected values.
+        """
+        if self.mode == "descendants":
+            return [str(text) for text in TEXT_DESCENDANTS(element)]
+        if self.mode == "children":
+            return [str(text) for text in TEXT_CHILDREN(element)]
+        if self.mode == "attr":
+            value = element.get(self.attr)
+            return [value] if value is not None else []
+        return [etree.tostring(element, encoding="unicode", method="html", with_tail=False)]
+
+
+class SelectorEngine:
+    """
+    Extraction engine evaluating ordered lists of CSS queries compiled once.
+
+    Every field is given a list of CSS queries in priority order and is extracted
+    from the first query that extracts a value. Queries made only of simple selectors
+    (tag, classes and a pseudo-element) are indexed by tag and class, so a single
+    pass over the elements of the parsed tree, filtered by tag in lxml, finds the
+    matches of every query of every field at once; the matched elements are then
+    read directly, without running the winning query a second time. Other queries
+    are translated to XPath once and evaluated only when no earlier query of their
+    field matched.
+    """
+
+    def __init__(self, fields: Dict[str, List[str]]) -> None:
+        """
+        Compile the queries of every field.
+
+        Args:
+            fields (Dict[str, List[str]]): The CSS queries of every field, in priority order.
+        """
+        self.fields = fields
+        self.selectors: List[SimpleSelector] = []
+        self.queries: Dict[str, List[Any]] = {}
+        self.xpaths: Dict[str, List[Any]] = {}
+
+        translator = HTMLTranslator()
+        for field, queries in fields.items():
+            compiled: List[Any] = []
+            for query in queries:
+                parts = [SimpleSelector.parse(part) for part in query.split(",")]
+                if all(part is not None for part in parts):
+                    indexes = []
+                    for part in parts:
+                        indexes.append(len(self.selectors))
+                        self.selectors.append(part)  # type: ignore[arg-type]
+                    compiled.append(indexes)
+                else:
+                    compiled.append(None)
+            self.queries[field] = compiled
+            # Every query is also compiled to XPath, for the matches the simple selectors cannot order
+            self.xpaths[field] = [etree.XPath(translator.css_to_xpath(query)) for query in queries]
+
+        self.index, self.tags = self.build_index(range(len(self.selectors)))
+        self.partial_indexes: Dict[Tuple[int, ...], Tuple[SelectorIndex, Tuple[Any, ...]]] = {}
+
+    def build_index(self, selector_indexes: Iterable[int]) -> Tuple[SelectorIndex, Tuple[Any, ...]]:
+        """
+        Index simple selectors by (tag, first class) so that every element is checked with a few dict lookups.
+
+        Args:
+            selector_indexes (Iterable[int]): The indexes of the simple selectors to index.
+
+        Returns:
+            Tuple[SelectorIndex, Tuple[Any, ...]]: The index and the tags lxml must iterate over.
+        """
+        index: SelectorIndex = {}
+        tags = set()
+        for selector_index in selector_indexes:
+            selector = self.selectors[selector_index]
+            index.setdefault((selector.tag, selector.classes[0] if selector.classes else None), []).append(selector_index)
+            tags.add(selector.tag)
+        return index, ((etree.Element,) if None in tags else tuple(tags))
+
+    def extract(self, root: Any, order: Optional[Dict[str, List[int]]] = None) -> Extraction:
+        """
+        Extract every field from a parsed document.
+
+        The queries of a field are always won by the first one in priority order that
+        extracts a value. With an ``order`` (e.g. learned by SelectorStats), a first pass
+        restricted to the selectors of the learned winner of every field and of the queries
+        of higher priority is tried: when it extracts every field, no query of lower priority
+        needs to be matched. Otherwise every query is evaluated.
+
+        Args:
+            root (Any): The root lxml element, e.g. ``response.selector.root``.
+            order (Optional[Dict[str, List[int]]]): Query indexes of every field, the expected winner first.
+
+        Returns:
+            Extraction: For every field, the index of the matching query (None if none matched) and the extracted values.
+        """
+        if order is not None:
+            # The expected winner can only win if none of the queries before it extracts a value
+            candidates = {field: list(range((order.get(field) or [0])[0] + 1)) for field in self.queries}
+            selector_indexes = tuple(sorted({i for field, indexes in candidates.items() for q in indexes for i in self.simple_selectors(field, q)}))
+            if selector_indexes not in self.partial_indexes:
+                self.partial_indexes[selector_indexes] = self.build_index(selector_indexes)
+            extraction = self.evaluate(root, candidates, self.scan(root, *self.partial_indexes[selector_indexes]))
+            if all(query_index is not None for query_index, _ in extraction.values()):
+                return extraction
+
+        priorities = {field: list(range(len(compiled))) for field, compiled in self.queries.items()}
+        return self.evaluate(root, priorities, self.scan(root, self.index, self.tags))
+
+    def simple_selectors(self, field: str, query_index: int) -> List[int]:
+        """
+        Return the simple selector indexes of a query, empty for queries compiled to XPath.
+
+        Args:
+            field (str): The field of the query.
+            query_index (int): The index of the query in the field.
+
+        Returns:
+            List[int]: The simple selector indexes.
+        """
+        return self.queries[field][query_index] or []
+
+    def evaluate(self, root: Any, order: Dict[str, List[int]], matches: Dict[int, List[Tuple[int, Any]]]) -> Extraction:
+        """
+        Evaluate the given queries of every field in order, stopping at the first one that extracts a value.
+
+        Like ``len(response.css(query)) > 0``, a query matching elements without any text
+        (e.g. an empty author block) does not stop the evaluation.
+
+        Args:
+            root (Any): The root lxml element.
+            order (Dict[str, List[int]]): Query indexes of every field in evaluation order.
+            matches (Dict[int, List[Tuple[int, Any]]]): The elements matched by the simple selectors.
+
+        Returns:
+            Extraction: For every field, the index of the matching query (None if none matched) and the extracted values.
+        """
+        extraction: Extraction = {}
+        for field, indexes in order.items():
+            extraction[field] = (None, [])
+            for query_index in indexes:
+                query = self.queries[field][query_index]
+                values = self.read_matches(query, matches) if query is not None else None
+                if values is None:
+                    values = self.xpath_values(self.xpaths[field][query_index], root)
+                if not values:
+                    continue
+                extraction[field] = (query_index, values)
+                break
+        return extraction
+
+    def scan(self, root: Any, index: SelectorIndex, tags: Tuple[Any, ...]) -> Dict[int, List[Tuple[int, Any]]]:
+        """
+        Match indexed simple selectors in a single pass over the elements of the document.
+
+        Args:
+            root (Any): The root lxml element.
+            index (SelectorIndex): The selectors indexed by (tag, first class).
+            tags (Tuple[Any, ...]): The tags to iterate over.
+
+        Returns:
+            Dict[int, List[Tuple[int, Any]]]: The (document position, element) pairs matched by every selector.
+        """
+        matches: Dict[int, List[Tuple[int, Any]]] = {}
+        if not index:
+            return matches
+
+        for position, element in enumerate(root.iter(*tags)):
+            tag = element.tag
+            keys: List[Tuple[Optional[str], Optional[str]]] = [(tag, None), (None, None)]
+            classes = element.get("class")
+            if classes:
+                for name in classes.split():
+                    keys.append((tag, name))
+                    keys.append((None, name))
+
+            for key in keys:
+                for selector_index in index.get(key, ()):
+                    if self.selectors[selector_index].matches(element):
+                        matches.setdefault(selector_index, []).append((position, element))
+        return matches
+
+    @staticmethod
+    def xpath_values(xpath: Any, root: Any) -> List[str]:
+        """
+        Evaluate a query compiled to XPath.
+
+        Args:
+            xpath (Any): The compiled XPath of the query.
+            root (Any): The root lxml element.
+
+        Returns:
+            List[str]: The selected texts and attributes, and the HTML of the selected elements.
+        """
+        return [
+            str(result) if isinstance(result, str) else etree.tostring(result, encoding="unicode", method="html", with_tail=False)
+            for result in xpath(root)
+        ]
+
+    def read_matches(self, indexes: List[int], matches: Dict[int, List[Tuple[int, Any]]]) -> Optional[List[str]]:
+        """
+        Read the values of a query made of simple selectors from the matched elements.
+
+        Elements are read in document order, like an XPath union, and an element nested
+        in another matched element reading all its descendant texts is skipped so that
+        no text is returned twice. Any other nesting (e.g. an element whose text children
+        surround another matched element) interleaves the values of both elements, which
+        only the XPath of the query returns in document order.
+
+        Args:
+            indexes (List[int]): The indexes of the simple selectors of the query.
+            matches (Dict[int, List[Tuple[int, Any]]]): The (document position, element) pairs matched by every selector.
+
+        Returns:
+            Optional[List[str]]: The values, empty if no selector of the query matched, or None if the query must be
+            evaluated with its XPath.
+        """
+        found = sorted(
+            ((position, element, self.selectors[index]) for index in indexes for position, element in matches.get(index, ())),
+            key=lambda match: match[0],
+        )
+
+        values: List[str] = []
+        modes: Dict[Any, str] = {}
+        for _, element, selector in found:
+            if element in modes:
+                # Matched by another selector of the query, which may read other values of it
+                if modes[element] != selector.mode:
+                    return None
+                continue
+            if modes:
+                ancestors = [modes[ancestor] for ancestor in element.iterancestors() if ancestor in modes]
+                if "descendants" in ancestors and selector.mode in ("children", "descendants"):
+                    continue
+                if "children" in ancestors or "descendants" in ancestors:
+                    return None
+            modes[element] = selector.mode
+            values.extend(selector.values(element))
+        return values
+
+
+def matched_query(match: Tuple[Optional[int], List[str]]) -> Optional[int]:
+    """
+    Return the query that filled a field, for the statistics.
+
+    A query extracting only blank texts wins its field, like the former query chain
+    did, but the field still falls back to "n/a" once the values are cleaned.
+
+    Args:
+        match (Tuple[Optional[int], List[str]]): The index of the matching query and the values of a field.
+
+    Returns:
+        Optional[int]: The index of the query, or None if no query extracted a non-blank value.
+    """
+    query_index, values = match
+    return query_index if any(value.strip() for value in values) else None
+
+
+class SelectorStats:
+    """
+    Hit-rate statistics of the extraction queries, per field and URL path prefix.
+
+    Every extracted page records which query matched each field (or a miss when the
+    field fell back to "n/a"), under the first segment of the URL path ("/news/",
+    "/sport/"...). Besides plain counters, every query keeps an exponentially decayed
+    score, so that the learned order follows layout changes within a few hundred
+    pages. The statistics are persisted as JSON between runs.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_samples: int = 20, decay: float = 0.99) -> None:
+        """
+        Initialize the statistics.
+
+        Args:
+            path (Optional[str]): JSON file persisting the statistics, or None to keep them in memory only.
+            min_samples (int): Number of pages a prefix needs before its learned order is used.
+            decay (float): Factor applied to the scores of a field at every page.
+        """
+        self.path = path
+        self.min_samples = min_samples
+        self.decay = decay
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.run: Dict[Tuple[str, str], List[int]] = {}
+
+    @staticmethod
+    def prefix(url: str) -> str:
+        """
+        Return the path prefix of a URL used to group its statistics.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            str: The first segment of the path, e.g. "/news/", or "/" for the home page.
+        """
+        segment = urlsplit(url).path.strip("/").split("/")[0]
+        return f"/{segment}/" if segment else "/"
+
+    def load(self) -> None:
+        """
+        Load the statistics of the previous runs, if any.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as file:
+                self.data = json.load(file)
+        except ValueError:
+            logger.warning("Ignoring unreadable selector statistics file %s", self.path)
+
+    def save(self) -> None:
+        """
+        Persist the statistics.
+        """
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.data, file, indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def record(self, prefix: str, field: str, query: Optional[str]) -> None:
+        """
+        Record the query that matched a field on a page.
+
+        Args:
+            prefix (str): The path prefix of the page.
+            field (str): The extracted field.
+            query (Optional[str]): The matching query, or None if no query matched.
+        """
+        entry = self.data.setdefault(prefix, {}).setdefault(field, {"pages": 0, "misses": 0, "hits": {}, "scores": {}})
+        entry["pages"] += 1
+        scores = entry["scores"]
+        for key in scores:
+            scores[key] *= self.decay
+
+        run = self.run.setdefault((prefix, field), [0, 0])
+        run[0] += 1
+        if query is None:
+            entry["misses"] += 1
+            run[1] += 1
+        else:
+            entry["hits"][query] = entry["hits"].get(query, 0) + 1
+            scores[query] = scores.get(query, 0.0) + 1.0
+
+    def order(self, prefix: str, fields: Dict[str, List[str]]) -> Optional[Dict[str, List[int]]]:
+        """
+        Return the learned evaluation order of the queries of every field for a prefix.
+
+        Args:
+            prefix (str): The path prefix of the page.
+            fields (Dict[str, List[str]]): The queries of every field, in priority order.
+
+        Returns:
+            Optional[Dict[str, List[int]]]: Query indexes by decreasing score (ties keep their priority), or None
+            while a field of the prefix has fewer than ``min_samples`` pages or no matching query.
+        """
+        entries = self.data.get(prefix, {})
+        order: Dict[str, List[int]] = {}
+        for field, queries in fields.items():
+            entry = entries.get(field)
+            # A field that usually misses would make the short-circuit pass fail on every page
+            if entry is None or entry["pages"] < self.min_samples or not any(entry["scores"].get(query) for query in queries):
+                return None
+            scores = entry["scores"]
+            order[field] = sorted(range(len(queries)), key=lambda i: (-scores.get(queries[i], 0.0), i))
+        return order
+
+    def hit_rates(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Return the hit rate of every query, and the miss rate, per prefix and field.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, float]]]: Rates keyed by prefix, field and query ("n/a" for misses).
+        """
+        rates: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for prefix, fields in self.data.items():
+            for field, entry in fields.items():
+                pages = entry["pages"] or 1
+                field_rates = {query: round(hits / pages, 4) for query, hits in entry["hits"].items()}
+                field_rates["n/a"] = round(entry["misses"] / pages, 4)
+                rates.setdefault(prefix, {})[field] = field_rates
+        return rates
+
+    def alerts(self, max_miss_rate: float) -> List[Tuple[str, str, float]]:
+        """
+        Return the prefixes and fields whose miss rate during this run exceeds a threshold.
+
+        Args:
+            max_miss_rate (float): The highest acceptable share of pages falling back to "n/a".
+
+        Returns:
+            List[Tuple[str, str, float]]: The (prefix, field, miss rate) with at least ``min_samples`` pages this run.
+        """
+        return [
+            (prefix, field, misses / pages)
+            for (prefix, field), (pages, misses) in self.run.items()
+            if pages >= self.min_samples and misses / pages > max_miss_rate
+        ]
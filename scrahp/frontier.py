@@ -0,0 +1,447 @@
+"""
+Shared crawl frontier, letting several articles spider processes crawl disjoint URL batches.
+
+Workers lease batches of pending URLs, report them done or failed, and renew the
+leases they hold while they work. The leases of a crashed worker expire after
+the lease timeout and their URLs are leased again by the other workers.
+
+The frontier is a SQLite database, shared by the workers of a host. Workers of
+other hosts go through a FrontierServer exposing the same operations over HTTP,
+to the clients sending its token (FRONTIER_TOKEN).
+
+Usage:
+    python -m scrahp.frontier seed data/urls.jsonl
+    python -m scrahp.frontier serve --host 10.0.0.1 --port 8790 --token <secret>
+    python -m scrahp.frontier status
+"""
+
+import argparse
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PENDING, LEASED, DONE, FAILED = 0, 1, 2, 3
+STATES = {PENDING: "pending", LEASED: "leased", DONE: "done", FAILED: "failed"}
+
+
+class Frontier:
+    """
+    SQLite frontier of the URLs to crawl, safe to share between processes of a host.
+
+    Leasing is a single ``UPDATE ... RETURNING`` statement, so two workers never
+    lease the same pending URL, and a URL whose lease expired is leased again as if
+    it were pending. Every lease counts as an attempt: a URL whose lease expired
+    ``max_attempts`` times (e.g. a page crashing its workers) is given up like a URL
+    that failed ``max_attempts`` times.
+
+    The operations are serialized by a lock, so a frontier can be shared by the
+    threads of a process.
+    """
+
+    def __init__(self, path: str = "data/frontier.db", lease_timeout: float = 300.0, max_attempts: int = 3) -> None:
+        """
+        Open the frontier, creating it if needed.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            lease_timeout (float): Number of seconds after which a lease expires unless renewed.
+            max_attempts (int): Number of failed or expired leases after which a URL is given up.
+        """
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                state INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                added_at REAL,
+                done_at REAL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state, lease_expires)")
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        with self.lock:
+            self.conn.close()
+
+    def add(self, urls: Iterable[str]) -> int:
+        """
+        Add URLs to the frontier, ignoring the URLs it already holds whatever their state.
+
+        Args:
+            urls (Iterable[str]): The URLs to add.
+
+        Returns:
+            int: The number of URLs added.
+        """
+        now = time.time()
+        with self.lock, self.transaction():
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO frontier (url, added_at) VALUES (?, ?)", ((url, now) for url in urls))
+            return self.conn.total_changes - before
+
+    def lease(self, worker: str, size: int) -> List[str]:
+        """
+        Lease a batch of pending URLs, or of URLs whose lease expired.
+
+        The URLs whose lease expired after their last attempt are given up first.
+
+        Args:
+            worker (str): The identifier of the leasing worker.
+            size (int): The maximum number of URLs to lease.
+
+        Returns:
+            List[str]: The leased URLs, empty when there is nothing to lease.
+        """
+        now = time.time()
+        with self.lock, self.transaction():
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, worker = NULL, lease_expires = NULL WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            rows = self.conn.execute(
+                "UPDATE frontier SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE url IN (SELECT url FROM frontier WHERE state = ? OR (state = ? AND lease_expires < ?) LIMIT ?) RETURNING url",
+                (LEASED, worker, now + self.lease_timeout, PENDING, LEASED, now, size),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def renew(self, worker: str) -> int:
+        """
+        Extend every lease held by a worker.
+
+        Args:
+            worker (str): The identifier of the worker.
+
+        Returns:
+            int: The number of renewed leases.
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE frontier SET lease_expires = ? WHERE state = ? AND worker = ?",
+                (time.time() + self.lease_timeout, LEASED, worker),
+            )
+            return cursor.rowcount
+
+    def complete(self, worker: str, urls: List[str]) -> None:
+        """
+        Mark leased URLs as done.
+
+        Only the URLs still leased by the worker are updated: once its lease expired, a URL
+        may be leased by another worker, whose lease is left untouched.
+
+        Args:
+            worker (str): The identifier of the worker reporting them.
+            urls (List[str]): The crawled URLs.
+        """
+        now = time.time()
+        with self.lock, self.transaction():
+            self.conn.executemany(
+                "UPDATE frontier SET state = ?, done_at = ? WHERE url = ? AND state = ? AND worker = ?",
+                ((DONE, now, url, LEASED, worker) for url in urls),
+            )
+
+    def fail(self, worker: str, urls: List[str]) -> None:
+        """
+        Put failed URLs back in the frontier, or give them up after ``max_attempts`` leases.
+
+        As for complete, only the URLs still leased by the worker are updated.
+
+        Args:
+            worker (str): The identifier of the worker reporting them.
+            urls (List[str]): The URLs that could not be crawled.
+        """
+        with self.lock, self.transaction():
+            self.conn.executemany(
+                "UPDATE frontier SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, lease_expires = NULL "
+                "WHERE url = ? AND state = ? AND worker = ?",
+                ((self.max_attempts, FAILED, PENDING, url, LEASED, worker) for url in urls),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count the URLs of every state.
+
+        Returns:
+            Dict[str, int]: The number of URLs per state name.
+        """
+        counts = {name: 0 for name in STATES.values()}
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall()
+        for state, count in rows:
+            counts[STATES[state]] = count
+        return counts
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Wrap statements in a single write transaction, taking the write lock upfront.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+
+class RemoteFrontier:
+    """
+    Client of a FrontierServer, with the same operations as a Frontier.
+
+    The calls block until the server answers: the spiders make them from a thread
+    of the reactor thread pool.
+    """
+
+    def __init__(self, url: str, token: str, timeout: float = 30.0) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            url (str): The base URL of the server, e.g. http://crawler-1:8790.
+            token (str): The token of the server.
+            timeout (float): Timeout of every call, in seconds.
+        """
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def call(self, operation: str, **payload: Any) -> Any:
+        """
+        Call an operation of the server.
+
+        Args:
+            operation (str): The name of the operation.
+            **payload (Any): The arguments of the operation.
+
+        Returns:
+            Any: The result of the operation.
+        """
+        request = urllib.request.Request(
+            f"{self.url}/{operation}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)["result"]
+
+    def close(self) -> None:
+        """
+        Nothing to close, the connections are not kept alive.
+        """
+
+    def add(self, urls: Iterable[str]) -> int:
+        """
+        See Frontier.add.
+        """
+        return self.call("add", urls=list(urls))
+
+    def lease(self, worker: str, size: int) -> List[str]:
+        """
+        See Frontier.lease.
+        """
+        return self.call("lease", worker=worker, size=size)
+
+    def renew(self, worker: str) -> int:
+        """
+        See Frontier.renew.
+        """
+        return self.call("renew", worker=worker)
+
+    def complete(self, worker: str, urls: List[str]) -> None:
+        """
+        See Frontier.complete.
+        """
+        self.call("complete", worker=worker, urls=urls)
+
+    def fail(self, worker: str, urls: List[str]) -> None:
+        """
+        See Frontier.fail.
+        """
+        self.call("fail", worker=worker, urls=urls)
+
+    def counts(self) -> Dict[str, int]:
+        """
+        See Frontier.counts.
+        """
+        return self.call("counts")
+
+
+class FrontierServer(ThreadingHTTPServer):
+    """
+    HTTP server exposing a Frontier to the workers of other hosts.
+
+    Every operation is a POST to ``/<operation>`` with its arguments as a JSON
+    object and an ``Authorization: Bearer <token>`` header, answered with
+    ``{"result": ...}``. The requests without the token are rejected with a 401.
+    """
+
+    OPERATIONS = ("add", "lease", "renew", "complete", "fail", "counts")
+
+    def __init__(self, address: Any, frontier: Frontier, token: str) -> None:
+        """
+        Initialize the server.
+
+        Args:
+            address (Any): The (host, port) to listen on.
+            frontier (Frontier): The frontier to expose.
+            token (str): The token the clients must send.
+
+        Raises:
+            ValueError: If the token is empty.
+        """
+        if not token:
+            raise ValueError("The frontier server needs a token")
+        super().__init__(address, FrontierRequestHandler)
+        self.frontier = frontier
+        self.token = token
+
+
+class FrontierRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the FrontierServer requests.
+    """
+
+    server: FrontierServer
+
+    def do_POST(self) -> None:
+        authorization = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {self.server.token}".encode("utf-8")):
+            self.send_error(401, "Invalid token")
+            return
+        operation = self.path.strip("/")
+        if operation not in FrontierServer.OPERATIONS:
+            self.send_error(404, f"Unknown operation {operation}")
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            result = getattr(self.server.frontier, operation)(**payload)
+        except (ValueError, TypeError) as error:
+            self.send_error(400, str(error))
+            return
+
+        body = json.dumps({"result": result}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+def open_frontier(location: str, lease_timeout: float = 300.0, max_attempts: int = 3, token: Optional[str] = None) -> Union[Frontier, RemoteFrontier]:
+    """
+    Open a local frontier, or connect to a FrontierServer.
+
+    Args:
+        location (str): Path of the SQLite database, or http(s) URL of a FrontierServer.
+        lease_timeout (float): Lease timeout of a local frontier, in seconds.
+        max_attempts (int): Maximum number of leases of a URL of a local frontier.
+        token (Optional[str]): Token of the FrontierServer.
+
+    Returns:
+        Union[Frontier, RemoteFrontier]: The frontier.
+
+    Raises:
+        ValueError: If a FrontierServer is given without token.
+    """
+    if location.startswith(("http://", "https://")):
+        if not token:
+            raise ValueError("Set FRONTIER_TOKEN to the token of the frontier server")
+        return RemoteFrontier(location, token)
+    return Frontier(location, lease_timeout=lease_timeout, max_attempts=max_attempts)
+
+
+def read_urls(file_path: str) -> Iterator[str]:
+    """
+    Read the URLs of a JSONL file written by the JsonWriterPipeline.
+
+    Args:
+        file_path (str): Path to the JSONL file.
+
+    Yields:
+        str: The URLs of the file.
+    """
+    with open(file_path, "r") as file:
+        for line in file:
+            try:
+                yield json.loads(line)["url"]
+            except (ValueError, KeyError):
+                continue
+
+
+def main() -> None:
+    """
+    Seed, serve or inspect a frontier from the command line.
+    """
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "scrahp.settings")
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    parser = argparse.ArgumentParser(description="Manage the shared crawl frontier of the articles spiders.")
+    parser.add_argument("--frontier", default=settings.get("FRONTIER", "data/frontier.db"), help="frontier database or server URL")
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed = commands.add_parser("seed", help="add the URLs of a JSONL file")
+    seed.add_argument("file", nargs="?", default="data/urls.jsonl")
+    serve = commands.add_parser("serve", help="serve a local frontier to the workers of other hosts")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on, e.g. the private address of the host")
+    serve.add_argument("--port", type=int, default=8790)
+    serve.add_argument("--token", default=settings.get("FRONTIER_TOKEN"), help="token the workers must send, defaults to FRONTIER_TOKEN")
+    commands.add_parser("status", help="count the URLs of every state")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    frontier = open_frontier(
+        args.frontier,
+        lease_timeout=settings.getfloat("FRONTIER_LEASE_TIMEOUT", 300.0),
+        max_attempts=settings.getint("FRONTIER_MAX_ATTEMPTS", 3),
+        token=settings.get("FRONTIER_TOKEN"),
+    )
+    try:
+        if args.command == "seed":
+            logger.info("Added %d URLs from %s", frontier.add(read_urls(args.file)), args.file)
+        elif args.command == "serve":
+            if not isinstance(frontier, Frontier):
+                parser.error("serve needs a local frontier database")
+            if not args.token:
+                parser.error("serve needs a token: set --token or FRONTIER_TOKEN")
+            server = FrontierServer((args.host, args.port), frontier, args.token)
+            logger.info("Serving %s on %s:%d", args.frontier, args.host, args.port)
+            server.serve_forever()
+        else:
+            logger.info("Frontier %s: %s", args.frontier, frontier.counts())
+    finally:
+        frontier.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from scrahp.writers import BatchingWriter
+
+logger = logging.getLogger(__name__)
+
+UPSERT_VALIDATORS = (
+    "INSERT INTO validators (url, etag, last_modified, body_hash, body_size, parse_time, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, "
+    "body_hash = excluded.body_hash, body_size = excluded.body_size, parse_time = excluded.parse_time, updated_at = excluded.updated_at"
+)
+UPDATE_PARSE_TIME = "UPDATE validators SET parse_time = ? WHERE url = ?"
+
+# (statement, parameters) of a write of the ValidatorWriter
+ValidatorWrite = Tuple[str, Tuple[Any, ...]]
+
+
+class Validators(NamedTuple):
+    """
+    What is known about the last crawled version of a URL.
+    """
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: str
+    body_size: int
+    parse_time: float
+
+
+class ValidatorWriter(BatchingWriter):
+    """
+    Background thread writing the validators, one transaction per batch.
+
+    The validators only save bandwidth on the next crawl: a batch that cannot be
+    written is logged and dropped, and its pages are fully crawled again.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = 100, flush_interval: float = 2.0, queue_size: int = 10000) -> None:
+        """
+        Initialize the writer thread.
+
+        Args:
+            conn (sqlite3.Connection): Connection opened with ``check_same_thread=False``, owned by the writer.
+            batch_size (int): Number of writes per transaction.
+            flush_interval (float): Maximum number of seconds a write can stay buffered.
+            queue_size (int): Maximum number of pending writes before the next ones wait in line.
+        """
+        super().__init__("validator-writer", batch_size, flush_interval, queue_size)
+        self.conn = conn
+
+    def write_batch(self, batch: List[ValidatorWrite]) -> None:
+        """
+        Execute a batch of writes in a single transaction.
+
+        Args:
+            batch (List[ValidatorWrite]): The (statement, parameters) of the writes.
+        """
+        try:
+            with self.conn:
+                for statement, parameters in batch:
+                    self.conn.execute(statement, parameters)
+        except sqlite3.Error:
+            logger.exception("Failed to write the validators of %d pages", len(batch))
+
+
+class ValidatorStore:
+    """
+    SQLite store of the HTTP validators and body hash of every crawled URL.
+
+    Used for incremental recrawls: the ETag and Last-Modified headers are sent back
+    as conditional request headers, and the body hash detects unchanged pages of
+    servers ignoring them. The time the spider spent parsing every URL is kept too,
+    to report the parse time saved by skipped pages.
+
+    The validators of a response are staged in memory until the article of the page
+    is stored (``commit``): a page whose article was lost in a crash is not skipped
+    by the next crawl. Lookups run on the calling thread, writes are handed over to
+    a ValidatorWriter thread and never block it.
+    """
+
+    def __init__(self, path: str = "data/validators.db", commit_interval: int = 100, flush_interval: float = 2.0) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            commit_interval (int): Number of writes per transaction of the writer thread.
+            flush_interval (float): Maximum number of seconds between two transactions.
+        """
+        self.path = path
+        self.commit_interval = commit_interval
+        self.flush_interval = flush_interval
+        self.conn: Optional[sqlite3.Connection] = None
+        self.writer: Optional[ValidatorWriter] = None
+        # Validators of the responses whose article is not stored yet
+        self.pending: Dict[str, Validators] = {}
+
+    def open(self) -> None:
+        """
+        Open the database, creating it if needed, and start the writer thread.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                body_size INTEGER,
+                parse_time REAL DEFAULT 0,
+                updated_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+        writer_conn = sqlite3.connect(self.path, check_same_thread=False)
+        writer_conn.execute("PRAGMA synchronous=NORMAL")
+        self.writer = ValidatorWriter(writer_conn, batch_size=self.commit_interval, flush_interval=self.flush_interval)
+        self.writer.start()
+
+    def close(self) -> None:
+        """
+        Write the pending writes and close the database. Validators still staged are discarded.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer.conn.close()
+            self.writer = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.pending = {}
+
+    def get(self, url: str) -> Optional[Validators]:
+        """
+        Look up the validators of a URL.
+
+        Args:
+            url (str): The URL to look up.
+
+        Returns:
+            Optional[Validators]: The validators, or None if the URL was never crawled.
+        """
+        assert self.conn is not None
+        row = self.conn.execute("SELECT etag, last_modified, body_hash, body_size, parse_time FROM validators WHERE url = ?", (url,)).fetchone()
+        return Validators(*row) if row is not None else None
+
+    def stage(self, url: str, etag: Optional[str], last_modified: Optional[str], body_hash: str, body_size: int) -> None:
+        """
+        Keep the validators of the last crawled version of a URL until its article is stored.
+
+        Args:
+            url (str): The crawled URL.
+            etag (Optional[str]): The ETag header of the response.
+            last_modified (Optional[str]): The Last-Modified header of the response.
+            body_hash (str): The hash of the response body.
+            body_size (int): The size of the response body.
+        """
+        self.pending[url] = Validators(etag, last_modified, body_hash, body_size, 0.0)
+
+    def commit(self, url: str) -> None:
+        """
+        Store the staged validators of a URL, if any.
+
+        Args:
+            url (str): The URL whose article was stored.
+        """
+        validators = self.pending.pop(url, None)
+        if validators is not None:
+            self.write(UPSERT_VALIDATORS, (url, *validators, time.time()))
+
+    def discard(self, url: str) -> None:
+        """
+        Forget the staged validators of a URL whose article was not stored.
+
+        Args:
+            url (str): The URL to forget.
+        """
+        self.pending.pop(url, None)
+
+    def update_parse_time(self, url: str, parse_time: float) -> None:
+        """
+        Store the time the spider spent parsing a URL, with its staged validators if any.
+
+        Args:
+            url (str): The parsed URL.
+            parse_time (float): The parse time in seconds.
+        """
+        validators = self.pending.get(url)
+        if validators is not None:
+            self.pending[url] = validators._replace(parse_time=parse_time)
+        else:
+            self.write(UPDATE_PARSE_TIME, (parse_time, url))
+
+    def write(self, statement: str, parameters: Tuple[Any, ...]) -> None:
+        """
+        Hand a write over to the writer thread, without blocking.
+
+        Args:
+            statement (str): The SQL statement.
+            parameters (Tuple[Any, ...]): Its parameters.
+        """
+        assert self.writer is not None
+        self.writer.offer((statement, parameters))
+
+    @staticmethod
+    def body_hash(body: bytes) -> str:
+        """
+        Hash a response body.
+
+        Args:
+            body (bytes): The body to hash.
+
+        Returns:
+            str: The hex digest of the body.
+        """
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
@@ -9,11 +9,13 @@ class Url(scrapy.Item):
         title (scrapy.Field): The title of the article.
         base_url (scrapy.Field): The base URL of the article's website.
         url (scrapy.Field): The full URL of the article.
+        published (scrapy.Field): The ISO publication or modification date of the article, when a feed gives it.
     """
 
     title = scrapy.Field()
     base_url = scrapy.Field()
     url = scrapy.Field()
+    published = scrapy.Field()
 
 
 class Article(scrapy.Item):
@@ -25,9 +27,11 @@ class Article(scrapy.Item):
         url (scrapy.Field): The full URL of the article.
         author (scrapy.Field): The author of the article.
         content (scrapy.Field): The full text content of the article.
+        duplicate_of (scrapy.Field): The URL of the article this one is a near-duplicate of, if any.
     """
 
     title = scrapy.Field()  # Title of the article
     url = scrapy.Field()  # URL of the article
     author = scrapy.Field()  # Author of the article
     content = scrapy.Field()  # Content of the article
+    duplicate_of = scrapy.Field()  # URL of the original article for near-duplicates
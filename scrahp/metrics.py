@@ -0,0 +1,476 @@
+"""
+Per stage crawl metrics: latency histograms kept by the stats collector and exported periodically.
+
+Every stage of the crawl (download, parse, Loader, item pipelines, background
+writers) records its durations and sizes in histograms of the MetricsStatsCollector.
+The MetricsExporter extension writes them, with the numeric crawl stats and the
+depth of the Scrapy queues, as a Prometheus text file (for the node exporter
+textfile collector) or as JSON lines, every METRICS_INTERVAL seconds.
+"""
+
+import functools
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector, StatsCollector
+from twisted.internet.task import LoopingCall
+
+# Upper bounds of the histogram buckets, in seconds
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Upper bounds of the histogram buckets, in bytes
+SIZE_BUCKETS: Tuple[float, ...] = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Upper bounds of the histogram buckets, in records
+COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets, cheap enough to observe every page and item.
+
+    Quantiles are estimated by interpolating inside the bucket holding them.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets (Sequence[float]): The sorted upper bounds of the buckets, an overflow bucket is added.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value.
+
+        Args:
+            value (float): The observed value.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def copy(self) -> "Histogram":
+        """
+        Copy the histogram, for a consistent export while other threads keep observing.
+
+        Returns:
+            Histogram: The copy.
+        """
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.total = self.total
+        return histogram
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile of the recorded values.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimated value, the largest bucket bound for values in the overflow bucket, 0 if empty.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return float(self.buckets[-1])
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return float(self.buckets[-1])
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Summarize the histogram.
+
+        Returns:
+            Dict[str, float]: The count, sum, mean and the estimated quantiles of QUANTILES.
+        """
+        summary = {"count": self.count, "sum": round(self.total, 6), "mean": round(self.total / self.count, 6) if self.count else 0.0}
+        for q in QUANTILES:
+            summary[f"p{int(q * 100)}"] = round(self.quantile(q), 6)
+        return summary
+
+
+class MetricsStatsCollector(MemoryStatsCollector):
+    """
+    Stats collector also keeping histograms of the values observed by the crawl stages.
+
+    Enabled with STATS_CLASS. The writer threads update the stats and observe
+    histograms while the reactor thread reads and exports them, so both are guarded
+    by a lock, and ``get_stats`` returns a copy rather than the live dict.
+    """
+
+    def __init__(self, crawler: Crawler) -> None:
+        """
+        Initialize the collector.
+
+        Args:
+            crawler (Crawler): The running crawler.
+        """
+        super().__init__(crawler)
+        self.histograms: Dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+
+    def get_stats(self, spider: Optional[Spider] = None) -> Dict[str, Any]:
+        """
+        Copy the stats.
+
+        Args:
+            spider (Optional[Spider]): Unused, kept for the StatsCollector interface.
+
+        Returns:
+            Dict[str, Any]: A snapshot of the stats.
+        """
+        with self.lock:
+            return dict(self._stats)
+
+    def set_value(self, key: str, value: Any, spider: Optional[Spider] = None) -> None:
+        """
+        Set a stat under the lock.
+        """
+        with self.lock:
+            super().set_value(key, value, spider)
+
+    def set_stats(self, stats: Dict[str, Any], spider: Optional[Spider] = None) -> None:
+        """
+        Replace the stats under the lock.
+        """
+        with self.lock:
+            super().set_stats(stats, spider)
+
+    def inc_value(self, key: str, count: float = 1, start: float = 0, spider: Optional[Spider] = None) -> None:
+        """
+        Increment a stat under the lock.
+        """
+        with self.lock:
+            super().inc_value(key, count, start, spider)  # type: ignore[arg-type]
+
+    def max_value(self, key: str, value: Any, spider: Optional[Spider] = None) -> None:
+        """
+        Keep the highest value of a stat under the lock.
+        """
+        with self.lock:
+            super().max_value(key, value, spider)
+
+    def min_value(self, key: str, value: Any, spider: Optional[Spider] = None) -> None:
+        """
+        Keep the lowest value of a stat under the lock.
+        """
+        with self.lock:
+            super().min_value(key, value, spider)
+
+    def clear_stats(self, spider: Optional[Spider] = None) -> None:
+        """
+        Clear the stats under the lock.
+        """
+        with self.lock:
+            super().clear_stats(spider)
+
+    def observe(self, key: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """
+        Record a value in the histogram of a key, created on first use.
+
+        Args:
+            key (str): The name of the histogram.
+            value (float): The observed value.
+            buckets (Sequence[float]): The buckets of the histogram, when it is created.
+        """
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def get_histograms(self) -> Dict[str, Histogram]:
+        """
+        Copy the histograms.
+
+        Returns:
+            Dict[str, Histogram]: A snapshot of every histogram.
+        """
+        with self.lock:
+            return {key: histogram.copy() for key, histogram in self.histograms.items()}
+
+
+def observe(stats: Optional[StatsCollector], key: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+    """
+    Record a value in a histogram, if the stats collector keeps histograms.
+
+    Args:
+        stats (Optional[StatsCollector]): The stats collector of the crawl, if any.
+        key (str): The name of the histogram.
+        value (float): The observed value.
+        buckets (Sequence[float]): The buckets of the histogram, when it is created.
+    """
+    if isinstance(stats, MetricsStatsCollector):
+        stats.observe(key, value, buckets)
+
+
+def timed_stage(method: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorate the process_item method of an item pipeline to record its duration.
+
+    The time is observed in the "pipeline/<class name>/seconds" histogram. For
+    pipelines handing back a Deferred, only the time spent on the reactor thread
+    is recorded; the wait shows up in the queue depths of the writers.
+
+    Args:
+        method (Callable[..., Any]): The process_item method.
+
+    Returns:
+        Callable[..., Any]: The decorated method.
+    """
+
+    @functools.wraps(method)
+    def process_item(self: Any, item: Any, spider: Spider) -> Any:
+        start = time.perf_counter()
+        try:
+            return method(self, item, spider)
+        finally:
+            crawler = getattr(spider, "crawler", None)
+            if crawler is not None:
+                observe(crawler.stats, f"pipeline/{type(self).__name__}/seconds", time.perf_counter() - start)
+
+    return process_item
+
+
+def metric_name(key: str) -> str:
+    """
+    Turn a stats key into a Prometheus metric name.
+
+    Args:
+        key (str): The stats key, e.g. "downloader/response_bytes".
+
+    Returns:
+        str: The metric name, e.g. "scrahp_downloader_response_bytes".
+    """
+    return "scrahp_" + re.sub(r"[^a-zA-Z0-9_]", "_", key).strip("_")
+
+
+def render_prometheus(spider_name: str, stats: Dict[str, Any], histograms: Dict[str, Histogram]) -> str:
+    """
+    Render the numeric stats and the histograms in the Prometheus text format.
+
+    Args:
+        spider_name (str): The name of the spider, set as the "spider" label.
+        stats (Dict[str, Any]): The crawl stats, the non numeric ones are skipped.
+        histograms (Dict[str, Histogram]): The histograms.
+
+    Returns:
+        str: The Prometheus text exposition.
+    """
+    label = f'spider="{spider_name}"'
+    lines: List[str] = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = metric_name(key)
+        lines.append(f"# TYPE {name} untyped")
+        lines.append(f"{name}{{{label}}} {value}")
+
+    for key, histogram in sorted(histograms.items()):
+        name = metric_name(key)
+        lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{label}}} {histogram.total}")
+        lines.append(f"{name}_count{{{label}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Extension recording the download and item latency metrics and exporting every metric of the crawl periodically.
+
+    The Prometheus file is replaced atomically at every export, the JSON lines file
+    gets one line per export. When the crawl ends, the count and quantiles of every
+    histogram are also added to the crawl stats dumped by Scrapy.
+    """
+
+    def __init__(self, crawler: Crawler, path: str, export_format: str = "prometheus", interval: float = 15.0) -> None:
+        """
+        Initialize the extension.
+
+        Args:
+            crawler (Crawler): The running crawler.
+            path (str): The file receiving the metrics.
+            export_format (str): Either "prometheus" or "jsonl".
+            interval (float): Number of seconds between two exports.
+
+        Raises:
+            ValueError: If the export format is unknown.
+        """
+        if export_format not in ("prometheus", "jsonl"):
+            raise ValueError(f"Unsupported metrics format: {export_format}")
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.path = path
+        self.export_format = export_format
+        self.interval = interval
+        self.task: Optional[LoopingCall] = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "MetricsExporter":
+        """
+        Create the extension from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            MetricsExporter: The configured extension.
+
+        Raises:
+            NotConfigured: If METRICS_ENABLED is False.
+        """
+        settings = crawler.settings
+        if not settings.getbool("METRICS_ENABLED", True):
+            raise NotConfigured
+        extension = cls(
+            crawler,
+            path=settings.get("METRICS_FILE", "data/metrics.prom"),
+            export_format=settings.get("METRICS_FORMAT", "prometheus"),
+            interval=settings.getfloat("METRICS_INTERVAL", 15.0),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(extension.item_scraped, signal=signals.item_scraped)
+        return extension
+
+    def spider_opened(self, spider: Spider) -> None:
+        """
+        Start the periodic export.
+
+        Args:
+            spider (Spider): The spider that was opened.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.interval > 0:
+            self.task = LoopingCall(self.export, spider)
+            self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider: Spider) -> None:
+        """
+        Stop the periodic export, export a last time and add the histogram summaries to the crawl stats.
+
+        Args:
+            spider (Spider): The spider that was closed.
+        """
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        self.export(spider)
+        if isinstance(self.stats, MetricsStatsCollector):
+            for key, histogram in self.stats.get_histograms().items():
+                for name, value in histogram.summary().items():
+                    if name != "sum":
+                        self.stats.set_value(f"{key}/{name}", value)
+
+    def response_received(self, response: Response, request: Request, spider: Spider) -> None:
+        """
+        Record the download latency and size of a response.
+
+        Args:
+            response (Response): The downloaded response.
+            request (Request): The request of the response.
+            spider (Spider): The running spider.
+        """
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            observe(self.stats, "download/latency_seconds", latency)
+        observe(self.stats, "download/response_bytes", len(response.body), SIZE_BUCKETS)
+
+    def request_reached_downloader(self, request: Request, spider: Spider) -> None:
+        """
+        Record the time a request left the scheduler, the start of the latency of its items.
+
+        Args:
+            request (Request): The request handed to the downloader.
+            spider (Spider): The running spider.
+        """
+        request.meta["downloader_reached_at"] = time.perf_counter()
+
+    def item_scraped(self, item: Any, response: Response, spider: Spider) -> None:
+        """
+        Record the latency of an item, from its request leaving the scheduler to the item leaving the pipelines.
+
+        Args:
+            item (Any): The item that went through every pipeline.
+            response (Response): The response the item was extracted from.
+            spider (Spider): The running spider.
+        """
+        started = response.meta.get("downloader_reached_at") if response is not None else None
+        if started is not None:
+            observe(self.stats, "item/latency_seconds", time.perf_counter() - started)
+
+    def sample_queues(self) -> None:
+        """
+        Record the current depth of the scheduler, downloader and scraper queues in the crawl stats.
+        """
+        engine = self.crawler.engine
+        if engine is None or engine.slot is None:
+            return
+        self.stats.set_value("queues/scheduler", len(engine.slot.scheduler))
+        self.stats.set_value("queues/downloader_active", len(engine.downloader.active))
+        slot = engine.scraper.slot
+        if slot is not None:
+            self.stats.set_value("queues/scraper_active", len(slot.active))
+            self.stats.set_value("queues/scraper_active_bytes", slot.active_size)
+
+    def export(self, spider: Spider) -> None:
+        """
+        Write the current metrics to the metrics file.
+
+        Args:
+            spider (Spider): The running spider.
+        """
+        self.sample_queues()
+        stats = self.stats.get_stats()
+        histograms = self.stats.get_histograms() if isinstance(self.stats, MetricsStatsCollector) else {}
+
+        if self.export_format == "prometheus":
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as file:
+                file.write(render_prometheus(spider.name, stats, histograms))
+            os.replace(temporary, self.path)
+        else:
+            record = {
+                "time": datetime.now(timezone.utc).isoformat(),
+                "spider": spider.name,
+                "stats": {key: value for key, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)},
+                "histograms": {key: histogram.summary() for key, histogram in histograms.items()},
+            }
+            with open(self.path, "a") as file:
+                file.write(json.dumps(record) + "\n")
@@ -3,104 +3,469 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
 from collections.abc import Iterable
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Union
 
 from scrapy import signals
 from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest, NotConfigured
 from scrapy.http import Request, Response
 from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
+from twisted.internet import defer
+from twisted.internet.error import TCPTimedOutError, TimeoutError
+from twisted.python.failure import Failure
+
+from scrahp import signals as scrahp_signals
+from scrahp.autotune import HostController
+from scrahp.incremental import ValidatorStore
+from scrahp.items import Article
+from scrahp.metrics import observe
 
 
 class ScrahpSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    """
+    Spider middleware measuring the time the spider spends parsing every response,
+    including the time spent in the worker processes of the parse pool.
 
-    @classmethod
-    def from_crawler(cls, crawler: Crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+    The total is reported in the crawl stats, and the time of every URL is kept in
+    the ValidatorStore of the incremental crawl, if any, to estimate the parse time
+    saved when the page is skipped by a later crawl. The validators of a page
+    without article (e.g. a section page) are committed once the spider parsed it.
+    """
 
-    def process_spider_input(self, response: Response, spider: Spider) -> None:
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def __init__(self, stats: Optional[StatsCollector] = None) -> None:
+        """
+        Initialize the middleware.
 
-        # Should return None or raise an exception.
-        return None
+        Args:
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "ScrahpSpiderMiddleware":
+        """
+        Create the middleware.
 
-    def process_spider_output(self, response: Response, result: Iterable[Optional[Request]], spider: Spider) -> Optional[Request]:
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+        Args:
+            crawler (Crawler): The running crawler.
 
-        # Must return an iterable of Request: Request, or item objects.
-        for i in result:
-            yield i
+        Returns:
+            ScrahpSpiderMiddleware: The middleware.
+        """
+        s = cls(crawler.stats)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
 
-    def process_spider_exception(self, response: Response, exception: Exception, spider: Spider) -> None:
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    def process_spider_output(self, response: Response, result: Iterable[Any], spider: Spider) -> Iterator[Any]:
+        """
+        Pass the spider output through, timing the spider code only.
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+        Args:
+            response (Response): The parsed response.
+            result (Iterable[Any]): The requests and items returned by the spider.
+            spider (Spider): The running spider.
 
-    def process_start_requests(self, start_requests: Iterable[Request], spider: Spider) -> Optional[Request]:
-        # Called with the start requests of the spider, and works
-        # similarly to the process_spider_output() method, except
-        # that it doesn’t have a response associated.
+        Yields:
+            Any: The requests and items of the spider.
+        """
+        parse_time = 0.0
+        articles = False
+        iterator = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                output = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                parse_time += time.perf_counter() - start
+            articles = articles or isinstance(output, Article)
+            yield output
 
-        # Must return only requests (not items).
-        for r in start_requests:
-            yield r
+        # Time spent in the parse pool, if the page was parsed by a worker process
+        parse_time += response.meta.get("parse_time", 0.0)
+        if self.stats is not None:
+            self.stats.inc_value("parse/pages")
+            self.stats.inc_value("parse/time_seconds", parse_time)
+            observe(self.stats, "parse/page_seconds", parse_time)
+        store: Optional[ValidatorStore] = getattr(spider, "validator_store", None)
+        if store is not None:
+            store.update_parse_time(response.url, parse_time)
+            # The validators of an article page are committed once the article is stored
+            if not articles:
+                store.commit(response.url)
 
     def spider_opened(self, spider: Spider) -> None:
         spider.logger.info("Spider opened: %s" % spider.name)
 
 
 class ScrahpDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """
+    Downloader middleware turning every recrawl into an incremental crawl.
+
+    The ETag, Last-Modified and body hash of every crawled URL are kept in a
+    ValidatorStore. Later requests of the URL carry If-None-Match and
+    If-Modified-Since headers: a 304 response, or a 200 response whose body did not
+    change, is dropped with IgnoreRequest before reaching the spider and the
+    pipelines. The bandwidth and parse time saved are reported in the crawl stats.
+
+    The validators of a response are only committed once its article is stored
+    (the articles_stored signal): a page whose article was dropped, failed in the
+    pipelines or was lost in a crash is fully crawled again by the next crawl.
+
+    A request can opt out with ``meta={"incremental": False}``.
+    """
+
+    def __init__(self, store: ValidatorStore, skip_unchanged: bool = True, stats: Optional[StatsCollector] = None) -> None:
+        """
+        Initialize the middleware.
+
+        Args:
+            store (ValidatorStore): The store of the validators.
+            skip_unchanged (bool): Whether 200 responses with an unchanged body are dropped too.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.store = store
+        self.skip_unchanged = skip_unchanged
+        self.stats = stats
 
     @classmethod
-    def from_crawler(cls, crawler: Crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+    def from_crawler(cls, crawler: Crawler) -> "ScrahpDownloaderMiddleware":
+        """
+        Create the middleware from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            ScrahpDownloaderMiddleware: The configured middleware.
+
+        Raises:
+            NotConfigured: If INCREMENTAL_ENABLED is False.
+        """
+        settings = crawler.settings
+        if not settings.getbool("INCREMENTAL_ENABLED", True):
+            raise NotConfigured
+        s = cls(
+            ValidatorStore(settings.get("INCREMENTAL_STORE_FILE", "data/validators.db")),
+            skip_unchanged=settings.getbool("INCREMENTAL_SKIP_UNCHANGED", True),
+            stats=crawler.stats,
+        )
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.articles_stored, signal=scrahp_signals.articles_stored)
+        crawler.signals.connect(s.item_not_stored, signal=signals.item_dropped)
+        crawler.signals.connect(s.item_not_stored, signal=signals.item_error)
+        crawler.signals.connect(s.spider_error, signal=signals.spider_error)
         return s
 
     def process_request(self, request: Request, spider: Spider) -> None:
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        """
+        Add the conditional headers of the last crawled version of the URL.
+
+        Args:
+            request (Request): The request about to be downloaded.
+            spider (Spider): The running spider.
+        """
+        if not self.is_incremental(request):
+            return None
+
+        validators = self.store.get(request.url)
+        if validators is None:
+            return None
+
+        if validators.etag and b"If-None-Match" not in request.headers:
+            request.headers[b"If-None-Match"] = validators.etag
+        if validators.last_modified and b"If-Modified-Since" not in request.headers:
+            request.headers[b"If-Modified-Since"] = validators.last_modified
+        request.meta["incremental_validators"] = validators
+        self.inc_stat("incremental/conditional_requests")
         return None
 
     def process_response(self, request: Request, response: Response, spider: Spider) -> Response:
-        # Called with the response returned from the downloader.
+        """
+        Drop the responses of unchanged pages and stage the validators of the others.
+
+        Args:
+            request (Request): The downloaded request.
+            response (Response): The downloaded response.
+            spider (Spider): The running spider.
+
+        Returns:
+            Response: The response of a new or changed page.
+
+        Raises:
+            IgnoreRequest: If the page did not change since the last crawl.
+        """
+        if not self.is_incremental(request):
+            return response
+
+        validators = request.meta.get("incremental_validators")
+        if response.status == 304 and validators is not None:
+            self.inc_stat("incremental/not_modified")
+            self.inc_stat("incremental/bytes_saved", validators.body_size)
+            self.inc_stat("incremental/parse_time_saved_seconds", validators.parse_time)
+            raise IgnoreRequest(f"Not modified: {request.url}")
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if response.status != 200:
+            return response
+
+        body_hash = self.store.body_hash(response.body)
+        etag = response.headers.get(b"ETag")
+        last_modified = response.headers.get(b"Last-Modified")
+        self.store.stage(
+            request.url,
+            etag.decode("latin-1") if etag else None,
+            last_modified.decode("latin-1") if last_modified else None,
+            body_hash,
+            len(response.body),
+        )
+
+        if validators is None:
+            self.inc_stat("incremental/new")
+        elif validators.body_hash != body_hash:
+            self.inc_stat("incremental/changed")
+        elif self.skip_unchanged:
+            self.inc_stat("incremental/unchanged")
+            self.inc_stat("incremental/parse_time_saved_seconds", validators.parse_time)
+            raise IgnoreRequest(f"Unchanged: {request.url}")
         return response
 
-    def process_exception(self, request: Request, exception: Exception, spider: Spider) -> None:
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    def is_incremental(self, request: Request) -> bool:
+        """
+        Check whether a request takes part in the incremental crawl.
+
+        Args:
+            request (Request): The request to check.
+
+        Returns:
+            bool: False for robots.txt and the requests opting out, True otherwise.
+        """
+        return request.meta.get("incremental", True) and not request.url.endswith("/robots.txt")
+
+    def inc_stat(self, key: str, count: float = 1) -> None:
+        """
+        Increment a crawl stat, if stats are collected.
+
+        Args:
+            key (str): The stat to increment.
+            count (float): The increment.
+        """
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    def articles_stored(self, urls: List[str], spider: Spider) -> None:
+        """
+        Commit the validators of the pages whose article was stored.
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+        Args:
+            urls (List[str]): The URLs of the stored articles.
+            spider (Spider): The running spider.
+        """
+        for url in urls:
+            self.store.commit(url)
+
+    def item_not_stored(self, item: Any, response: Response, spider: Spider, **kwargs: Any) -> None:
+        """
+        Discard the validators of a page whose article was dropped or failed in the pipelines.
+
+        Args:
+            item (Any): The dropped item.
+            response (Response): The response the item was scraped from.
+            spider (Spider): The running spider.
+        """
+        if isinstance(item, Article):
+            self.store.discard(response.url)
+
+    def spider_error(self, failure: Failure, response: Response, spider: Spider) -> None:
+        """
+        Discard the validators of a page the spider failed to parse.
+
+        Args:
+            failure (Failure): The error of the spider.
+            response (Response): The response being parsed.
+            spider (Spider): The running spider.
+        """
+        self.store.discard(response.url)
 
     def spider_opened(self, spider: Spider) -> None:
+        """
+        Open the store and share it with the spider middleware through the spider.
+
+        Args:
+            spider (Spider): The spider that was opened.
+        """
+        self.store.open()
+        spider.validator_store = self.store  # type: ignore[attr-defined]
         spider.logger.info("Spider opened: %s" % spider.name)
+
+    def spider_closed(self, spider: Spider) -> None:
+        """
+        Close the store.
+
+        Args:
+            spider (Spider): The spider that was closed.
+        """
+        spider.validator_store = None  # type: ignore[attr-defined]
+        self.store.close()
+
+
+class ScrahpAutotuneMiddleware:
+    """
+    Downloader middleware tuning the concurrency and delay of every downloader slot (host).
+
+    Each slot gets its own AIMD HostController, fed with the download latency of
+    every response and with the 429 responses, 5xx responses and timeouts. Its
+    decisions are applied to the downloader slot and exposed in the crawl stats
+    under ``autotune/<slot>/``. It must run before the RetryMiddleware (550) to see
+    the failed requests before they are retried.
+    """
+
+    TIMEOUT_EXCEPTIONS = (defer.TimeoutError, TimeoutError, TCPTimedOutError)
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        target_latency: float = 2.0,
+        max_error_rate: float = 0.02,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        max_delay: float = 30.0,
+        window: int = 20,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        """
+        Initialize the middleware.
+
+        Args:
+            crawler (Crawler): The running crawler, whose downloader slots are tuned.
+            target_latency (float): Target p95 download latency, in seconds.
+            max_error_rate (float): Maximum share of 429, 5xx and timed out requests.
+            min_concurrency (int): Lowest concurrency of a slot.
+            max_concurrency (int): Highest concurrency of a slot.
+            max_delay (float): Highest download delay of a slot, in seconds.
+            window (int): Number of requests observed between two decisions.
+            decrease_factor (float): Factor applied to the concurrency when above target.
+        """
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_delay = max_delay
+        self.window = window
+        self.decrease_factor = decrease_factor
+        self.controllers: Dict[str, HostController] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "ScrahpAutotuneMiddleware":
+        """
+        Create the middleware from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            ScrahpAutotuneMiddleware: The configured middleware.
+
+        Raises:
+            NotConfigured: If AUTOTUNE_ENABLED is False or AutoThrottle is enabled.
+        """
+        settings = crawler.settings
+        if not settings.getbool("AUTOTUNE_ENABLED", False):
+            raise NotConfigured
+        if settings.getbool("AUTOTHROTTLE_ENABLED"):
+            raise NotConfigured("AutoThrottle already controls the download delays")
+        return cls(
+            crawler,
+            target_latency=settings.getfloat("AUTOTUNE_TARGET_P95_LATENCY", 2.0),
+            max_error_rate=settings.getfloat("AUTOTUNE_MAX_ERROR_RATE", 0.02),
+            min_concurrency=settings.getint("AUTOTUNE_MIN_CONCURRENCY", 1),
+            max_concurrency=settings.getint("AUTOTUNE_MAX_CONCURRENCY", 8),
+            max_delay=settings.getfloat("AUTOTUNE_MAX_DELAY", 30.0),
+            window=settings.getint("AUTOTUNE_WINDOW", 20),
+            decrease_factor=settings.getfloat("AUTOTUNE_DECREASE_FACTOR", 0.5),
+        )
+
+    def process_response(self, request: Request, response: Response, spider: Spider) -> Response:
+        """
+        Feed the latency and status of a response to the controller of its slot.
+
+        Args:
+            request (Request): The downloaded request.
+            response (Response): The downloaded response.
+            spider (Spider): The running spider.
+
+        Returns:
+            Response: The response, unchanged.
+        """
+        if response.status == 429:
+            self.observe(request, "responses_429")
+        elif response.status >= 500:
+            self.observe(request, "responses_5xx")
+        else:
+            self.observe(request, None)
+        return response
+
+    def process_exception(self, request: Request, exception: Exception, spider: Spider) -> None:
+        """
+        Count the timed out requests as errors of their slot.
+
+        Args:
+            request (Request): The failed request.
+            exception (Exception): The download error.
+            spider (Spider): The running spider.
+        """
+        if isinstance(exception, self.TIMEOUT_EXCEPTIONS):
+            self.observe(request, "timeouts")
+
+    def observe(self, request: Request, error: Optional[str]) -> None:
+        """
+        Feed an outcome to the controller of the request slot and apply its decision.
+
+        Args:
+            request (Request): The handled request.
+            error (Optional[str]): The kind of error, or None for a successful request.
+        """
+        key = request.meta.get("download_slot")
+        if key is None or self.crawler.engine is None:
+            return
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None:
+            return
+
+        controller = self.controllers.get(key)
+        if controller is None:
+            controller = self.controllers[key] = HostController(
+                slot.concurrency,
+                slot.delay,
+                target_latency=self.target_latency,
+                max_error_rate=self.max_error_rate,
+                min_concurrency=self.min_concurrency,
+                max_concurrency=self.max_concurrency,
+                max_delay=self.max_delay,
+                window=self.window,
+                decrease_factor=self.decrease_factor,
+            )
+
+        prefix = f"autotune/{key}"
+        if error is not None:
+            self.stats.inc_value(f"{prefix}/{error}")
+        latency: Union[float, None] = request.meta.get("download_latency") if error != "timeouts" else None
+        decision = controller.observe(latency, error is not None)
+        if decision is not None:
+            self.stats.inc_value(f"{prefix}/decisions/{decision}")
+            self.stats.inc_value(f"autotune/decisions/{decision}")
+            self.stats.set_value(f"{prefix}/concurrency", controller.concurrency)
+            self.stats.set_value(f"{prefix}/delay", controller.delay)
+            self.stats.set_value(f"{prefix}/p95_latency_ms", round(controller.last_p95 * 1000, 1))
+            self.stats.set_value(f"{prefix}/error_rate", round(controller.last_error_rate, 4))
+            self.stats.max_value(f"{prefix}/max_concurrency", controller.concurrency)
+
+        # Slots are garbage collected when idle, so the tuned values are applied on every response
+        slot.concurrency = controller.concurrency
+        slot.delay = controller.delay
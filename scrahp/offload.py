@@ -0,0 +1,229 @@
+"""
+Process pool running the CPU bound part of the article parsing off the reactor thread.
+
+The extraction of the article fields, the accent removal of the Loader and the
+cleaning of the ArticlePipeline are run by worker processes: the reactor only
+ships the response body to a worker and gets the finished article back, so that
+downloads keep flowing while several cores parse the pages.
+
+The workers are started with the "forkserver" method ("spawn" where it is not
+available): forking the crawl process itself would copy the locks of its writer
+threads in whatever state they are, and a worker could deadlock on them.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
+from twisted.internet.defer import Deferred, DeferredSemaphore
+from twisted.python.failure import Failure
+
+from scrahp.extraction import matched_query
+from scrahp.items import Article
+from scrahp.pipelines import ArticlePipeline
+
+# Per worker process state, created once by init_worker
+worker_spider: Optional[Any] = None
+worker_pipeline: Optional[ArticlePipeline] = None
+
+
+def init_worker(spider_cls: Type[Spider]) -> None:
+    """
+    Create the spider and the pipeline used by a worker process.
+
+    Args:
+        spider_cls (Type[Spider]): The class of the running spider, providing the extraction engine and the Loader.
+    """
+    global worker_spider, worker_pipeline
+    worker_spider = spider_cls()
+    worker_pipeline = ArticlePipeline()
+
+
+def parse_article(url: str, body: bytes, encoding: str, order: Optional[Dict[str, List[int]]]) -> Tuple[Dict[str, Optional[int]], Article, float]:
+    """
+    Extract and clean the article of a page, in a worker process.
+
+    Args:
+        url (str): The URL of the page.
+        body (bytes): The body of the page.
+        encoding (str): The encoding of the response.
+        order (Optional[Dict[str, List[int]]]): The order of the queries of every field, from the selector statistics.
+
+    Returns:
+        Tuple[Dict[str, Optional[int]], Article, float]: The query that filled every field, the cleaned article
+        and the time spent parsing the page.
+    """
+    assert worker_spider is not None and worker_pipeline is not None
+    start = time.perf_counter()
+    response = HtmlResponse(url=url, body=body, encoding=encoding)
+    extraction = worker_spider.extractor.extract(response.selector.root, order)
+    article = worker_pipeline.cleanup_item(worker_spider.load_article(url, extraction), worker_spider)
+    matches = {field: matched_query(match) for field, match in extraction.items()}
+    return matches, article, time.perf_counter() - start
+
+
+class ParsePool:
+    """
+    Pool of worker processes parsing the pages, with a bounded number of pages in flight.
+
+    Pages submitted beyond max_in_flight wait on the reactor side, where Scrapy
+    counts them in the active size of the scraper and slows the downloads down
+    (SCRAPER_SLOT_MAX_ACTIVE_SIZE) instead of piling up bodies in the pool queue.
+    """
+
+    def __init__(self, processes: int, max_in_flight: int = 0, stats: Optional[StatsCollector] = None) -> None:
+        """
+        Initialize the pool.
+
+        Args:
+            processes (int): Number of worker processes.
+            max_in_flight (int): Maximum number of pages submitted to the workers at once, 0 for twice the number of processes.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.processes = processes
+        self.max_in_flight = max_in_flight or 2 * processes
+        self.stats = stats
+        self.semaphore = DeferredSemaphore(self.max_in_flight)
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def open(self, spider_cls: Type[Spider]) -> None:
+        """
+        Start the worker processes.
+
+        Args:
+            spider_cls (Type[Spider]): The class of the running spider, instantiated once by every worker.
+        """
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context(method),
+            initializer=init_worker,
+            initargs=(spider_cls,),
+        )
+
+    def close(self) -> None:
+        """
+        Stop the worker processes once the submitted pages are parsed.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def submit(self, function: Callable[..., Any], *args: Any) -> Deferred:
+        """
+        Run a function in a worker process, once a slot is free.
+
+        Args:
+            function (Callable[..., Any]): A module level function, run by the worker.
+            *args (Any): The arguments of the function, pickled to the worker.
+
+        Returns:
+            Deferred: Fired on the reactor thread with the result of the function, or its exception.
+        """
+        if self.stats is not None:
+            self.stats.inc_value("parse_pool/tasks")
+            self.stats.max_value("parse_pool/max_waiting", len(self.semaphore.waiting))
+        return self.semaphore.run(self.run, function, *args)
+
+    def run(self, function: Callable[..., Any], *args: Any) -> Deferred:
+        """
+        Submit a function to the executor and wrap its future in a Deferred.
+
+        Args:
+            function (Callable[..., Any]): A module level function, run by the worker.
+            *args (Any): The arguments of the function.
+
+        Returns:
+            Deferred: Fired on the reactor thread with the result of the function, or its exception.
+        """
+        from twisted.internet import reactor
+
+        if self.executor is None:
+            raise RuntimeError("The parse pool is not open")
+        deferred: Deferred = Deferred()
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda done: reactor.callFromThread(self.fire, deferred, done))  # type: ignore[attr-defined]
+        return deferred
+
+    @staticmethod
+    def fire(deferred: Deferred, future: Future) -> None:
+        """
+        Fire a Deferred with the outcome of a future, on the reactor thread.
+
+        Args:
+            deferred (Deferred): The Deferred returned by run.
+            future (Future): The completed future.
+        """
+        error = future.exception()
+        if error is not None:
+            deferred.errback(Failure(error))
+        else:
+            deferred.callback(future.result())
+
+
+class ParsePoolExtension:
+    """
+    Extension starting the ParsePool of the spiders and stopping it at the end of the crawl.
+
+    The pool is exposed to the spider as its ``parse_pool`` attribute.
+    """
+
+    def __init__(self, pool: ParsePool) -> None:
+        """
+        Initialize the extension.
+
+        Args:
+            pool (ParsePool): The pool shared by the spider.
+        """
+        self.pool = pool
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "ParsePoolExtension":
+        """
+        Create the extension from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            ParsePoolExtension: The configured extension.
+
+        Raises:
+            NotConfigured: If PARSE_PROCESSES is not set.
+        """
+        settings = crawler.settings
+        processes = settings.getint("PARSE_PROCESSES", 0)
+        if processes <= 0:
+            raise NotConfigured
+        pool = ParsePool(processes, max_in_flight=settings.getint("PARSE_MAX_IN_FLIGHT", 0), stats=crawler.stats)
+        extension = cls(pool)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider: Spider) -> None:
+        """
+        Start the pool and attach it to the spider.
+
+        Args:
+            spider (Spider): The spider that was opened.
+        """
+        self.pool.open(type(spider))
+        spider.parse_pool = self.pool  # type: ignore[attr-defined]
+        spider.logger.info(f"Parsing the pages in {self.pool.processes} processes, {self.pool.max_in_flight} pages in flight at most")
+
+    def spider_closed(self, spider: Spider) -> None:
+        """
+        Stop the pool.
+
+        Args:
+            spider (Spider): The spider that was closed.
+        """
+        self.pool.close()
@@ -3,14 +3,30 @@ import os
 import re
 import sqlite3
 import string
-from typing import List, Union
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.crawler import Crawler
 from scrapy.exceptions import DropItem
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.signalmanager import SignalManager
 from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
+from twisted.internet.defer import Deferred
 from unidecode import unidecode
 
+from db.authors import normalize_author
+from db.storage import connect_writer
+from scrahp import signals as scrahp_signals
+from scrahp.bloom import BloomFilter
+from scrahp.dedup import SimHashIndex
 from scrahp.items import Article, Url
+from scrahp.metrics import timed_stage
+from scrahp.writers import INSERT_ARTICLE, UPSERT_ARTICLE, ArticleRow, SegmentedFeedWriter, SQLiteBatchWriter
 
 
 class UrlPipeline:
@@ -21,23 +37,31 @@ class UrlPipeline:
     in the Url items scraped by the spiders.
     """
 
-    def process_item(self, item: Url, spider: Spider) -> Url:
+    tracking_params: Tuple[str, ...] = ("fbclid", "gclid", "ocid", "xtor", "cmpid", "intlink_from_url", "link_location")
+    tracking_prefixes: Tuple[str, ...] = ("utm_", "at_", "ns_")
+    # Hosts serving the same pages as another one, e.g. the RSS feeds link to bbc.co.uk and the sections to bbc.com
+    host_aliases: Dict[str, str] = {"bbc.co.uk": "www.bbc.com", "www.bbc.co.uk": "www.bbc.com", "bbc.com": "www.bbc.com"}
+
+    @timed_stage
+    def process_item(self, item: Union[Url, Article], spider: Spider) -> Union[Url, Article]:
         """
-        Process and clean up a Url item.
+        Process and clean up a Url item, passing other items through.
 
         Args:
-            item (Url): The Url item to process.
+            item (Union[Url, Article]): The item to process.
             spider (Spider): The spider that scraped the item.
 
         Returns:
-            Url: The cleaned up item.
+            Union[Url, Article]: The cleaned up item.
         """
+        if not isinstance(item, Url):
+            return item
         return self.cleanup_item(item, spider)
 
     def cleanup_item(self, item: Url, spider: Spider) -> Url:
         """
         Clean up the fields of a 'Url' item.
-        Specific cleaning actions are performed on title, URL, and base URL of the item.
+        Specific cleaning actions are performed on title, URL, base URL and publication date of the item.
 
         Args:
             item (Url): The 'Url' item to clean.
@@ -49,6 +73,8 @@ class UrlPipeline:
         item["title"] = self.cleanup_title(item, spider)
         item["url"] = self.cleanup_url(item, spider)
         item["base_url"] = item["base_url"][-1]
+        if item.get("published"):
+            item["published"] = item["published"][-1]
         return item
 
     def cleanup_title(self, item: Url, spider: Spider) -> str:
@@ -83,7 +109,40 @@ class UrlPipeline:
             cleaned_url = item["url"][-1]
         else:
             cleaned_url = f"{item['base_url'][-1]}{item['url'][-1]}"
-        return cleaned_url
+        return self.canonicalize_url(cleaned_url)
+
+    def canonicalize_url(self, url: str) -> str:
+        """
+        Normalize a URL so that variants of the same page map to a single string.
+        The scheme is forced to https unless a non default port is given, the host is lowercased, stripped of its default port
+        and replaced by the host it is an alias of, tracking query parameters and the fragment are removed and the remaining
+        query is sorted.
+
+        Args:
+            url (str): The absolute URL to normalize (the scheme may be missing).
+
+        Returns:
+            str: The canonical URL.
+        """
+        if "://" not in url:
+            url = f"https://{url.lstrip('/')}"
+        parts = urlsplit(url.strip())
+
+        # An explicit non default port points to a specific service, keep its scheme as is
+        scheme = "https"
+        host = (parts.hostname or "").rstrip(".")
+        host = self.host_aliases.get(host, host)
+        if parts.port is not None and parts.port not in (80, 443):
+            scheme = parts.scheme.lower()
+            host = f"{host}:{parts.port}"
+
+        query = sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key.lower() not in self.tracking_params and not key.lower().startswith(self.tracking_prefixes)
+        )
+
+        return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
 
     def is_valid_http_url(self, url: str) -> bool:
         """
@@ -105,6 +164,185 @@ class UrlPipeline:
         return re.match(url_pattern, url) is not None
 
 
+class UrlFilterPipeline:
+    """
+    A pipeline dropping 'Url' items whose canonical URL was already seen in a previous run.
+
+    Seen URLs are recorded in a persistent, memory-mapped BloomFilter, so the check
+    stays in constant memory whatever the number of URLs crawled over time. As for
+    any Bloom filter, a small fraction of new URLs can be wrongly reported as seen.
+
+    For the urls spider a URL is seen once discovered, the articles spider fetches it
+    later from 'data/urls.jsonl'. Spiders fetching the articles they discover (those with
+    an ``article_request`` method, e.g. the stream spider) only check the filter at
+    discovery: a URL is recorded once its article is stored or dropped by the pipelines,
+    so that an article whose download failed, or which was lost with the process, is
+    fetched again by a later run.
+    """
+
+    def __init__(
+        self,
+        filter_file: Optional[str] = "data/urls.bloom",
+        capacity: int = 20_000_000,
+        error_rate: float = 0.001,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
+        """
+        Initialize the UrlFilterPipeline.
+
+        Args:
+            filter_file (Optional[str]): File persisting the Bloom filter, or None to keep it in memory only.
+            capacity (int): Expected number of distinct URLs.
+            error_rate (float): Target false positive rate at full capacity.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.filter_file = filter_file
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.stats = stats
+        self.seen: Optional[BloomFilter] = None
+        # Whether URLs are recorded once their article is handled rather than once discovered
+        self.record_handled = False
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "UrlFilterPipeline":
+        """
+        Create the pipeline from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            UrlFilterPipeline: The configured pipeline.
+        """
+        pipeline = cls.from_settings(crawler.settings, crawler.stats)
+        crawler.signals.connect(pipeline.articles_stored, signal=scrahp_signals.articles_stored)
+        crawler.signals.connect(pipeline.item_dropped, signal=signals.item_dropped)
+        return pipeline
+
+    @classmethod
+    def from_settings(cls, settings: Settings, stats: Optional[StatsCollector] = None) -> "UrlFilterPipeline":
+        """
+        Create the pipeline from the project settings, e.g. outside of a crawl.
+
+        Args:
+            settings (Settings): The project settings.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+
+        Returns:
+            UrlFilterPipeline: The configured pipeline.
+        """
+        return cls(
+            filter_file=settings.get("URL_FILTER_FILE", "data/urls.bloom"),
+            capacity=settings.getint("URL_FILTER_CAPACITY", 20_000_000),
+            error_rate=settings.getfloat("URL_FILTER_ERROR_RATE", 0.001),
+            stats=stats,
+        )
+
+    def open_spider(self, spider: Spider) -> None:
+        """
+        Open the spider, loading the Bloom filter of the previous runs.
+
+        Args:
+            spider (Spider): The spider that was opened.
+        """
+        self.seen = BloomFilter(self.filter_file, capacity=self.capacity, error_rate=self.error_rate)
+        self.record_handled = getattr(spider, "article_request", None) is not None
+
+    def close_spider(self, spider: Spider) -> None:
+        """
+        Close the spider, persisting the Bloom filter.
+
+        Args:
+            spider (Spider): The spider that was closed.
+        """
+        if self.seen is not None:
+            self.seen.close()
+            self.seen = None
+
+    def articles_stored(self, urls: List[str], spider: Spider) -> None:
+        """
+        Record the URLs of the stored articles, for spiders fetching the articles they discover.
+
+        Args:
+            urls (List[str]): The URLs of the stored articles.
+            spider (Spider): The spider that scraped the articles.
+        """
+        if self.record_handled and self.seen is not None:
+            for url in urls:
+                self.seen.add(url)
+
+    def item_dropped(self, item: Union[Url, Article], response: Response, exception: Exception, spider: Spider) -> None:
+        """
+        Record the URL of an article dropped by the pipelines (e.g. a near-duplicate), fetching it again would not store it either.
+
+        Args:
+            item (Union[Url, Article]): The dropped item.
+            response (Response): The response the item was scraped from.
+            exception (Exception): The DropItem exception.
+            spider (Spider): The spider that scraped the item.
+        """
+        if self.record_handled and self.seen is not None and isinstance(item, Article):
+            for url in response.request.meta.get("redirect_urls", []) + [response.url]:
+                self.seen.add(url)
+
+    @timed_stage
+    def process_item(self, item: Union[Url, Article], spider: Spider) -> Union[Url, Article]:
+        """
+        Drop the item if its URL was already seen, record it otherwise unless it is recorded once its article is handled.
+        Other items are passed through.
+
+        Args:
+            item (Union[Url, Article]): The cleaned 'Url' item.
+            spider (Spider): The spider that scraped the item.
+
+        Returns:
+            Union[Url, Article]: The item, if its URL is new.
+
+        Raises:
+            DropItem: If the URL was already seen.
+        """
+        if not isinstance(item, Url):
+            return item
+        url = item["url"]
+        seen = url in self.seen if self.record_handled else not self.seen.add(url)
+        if seen:
+            if self.stats is not None:
+                self.stats.inc_value("url_filter/seen")
+            raise DropItem(f"Already seen url: {item['url']}")
+        return item
+
+
+class ArticleRequestPipeline:
+    """
+    A pipeline scheduling the article request of every new 'Url' item in the running crawl.
+
+    Used by the stream spider, so that the articles found on an index page are
+    fetched in the same crawl rather than read back from 'data/urls.jsonl' by the
+    next articles crawl. It must come after the UrlPipeline cleaning and the
+    UrlFilterPipeline deduplication. Spiders without an ``article_request`` method
+    are left untouched.
+    """
+
+    @timed_stage
+    def process_item(self, item: Union[Url, Article], spider: Spider) -> Union[Url, Article]:
+        """
+        Schedule the article request of a 'Url' item. Other items are passed through.
+
+        Args:
+            item (Union[Url, Article]): The cleaned and deduplicated 'Url' item.
+            spider (Spider): The spider that scraped the item.
+
+        Returns:
+            Union[Url, Article]: The item, unchanged.
+        """
+        article_request = getattr(spider, "article_request", None)
+        if isinstance(item, Url) and article_request is not None:
+            spider.crawler.engine.crawl(article_request(item))
+            spider.crawler.stats.inc_value("stream/scheduled_articles")
+        return item
+
+
 class ArticlePipeline:
     """
     A pipeline for processing 'Article' items.
@@ -114,20 +352,26 @@ class ArticlePipeline:
     to ensure data integrity and proper formatting before being passed on.
     """
 
-    def process_item(self, item: Article, spider: Spider) -> Article:
+    @timed_stage
+    def process_item(self, item: Union[Article, Url], spider: Spider) -> Union[Article, Url]:
         """
         Process an 'Article' item through the pipeline.
         This method is called for every 'Article' item scraped by the spiders.
         It orchestrates the processing of the item through various methods
-        such as validation and cleaning.
+        such as validation and cleaning. Other items are passed through.
 
         Args:
-            item (Article): The 'Article' item to process.
+            item (Union[Article, Url]): The 'Article' item to process.
             spider (Spider): The spider that scraped the item.
 
         Returns:
-            Article: The processed item, ready for storage or further processing.
+            Union[Article, Url]: The processed item, ready for storage or further processing.
         """
+        if not isinstance(item, Article):
+            return item
+        if getattr(spider, "parse_pool", None) is not None:
+            # The articles were already cleaned by the worker processes of the parse pool
+            return item
         return self.cleanup_item(item, spider)
 
     def cleanup_item(self, item: Article, spider: Spider) -> Article:
@@ -143,10 +387,11 @@ class ArticlePipeline:
         Returns:
             Article: The cleaned article item.
         """
-        item["content"] = self.clean_content(item["content"])
+        # Fields the page did not have (e.g. no headline) were not extracted
+        item["content"] = self.clean_content(item.get("content", []))
         item["url"] = self.clean_url(item["url"])
-        item["title"] = self.clean_title(item["title"])
-        item["author"] = self.clean_author(item["author"])
+        item["title"] = self.clean_title(item.get("title", []))
+        item["author"] = self.clean_author(item.get("author", []))
 
         return item
 
@@ -197,25 +442,150 @@ class ArticlePipeline:
             spider (Spider): The spider that scraped the item.
 
         Returns:
-            str: The cleaned and standardized title.
+            str: The cleaned and standardized title, or "n/a" when there is none.
         """
-        return title[-1]
+        return title[-1] if title else "n/a"
 
     def clean_author(self, author: List[str]) -> str:
         """
         Clean and standardize the 'author' field of an 'Article' item.
 
-        This method is responsible for converting the title field from a list to a string.
+        The byline is normalized by ``db.authors.normalize_author``, like the authors stored
+        before the normalization existed, so that the same author is always stored under the
+        same name: "By Jane Doe", "JANE DOE" and "Jane Doe, BBC News" all give "Jane Doe".
 
         Args:
-            item (Article): The 'Article' item with the title field.
+            author (List[str]): The text nodes of the byline.
+
+        Returns:
+            str: The cleaned author's name, or "n/a" when there is none.
+        """
+        # The byline may be split in text nodes, e.g. "By " then the name, then the role of the author
+        names = [" ".join(text.split()) for text in author]
+        names = [name for name in names if name and name.lower() != "by"]
+        if not names:
+            return "n/a"
+        return normalize_author(names[0])
+
+
+class NearDuplicatePipeline:
+    """
+    A pipeline detecting near-duplicate 'Article' items.
+
+    The cleaned content of every article is fingerprinted with SimHash and looked up
+    in a SimHashIndex persisted between runs. Near-duplicates of an already stored
+    article are either dropped or linked to the original through their 'duplicate_of' field.
+    """
+
+    def __init__(
+        self,
+        index_file: Optional[str] = "data/simhash.index",
+        action: str = "drop",
+        max_distance: int = 3,
+        min_tokens: int = 20,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
+        """
+        Initialize the NearDuplicatePipeline.
+
+        Args:
+            index_file (Optional[str]): File persisting the fingerprints, or None to keep them in memory only.
+            action (str): Either "drop" or "link".
+            max_distance (int): Maximum Hamming distance between near-duplicate fingerprints.
+            min_tokens (int): Minimum number of words for an article to be fingerprinted.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.index = SimHashIndex(index_file, max_distance=max_distance, min_tokens=min_tokens)
+        self.action = action
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "NearDuplicatePipeline":
+        """
+        Create the pipeline from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            NearDuplicatePipeline: The configured pipeline.
+        """
+        return cls.from_settings(crawler.settings, crawler.stats)
+
+    @classmethod
+    def from_settings(cls, settings: Settings, stats: Optional[StatsCollector] = None) -> "NearDuplicatePipeline":
+        """
+        Create the pipeline from the project settings, e.g. outside of a crawl.
+
+        Args:
+            settings (Settings): The project settings.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+
+        Returns:
+            NearDuplicatePipeline: The configured pipeline.
+        """
+        return cls(
+            index_file=settings.get("NEAR_DUPLICATE_INDEX_FILE", "data/simhash.index") or None,
+            action=settings.get("NEAR_DUPLICATE_ACTION", "drop"),
+            max_distance=settings.getint("NEAR_DUPLICATE_MAX_DISTANCE", 3),
+            min_tokens=settings.getint("NEAR_DUPLICATE_MIN_TOKENS", 20),
+            stats=stats,
+        )
+
+    def open_spider(self, spider: Spider) -> None:
+        """
+        Open the spider, loading the fingerprints of the previous runs.
+
+        Args:
+            spider (Spider): The spider that was opened.
+        """
+        self.index.open()
+
+    def close_spider(self, spider: Spider) -> None:
+        """
+        Close the spider, closing the fingerprint index file.
+
+        Args:
+            spider (Spider): The spider that was closed.
+        """
+        self.index.close()
+
+    @timed_stage
+    def process_item(self, item: Union[Article, Url], spider: Spider) -> Union[Article, Url]:
+        """
+        Fingerprint the article content and drop or link it if a near-duplicate is already indexed.
+        Other items are passed through.
+
+        Args:
+            item (Union[Article, Url]): The cleaned 'Article' item.
             spider (Spider): The spider that scraped the item.
 
         Returns:
-            str: The cleaned author's name.
+            Union[Article, Url]: The item, possibly linked to the article it duplicates.
+
+        Raises:
+            DropItem: If the item is a near-duplicate and the action is "drop".
         """
-        # TODO add better cleaning
-        return author[-1]
+        if not isinstance(item, Article):
+            return item
+        fingerprint = self.index.fingerprint(item["content"])
+        if fingerprint is None:
+            return item
+
+        original = self.index.find(fingerprint)
+        if original is None:
+            self.index.add(fingerprint, item["url"])
+            return item
+        if original == item["url"]:
+            return item
+
+        if self.stats is not None:
+            self.stats.inc_value("dedup/near_duplicates")
+
+        if self.action == "drop":
+            raise DropItem(f"Near-duplicate of {original}: {item['url']}")
+        item["duplicate_of"] = original
+        return item
 
 
 class JsonWriterPipeline:
@@ -224,35 +594,144 @@ class JsonWriterPipeline:
 
     Depending on the type of item scraped, this pipeline will write the data into
     either 'data/urls.json' for Url items or 'data/articles.json' for Article items.
+
+    With the "segmented" backend, items are instead streamed by background
+    SegmentedFeedWriter threads into rotated, compressed segments under
+    'data/urls/' and 'data/articles/', each directory holding a manifest of the
+    finished segments.
     """
 
+    def __init__(
+        self,
+        backend: str = "file",
+        directory: str = "data",
+        compression: str = "gzip",
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float = 3600.0,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        queue_size: int = 10000,
+        write_urls: bool = True,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
+        """
+        Initialize the JsonWriterPipeline with its writer backend.
+
+        Args:
+            backend (str): Either "file" (append to a single JSONL file) or "segmented".
+            directory (str): Directory receiving the JSONL files or segment directories.
+            compression (str): Segment compression, "gzip" or "zstd".
+            max_segment_bytes (int): Uncompressed size after which a segment is rotated.
+            max_segment_age (float): Age in seconds after which a segment is rotated.
+            batch_size (int): Number of items encoded together by the segment writers.
+            flush_interval (float): Maximum seconds between two segment writes.
+            queue_size (int): Maximum number of pending items per segment writer, 0 for no limit.
+            write_urls (bool): Whether 'Url' items are written, or only passed through.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.backend = backend
+        self.directory = directory
+        self.compression = compression
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.write_urls = write_urls
+        self.stats = stats
+        self.writers: Dict[type, SegmentedFeedWriter] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "JsonWriterPipeline":
+        """
+        Create the pipeline from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            JsonWriterPipeline: The configured pipeline.
+        """
+        return cls.from_settings(crawler.settings, crawler.stats)
+
+    @classmethod
+    def from_settings(cls, settings: Settings, stats: Optional[StatsCollector] = None) -> "JsonWriterPipeline":
+        """
+        Create the pipeline from the project settings, e.g. outside of a crawl.
+
+        Args:
+            settings (Settings): The project settings.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+
+        Returns:
+            JsonWriterPipeline: The configured pipeline.
+        """
+        return cls(
+            backend=settings.get("JSONL_WRITER_BACKEND", "file"),
+            directory=settings.get("JSONL_DIRECTORY", "data"),
+            compression=settings.get("JSONL_SEGMENT_COMPRESSION", "gzip"),
+            max_segment_bytes=settings.getint("JSONL_SEGMENT_MAX_BYTES", 64 * 1024 * 1024),
+            max_segment_age=settings.getfloat("JSONL_SEGMENT_MAX_AGE", 3600.0),
+            batch_size=settings.getint("JSONL_BATCH_SIZE", 500),
+            flush_interval=settings.getfloat("JSONL_FLUSH_INTERVAL", 2.0),
+            queue_size=settings.getint("JSONL_QUEUE_SIZE", 10000),
+            write_urls=settings.getbool("JSONL_WRITE_URLS", True),
+            stats=stats,
+        )
+
     def open_spider(self, spider: Spider) -> None:
         """
-        Open the spider, initializing the file handlers for URLs and Articles.
+        Open the spider, initializing the file handlers or segment writers for URLs and Articles.
 
         Args:
             spider (Spider): The spider that was opened.
         """
-        if not os.path.exists("data"):
-            os.makedirs("data")
-
-        mode = "a" if os.path.exists("data/urls.jsonl") else "w"
-        self.url_file = open("data/urls.jsonl", mode)
-
-        mode = "a" if os.path.exists("data/articles.jsonl") else "w"
-        self.article_file = open("data/articles.jsonl", mode)
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        if self.backend == "segmented":
+            for item_type, prefix in ((Url, "urls"), (Article, "articles")):
+                writer = SegmentedFeedWriter(
+                    os.path.join(self.directory, prefix),
+                    prefix,
+                    compression=self.compression,
+                    max_segment_bytes=self.max_segment_bytes,
+                    max_segment_age=self.max_segment_age,
+                    batch_size=self.batch_size,
+                    flush_interval=self.flush_interval,
+                    queue_size=self.queue_size,
+                    stats=self.stats,
+                )
+                writer.start()
+                self.writers[item_type] = writer
+            return
+
+        url_path = os.path.join(self.directory, "urls.jsonl")
+        mode = "a" if os.path.exists(url_path) else "w"
+        self.url_file = open(url_path, mode)
+
+        article_path = os.path.join(self.directory, "articles.jsonl")
+        mode = "a" if os.path.exists(article_path) else "w"
+        self.article_file = open(article_path, mode)
 
     def close_spider(self, spider: Spider) -> None:
         """
-        Close the spider, closing the file handlers for URLs and Articles.
+        Close the spider, closing the file handlers or segment writers for URLs and Articles.
 
         Args:
             spider (Spider): The spider that was closed.
         """
+        if self.writers:
+            for writer in self.writers.values():
+                writer.close()
+            self.writers = {}
+            return
+
         self.url_file.close()
         self.article_file.close()
 
-    def process_item(self, item: Union[Article, Url], spider: Spider) -> Union[Article, Url]:
+    @timed_stage
+    def process_item(self, item: Union[Article, Url], spider: Spider) -> Union[Article, Url, Deferred]:
         """
         Process the item and write it to the appropriate JSON file.
 
@@ -261,26 +740,114 @@ class JsonWriterPipeline:
             spider (Spider): The spider that scraped the item.
 
         Returns:
-            Item: The item that was processed.
+            Item: The item that was processed, or a Deferred firing with it when a segment writer is full.
         """
-        if isinstance(item, Url):
-            line = json.dumps(ItemAdapter(item).asdict()) + "\n"
-            self.url_file.write(line)
+        if not isinstance(item, (Url, Article)):
+            raise DropItem(f"Unhandled item type: {type(item)}")
+        if isinstance(item, Url) and not self.write_urls:
             return item
-        elif isinstance(item, Article):
-            line = json.dumps(ItemAdapter(item).asdict()) + "\n"
-            self.article_file.write(line)
+
+        if self.writers:
+            writer = self.writers[type(item)]
+            deferred = writer.offer(ItemAdapter(item).asdict())
+            if deferred is not None:
+                deferred.addCallback(lambda _: item)
+                return deferred
             return item
+
+        line = json.dumps(ItemAdapter(item).asdict()) + "\n"
+        if isinstance(item, Url):
+            self.url_file.write(line)
         else:
-            raise DropItem(f"Unhandled item type: {type(item)}")
+            self.article_file.write(line)
+        return item
 
 
 class SQLitePipeline:
-    def __init__(self) -> None:
+    """
+    A pipeline for storing 'Article' items into the SQLite database.
+
+    In "sync" mode every item is inserted on the reactor thread and committed when
+    the spider closes. In "batched" mode items are handed over to a SQLiteBatchWriter
+    thread which flushes them with ``executemany`` by batch or on a time interval.
+
+    Once articles are committed, their URLs are sent with the articles_stored signal,
+    from the reactor thread, so that the crawl state (URL file checkpoint, frontier,
+    incremental validators) only moves past the pages whose article is stored.
+    """
+
+    def __init__(
+        self,
+        db_file: str = "db/scrahp.db",
+        mode: str = "sync",
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        queue_size: int = 10000,
+        upsert: bool = False,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
         """
-        Initialize the SQLitePipeline indicating the database file location.
+        Initialize the SQLitePipeline indicating the database file location and writer mode.
+
+        Args:
+            db_file (str): Path of the SQLite database file.
+            mode (str): Either "sync" or "batched".
+            batch_size (int): Number of rows per flush in batched mode.
+            flush_interval (float): Maximum seconds between flushes in batched mode.
+            queue_size (int): Maximum number of pending rows in batched mode, 0 for no limit.
+            upsert (bool): Whether articles already stored are updated instead of ignored.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+        """
+        self.db_file = db_file
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.upsert = upsert
+        self.stats = stats
+        self.writer: Optional[SQLiteBatchWriter] = None
+        self.signals: Optional[SignalManager] = None
+        self.spider: Optional[Spider] = None
+        # URLs of the articles committed since the last articles_stored signal, appended by the writer thread
+        self.stored_urls: List[str] = []
+        self.stored_lock = threading.Lock()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "SQLitePipeline":
+        """
+        Create the pipeline from the crawler settings.
+
+        Args:
+            crawler (Crawler): The running crawler.
+
+        Returns:
+            SQLitePipeline: The configured pipeline.
+        """
+        pipeline = cls.from_settings(crawler.settings, crawler.stats)
+        pipeline.signals = crawler.signals
+        return pipeline
+
+    @classmethod
+    def from_settings(cls, settings: Settings, stats: Optional[StatsCollector] = None) -> "SQLitePipeline":
         """
-        self.db_file = "db/scrahp.db"
+        Create the pipeline from the project settings, e.g. outside of a crawl.
+
+        Args:
+            settings (Settings): The project settings.
+            stats (Optional[StatsCollector]): Scrapy stats collector.
+
+        Returns:
+            SQLitePipeline: The configured pipeline.
+        """
+        return cls(
+            db_file=settings.get("SQLITE_DB_FILE", "db/scrahp.db"),
+            mode=settings.get("SQLITE_WRITER_MODE", "sync"),
+            batch_size=settings.getint("SQLITE_BATCH_SIZE", 500),
+            flush_interval=settings.getfloat("SQLITE_FLUSH_INTERVAL", 2.0),
+            queue_size=settings.getint("SQLITE_QUEUE_SIZE", 10000),
+            upsert=settings.getbool("SQLITE_UPSERT", False),
+            stats=stats,
+        )
 
     def open_spider(self, spider: Spider) -> None:
         """
@@ -289,10 +856,24 @@ class SQLitePipeline:
         Args:
             spider (Spider): The spider that is being opened.
         """
+        self.spider = spider
         try:
             # Connect to the SQLite database
-            self.conn = sqlite3.connect(self.db_file)
-            self.c = self.conn.cursor()
+            if self.mode == "batched":
+                conn = connect_writer(self.db_file, check_same_thread=False)
+                self.writer = SQLiteBatchWriter(
+                    conn,
+                    batch_size=self.batch_size,
+                    flush_interval=self.flush_interval,
+                    queue_size=self.queue_size,
+                    upsert=self.upsert,
+                    on_written=self.rows_written if self.signals is not None else None,
+                    stats=self.stats,
+                )
+                self.writer.start()
+            else:
+                self.conn = connect_writer(self.db_file)
+                self.c = self.conn.cursor()
         except sqlite3.OperationalError:
             print(f"Database file '{self.db_file}' does not exist. Skipping database operations.")
 
@@ -303,34 +884,78 @@ class SQLitePipeline:
         Args:
             spider (Spider): The spider that is being closed.
         """
-        if hasattr(self, "conn"):
+        if self.writer is not None:
+            # Flush the buffered rows and stop the writer thread
+            self.writer.close()
+            self.writer = None
+        elif hasattr(self, "conn"):
             # Commit the changes and close the connection
             self.conn.commit()
             self.conn.close()
+        self.send_stored()
 
-    def process_item(self, item: Url, spider: Spider) -> Url:
+    def rows_written(self, rows: List[ArticleRow]) -> None:
         """
-        Process every item and insert it into the SQLite database.
+        Collect the URLs of a committed flush, from the writer thread, and signal them from the reactor thread.
 
         Args:
-            item (Url): The item scraped by the spider.
+            rows (List[ArticleRow]): The (title, url, author, content) rows that were committed.
+        """
+        from twisted.internet import reactor
+
+        with self.stored_lock:
+            self.stored_urls.extend(row[1] for row in rows)
+        reactor.callFromThread(self.send_stored)
+
+    def send_stored(self) -> None:
+        """
+        Send the articles_stored signal with the URLs of the articles committed since the last one.
+        """
+        with self.stored_lock:
+            urls, self.stored_urls = self.stored_urls, []
+        if urls and self.signals is not None:
+            self.signals.send_catch_log(scrahp_signals.articles_stored, urls=urls, spider=self.spider)
+
+    @timed_stage
+    def process_item(self, item: Union[Article, Url], spider: Spider) -> Union[Article, Url, Deferred]:
+        """
+        Process every 'Article' item and insert it into the SQLite database. Other items are passed through.
+
+        In batched mode the item is queued for the writer thread. When the queue is full, a Deferred
+        fired by the writer thread once the row is queued is returned, so that Scrapy applies backpressure.
+
+        Args:
+            item (Union[Article, Url]): The item scraped by the spider.
             spider (Spider): The spider that scraped the item.
 
         Returns:
-            Url: The processed item.
+            Union[Article, Url, Deferred]: The processed item, or a Deferred firing with it.
         """
-        if not hasattr(self, "conn"):
+        if not isinstance(item, Article):
+            return item
+        if self.writer is None and not hasattr(self, "conn"):
+            # Without a database, the article is as stored as it gets
+            if self.signals is not None:
+                self.signals.send_catch_log(scrahp_signals.articles_stored, urls=[ItemAdapter(item).get("url")], spider=spider)
             return item
 
         # Extract values from the item
         adapter = ItemAdapter(item)
+        row = (adapter.get("title"), adapter.get("url"), adapter.get("author"), adapter.get("content"))
+
+        if self.writer is not None:
+            deferred = self.writer.offer(row)
+            if deferred is not None:
+                if self.stats is not None:
+                    self.stats.inc_value("sqlite/backpressure_waits")
+                deferred.addCallback(lambda _: item)
+                return deferred
+            return item
 
-        title = adapter.get("title")
-        url = adapter.get("url")
-        author = adapter.get("author")
-        content = adapter.get("content")
-
-        # Insert the article into the database, ignoring duplicates based on the URL
-        self.c.execute("INSERT OR IGNORE INTO articles (title, url, author, content) VALUES (?, ?, ?, ?)", (title, url, author, content))
+        # Insert the article into the database, ignoring or updating duplicates based on the URL
+        self.c.execute(UPSERT_ARTICLE if self.upsert else INSERT_ARTICLE, row)
+        if self.signals is not None:
+            # Signaled once committed, when the spider closes
+            self.stored_urls.append(row[1])
 
         return item
@@ -0,0 +1,211 @@
+"""
+Offline re-parse of the archived pages.
+
+Re-extracts the articles of every page stored in the page archive by the articles
+callback (of the articles, stream or feeds spider), or saved as ``.html`` files by older versions of the spiders, with the
+extraction logic and the ArticlePipeline of ArticlesSpider. The pages of the other
+spiders (e.g. the section pages of the urls spider) are not articles and are not
+re-parsed. Pages whose spider is unknown (``.html`` files, pages archived before
+the spider was recorded) are only kept when they have an article body. Pages are parsed in a pool of processes,
+one per core by default, and the resulting articles are written through the
+NearDuplicatePipeline, JsonWriterPipeline and SQLitePipeline of the project.
+No request is sent and no reactor is started.
+
+Usage:
+    python -m scrahp.reparse [--archive pages] [--pages-dir pages] [--workers N]
+"""
+
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+from scrapy.utils.project import get_project_settings
+
+from scrahp.archive import PageArchiveReader
+from scrahp.items import Article
+from scrahp.pipelines import ArticlePipeline, JsonWriterPipeline, NearDuplicatePipeline, SQLitePipeline
+from scrahp.spiders.articles import ArticlesSpider
+
+logger = logging.getLogger(__name__)
+
+# (url, file path, record offset, compressed record length, spider name), the url, length and spider are None for plain .html files
+PageTask = Tuple[Optional[str], str, int, Optional[int], Optional[str]]
+
+URL_XPATH = '//link[@rel="canonical"]/@href | //meta[@property="og:url"]/@content'
+
+# Per worker process state, created once by init_worker
+worker_spider: Optional[ArticlesSpider] = None
+worker_pipeline: Optional[ArticlePipeline] = None
+
+
+def iter_tasks(archive: Optional[str], pages_dir: Optional[str]) -> Iterator[PageTask]:
+    """
+    List the pages to re-parse.
+
+    Args:
+        archive (Optional[str]): Directory of a page archive, or None.
+        pages_dir (Optional[str]): Directory of .html files saved by older versions of the spiders, or None.
+
+    Yields:
+        PageTask: The location of every page.
+    """
+    if archive and os.path.exists(os.path.join(archive, "index.db")):
+        reader = PageArchiveReader(archive)
+        try:
+            yield from reader.locations([ArticlesSpider.name, None])
+        finally:
+            reader.close()
+
+    if pages_dir:
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            yield None, path, 0, None, None
+
+
+def init_worker() -> None:
+    """
+    Create the spider and the pipeline used by a worker process.
+    """
+    global worker_spider, worker_pipeline
+    worker_spider = ArticlesSpider()
+    worker_pipeline = ArticlePipeline()
+
+
+def parse_page(task: PageTask) -> Tuple[str, Optional[Article]]:
+    """
+    Read a page and extract its article, in a worker process.
+
+    Args:
+        task (PageTask): The location of the page.
+
+    Returns:
+        Tuple[str, Optional[Article]]: The outcome ("parsed", "skipped", "no_url", "not_article" or "failed") and the cleaned article.
+    """
+    assert worker_spider is not None and worker_pipeline is not None
+    url, path, offset, length, spider = task
+    try:
+        with open(path, "rb") as file:
+            body = PageArchiveReader.read_record(file, offset, length) if length is not None else file.read()
+
+        response = HtmlResponse(url=url or f"file://{os.path.abspath(path)}", body=body)
+        root = response.selector.root
+        if url is None:
+            # Plain .html files do not keep their URL, the page usually declares it
+            candidates = root.xpath(URL_XPATH)
+            if not candidates:
+                return "no_url", None
+            url = str(candidates[0]).strip()
+
+        if not worker_spider.is_usable_url(url):
+            return "skipped", None
+
+        extraction = worker_spider.extractor.extract(root)
+        if spider is None and extraction["content"][0] is None:
+            # Probably a section page of the urls spider
+            return "not_article", None
+        article = worker_spider.load_article(url, extraction)
+        return "parsed", worker_pipeline.process_item(article, worker_spider)
+    except Exception:
+        logger.warning("Failed to re-parse %s", url or path, exc_info=True)
+        return "failed", None
+
+
+def open_pipelines(settings: Settings, spider: ArticlesSpider) -> List[Any]:
+    """
+    Create and open the storage pipelines of the articles spider.
+
+    The writer queues are unbounded: without a reactor the pipelines cannot hand
+    back a Deferred, and the pool already bounds the number of pages in flight.
+
+    Args:
+        settings (Settings): The project settings.
+        spider (ArticlesSpider): The spider passed to the pipelines.
+
+    Returns:
+        List[Any]: The opened pipelines, in the order of the spider.
+    """
+    settings = settings.copy()
+    settings.set("JSONL_QUEUE_SIZE", 0)
+    settings.set("SQLITE_QUEUE_SIZE", 0)
+    settings.set("SQLITE_UPSERT", True)
+    pipelines = [
+        NearDuplicatePipeline.from_settings(settings),
+        JsonWriterPipeline.from_settings(settings),
+        SQLitePipeline.from_settings(settings),
+    ]
+    for pipeline in pipelines:
+        pipeline.open_spider(spider)
+    return pipelines
+
+
+def reparse(archive: Optional[str], pages_dir: Optional[str], workers: int, chunk_size: int, settings: Settings) -> Dict[str, int]:
+    """
+    Re-parse every page and write the articles through the storage pipelines.
+
+    Args:
+        archive (Optional[str]): Directory of a page archive, or None.
+        pages_dir (Optional[str]): Directory of .html files, or None.
+        workers (int): Number of worker processes.
+        chunk_size (int): Number of pages sent to a worker at once.
+        settings (Settings): The project settings.
+
+    Returns:
+        Dict[str, int]: The number of pages per outcome, and of stored and dropped articles.
+    """
+    spider = ArticlesSpider()
+    pipelines = open_pipelines(settings, spider)
+    counts: Dict[str, int] = {}
+    try:
+        # Not forked: the writer threads of the pipelines are already running
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with multiprocessing.get_context(method).Pool(workers, initializer=init_worker) as pool:
+            for outcome, article in pool.imap_unordered(parse_page, iter_tasks(archive, pages_dir), chunksize=chunk_size):
+                counts[outcome] = counts.get(outcome, 0) + 1
+                if article is None:
+                    continue
+                try:
+                    for pipeline in pipelines:
+                        article = pipeline.process_item(article, spider)
+                except DropItem:
+                    counts["dropped"] = counts.get("dropped", 0) + 1
+                    continue
+                counts["stored"] = counts.get("stored", 0) + 1
+    finally:
+        for pipeline in pipelines:
+            pipeline.close_spider(spider)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Parse the command line and run the re-parse.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments, defaults to sys.argv.
+    """
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "scrahp.settings")
+    settings = get_project_settings()
+
+    parser = argparse.ArgumentParser(description="Re-extract the articles of the archived pages, without crawling.")
+    parser.add_argument("--archive", default=settings.get("ARCHIVE_DIR", "pages"), help="page archive directory")
+    parser.add_argument("--pages-dir", default=None, help="directory of .html pages saved by older versions of the spiders")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=64, help="number of pages sent to a worker at once")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    start = time.perf_counter()
+    counts = reparse(args.archive, args.pages_dir, args.workers, args.chunk_size, settings)
+    elapsed = time.perf_counter() - start
+    pages = sum(counts.get(outcome, 0) for outcome in ("parsed", "skipped", "no_url", "not_article", "failed"))
+    logger.info("Re-parsed %d pages in %.1fs (%.0f pages/s): %s", pages, elapsed, pages / elapsed if elapsed else 0, counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
 BOT_NAME = "scrahp"
 
 SPIDER_MODULES = ["scrahp.spiders"]
@@ -44,21 +46,26 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-# SPIDER_MIDDLEWARES = {
-#    "scrahp.middlewares.ScrahpSpiderMiddleware": 543,
-# }
+SPIDER_MIDDLEWARES = {
+    "scrahp.middlewares.ScrahpSpiderMiddleware": 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-# DOWNLOADER_MIDDLEWARES = {
-#    "scrahp.middlewares.ScrahpDownloaderMiddleware": 543,
-# }
+DOWNLOADER_MIDDLEWARES = {
+    "scrahp.middlewares.ScrahpDownloaderMiddleware": 543,
+    # Before the RetryMiddleware (550), to see the failed requests before they are retried
+    "scrahp.middlewares.ScrahpAutotuneMiddleware": 560,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-# EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-# }
+EXTENSIONS = {
+    #    "scrapy.extensions.telnet.TelnetConsole": None,
+    "scrahp.archive.PageArchiveExtension": 500,
+    "scrahp.offload.ParsePoolExtension": 510,
+    "scrahp.metrics.MetricsExporter": 520,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -68,6 +75,144 @@ ROBOTSTXT_OBEY = True
 # 'scrahp.pipelines.SQLitePipeline': 500,
 # }
 
+# Configure the SQLite storage pipeline
+# "sync" inserts on the reactor thread, "batched" flushes from a writer thread
+SQLITE_DB_FILE = "db/scrahp.db"
+SQLITE_WRITER_MODE = "batched"
+# Number of rows flushed with a single executemany
+SQLITE_BATCH_SIZE = 500
+# Maximum number of seconds a row can stay buffered before being flushed
+SQLITE_FLUSH_INTERVAL = 2.0
+# Maximum number of pending rows before the pipeline applies backpressure
+SQLITE_QUEUE_SIZE = 10000
+# Update the articles already stored instead of ignoring them
+SQLITE_UPSERT = False
+
+# Configure the JSONL writer pipeline
+# "file" appends to data/urls.jsonl and data/articles.jsonl (read by the articles spider),
+# "segmented" streams compressed segments and a manifest under data/urls/ and data/articles/
+JSONL_WRITER_BACKEND = "file"
+JSONL_DIRECTORY = "data"
+# Either "gzip" or "zstd" (requires the zstandard package)
+JSONL_SEGMENT_COMPRESSION = "gzip"
+# Rotate a segment after this many uncompressed bytes or seconds
+JSONL_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+JSONL_SEGMENT_MAX_AGE = 3600
+JSONL_BATCH_SIZE = 500
+JSONL_FLUSH_INTERVAL = 2.0
+JSONL_QUEUE_SIZE = 10000
+# Write the Url items, set to False when the stream spider does not need data/urls.jsonl as a side output
+JSONL_WRITE_URLS = True
+
+# Configure the near-duplicate article detection pipeline, an empty index file keeps the fingerprints in memory only
+NEAR_DUPLICATE_INDEX_FILE = "data/simhash.index"
+# "drop" discards near-duplicates, "link" keeps them with a 'duplicate_of' field
+NEAR_DUPLICATE_ACTION = "drop"
+# Maximum number of differing SimHash bits between near-duplicates
+NEAR_DUPLICATE_MAX_DISTANCE = 3
+# Articles with fewer words are never considered near-duplicates
+NEAR_DUPLICATE_MIN_TOKENS = 20
+
+# Configure the persistent Bloom filter rejecting already seen URLs.
+# The stream and feeds spiders keep the URLs of their stored articles in data/stream.bloom
+URL_FILTER_FILE = "data/urls.bloom"
+# 20 million URLs at a 0.1% false positive rate take about 36 MB
+URL_FILTER_CAPACITY = 20_000_000
+URL_FILTER_ERROR_RATE = 0.001
+
+# Configure how the articles spider reads data/urls.jsonl
+# Resume from the byte offset checkpointed by the previous run
+ARTICLES_RESUME = True
+# Skip URLs already stored in the articles table, checked in bulk per batch
+ARTICLES_SKIP_EXISTING = True
+ARTICLES_BATCH_SIZE = 500
+# Number of handled requests (article stored or dropped, request failed) between two checkpoint writes
+ARTICLES_CHECKPOINT_INTERVAL = 100
+
+# Configure the adaptive ordering of the article extraction queries
+# Reorder the queries of every URL path prefix by learned hit rate
+SELECTOR_ADAPTIVE = True
+SELECTOR_STATS_FILE = "data/selector_stats.json"
+# Number of pages of a prefix before its learned order is used
+SELECTOR_MIN_SAMPLES = 20
+# Per page decay of the query scores, lower values adapt faster to layout changes
+SELECTOR_DECAY = 0.99
+# Log a warning when more than this share of a prefix's pages fall back to "n/a"
+SELECTOR_MAX_MISS_RATE = 0.5
+
+# Configure the page archive storing a compressed copy of every crawled page
+ARCHIVE_ENABLED = True
+# Directory holding the pages-<seq>.warc.gz segments and their index.db
+ARCHIVE_DIR = "pages"
+# Start a new segment once the current one reaches this compressed size
+ARCHIVE_SEGMENT_MAX_BYTES = 512 * 1024 * 1024
+# Maximum number of pages waiting for the archive writer, the next ones are not archived (archive/dropped)
+ARCHIVE_QUEUE_SIZE = 1000
+
+# Configure the incremental recrawl (ScrahpDownloaderMiddleware)
+# Send conditional requests and skip the pages unchanged since the last crawl
+INCREMENTAL_ENABLED = True
+# Stores the ETag, Last-Modified and body hash of every crawled URL
+INCREMENTAL_STORE_FILE = "data/validators.db"
+# Also skip 200 responses whose body hash did not change (servers ignoring conditional requests)
+INCREMENTAL_SKIP_UNCHANGED = True
+
+# Configure the per host concurrency autotuner (ScrahpAutotuneMiddleware), ignored when AutoThrottle is enabled
+# Every AUTOTUNE_WINDOW requests of a host, its concurrency is cut by AUTOTUNE_DECREASE_FACTOR (then its delay doubled)
+# when the p95 latency or the error rate is above target, otherwise its delay is halved (then its concurrency increased by one)
+# Disabled by default. The default maximum is Scrapy's per domain concurrency (8), which stays polite to bbc.com.
+# Only raise it against hosts you are allowed to load harder, along with CONCURRENT_REQUESTS, e.g.
+# scrapy crawl articles -s AUTOTUNE_ENABLED=True -s AUTOTUNE_MAX_CONCURRENCY=32 -s CONCURRENT_REQUESTS=64
+AUTOTUNE_ENABLED = False
+AUTOTUNE_TARGET_P95_LATENCY = 2.0
+# Maximum share of 429, 5xx and timed out requests
+AUTOTUNE_MAX_ERROR_RATE = 0.02
+AUTOTUNE_MIN_CONCURRENCY = 1
+AUTOTUNE_MAX_CONCURRENCY = 8
+AUTOTUNE_MAX_DELAY = 30.0
+AUTOTUNE_WINDOW = 20
+AUTOTUNE_DECREASE_FACTOR = 0.5
+
+# Configure the shared frontier, used by the articles spider when ARTICLES_SOURCE = "frontier"
+# Either "file" (read data/urls.jsonl) or "frontier" (lease URLs seeded with `python -m scrahp.frontier seed`)
+ARTICLES_SOURCE = "file"
+# Path of the SQLite frontier shared by the workers of a host, or URL of a `python -m scrahp.frontier serve` server
+FRONTIER = "data/frontier.db"
+# Number of URLs leased at once
+FRONTIER_BATCH_SIZE = 100
+# Number of seconds after which the URLs leased by a silent (crashed) worker are leased again
+FRONTIER_LEASE_TIMEOUT = 300
+# Number of failed leases after which a URL is given up
+FRONTIER_MAX_ATTEMPTS = 3
+# Number of handled requests between two reports (and lease renewals) to the frontier
+FRONTIER_REPORT_INTERVAL = 50
+# Token of the frontier server, required to serve a frontier and to connect to one, read from the environment
+FRONTIER_TOKEN = os.environ.get("FRONTIER_TOKEN")
+
+# Configure the stream spider, scheduling the articles found on the index pages in the same crawl
+# Number of seconds between two fetches of the index pages, 0 to fetch them once and stop when done
+STREAM_REFRESH_INTERVAL = 0
+
+# Keep latency histograms of every crawl stage in the stats collector
+STATS_CLASS = "scrahp.metrics.MetricsStatsCollector"
+# Export the crawl stats, histograms and queue depths periodically, for Prometheus ("prometheus") or as JSON lines ("jsonl")
+METRICS_ENABLED = True
+METRICS_FORMAT = "prometheus"
+METRICS_FILE = "data/metrics.prom"
+# Number of seconds between two exports
+METRICS_INTERVAL = 15.0
+
+# Parse the articles in a pool of worker processes instead of the reactor thread, 0 to parse them in the crawl process
+PARSE_PROCESSES = 0
+# Maximum number of pages handed to the worker processes at once, 0 for twice the number of processes
+PARSE_MAX_IN_FLIGHT = 0
+
+# Configure the feeds spider, discovering articles from RSS feeds and sitemaps
+# Entries (and sitemaps of a sitemap index) published or modified more than this many seconds ago are skipped, 0 to keep all
+FEEDS_MAX_AGE = 48 * 3600
+# Article requests lose one priority level per this many seconds of age, so the newest are fetched first
+FEEDS_PRIORITY_STEP = 900
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 # AUTOTHROTTLE_ENABLED = True
@@ -0,0 +1,12 @@
+"""
+Signals of the project, sent through the signal manager of the crawler like the Scrapy signals.
+
+articles_stored
+    Sent by the SQLitePipeline once articles are committed to the database, or
+    once they went through every pipeline when the database is not available.
+    Arguments:
+        urls (List[str]): The URLs of the articles.
+        spider (Spider): The spider that scraped the articles.
+"""
+
+articles_stored = object()
@@ -1,34 +1,62 @@
 import json
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+import os
+import socket
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import scrapy
-from scrapy.http import Response
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+from twisted.internet import threads
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
 
+from .. import signals as scrahp_signals
+from ..archive import archive_page
+from ..extraction import Extraction, SelectorEngine, SelectorStats, matched_query
+from ..frontier import Frontier, RemoteFrontier, open_frontier
 from ..items import Article
 from ..loaders import Loader
+from ..metrics import observe
+from ..offload import ParsePool, parse_article
 
 
 class ArticlesSpider(scrapy.Spider):
     """
     Spider for crawling specified URLs and extracting detailed article information.
 
-    This spider reads article URLs from a JSONL file and crawls each URL to extract
+    This spider streams article URLs from a JSONL file and crawls each URL to extract
     information such as the title, author, and content of the articles. Extracted data
     is stored in various formats using configured pipelines.
+
+    With ARTICLES_SOURCE set to "frontier", the URLs are leased in batches from a
+    shared Frontier instead, so that several spider processes, on one or several
+    hosts, crawl disjoint parts of it. The frontier is called from a thread of the
+    reactor thread pool, one call at a time, so that a slow database or server
+    never blocks the crawl.
+
+    A page only counts as done for the checkpoint or the frontier once its article
+    is stored (the articles_stored signal of the SQLitePipeline) or dropped by the
+    pipelines: the articles still buffered when the crawl is killed are crawled
+    again by the next run.
     """
 
     name: str = "articles"
     custom_settings: Optional[Dict[str, Dict[str, int]]] = {
         "ITEM_PIPELINES": {
             "scrahp.pipelines.ArticlePipeline": 300,
+            "scrahp.pipelines.NearDuplicatePipeline": 350,
             "scrahp.pipelines.JsonWriterPipeline": 400,
             "scrahp.pipelines.SQLitePipeline": 500,
         }
     }
     url_location: str = "./data/urls.jsonl"
-    local_urls: List[str] = []
-    author_queries: list[str] = [
+    title_queries: List[str] = ["h1::text"]
+    author_queries: List[str] = [
         "div.ssrcss-68pt20-Text-TextContributorName ::text",
         "div.author-unit ::text",
         "div.ssrcss-h3c0s8-ContributorContainer ::text",
@@ -45,66 +73,578 @@ class ArticlesSpider(scrapy.Spider):
         "article.ssrcss-pv1rh6-ArticleWrapper ::text",
     ]
 
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Initialize the spider, its extraction engine and the state used to checkpoint the URL file offset.
+        """
+        super().__init__(*args, **kwargs)
+        self.pending_offsets: Set[int] = set()
+        self.read_offset: int = 0
+        self.completed_since_checkpoint: int = 0
+        self.db_conn: Optional[sqlite3.Connection] = None
+        self.extractor = SelectorEngine({"title": self.title_queries, "author": self.author_queries, "content": self.content_queries})
+        self.selector_stats = SelectorStats()
+        self.adaptive_selectors = False
+        self.frontier: Optional[Union[Frontier, RemoteFrontier]] = None
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.frontier_done: List[str] = []
+        self.frontier_failed: List[str] = []
+        # Number of leased URLs not parsed yet, the frontier call in flight, and whether the frontier has nothing left
+        self.frontier_outstanding = 0
+        self.frontier_call: Optional[Deferred] = None
+        self.frontier_exhausted = False
+        # Requests of the parsed pages whose article is not stored yet, by URL
+        self.awaiting_storage: Dict[str, List[Request]] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler, *args: Any, **kwargs: Any) -> "ArticlesSpider":
+        """
+        Create the spider, listen to dropped requests so they do not block the checkpoint,
+        to the outcome of the articles in the pipelines, and load the selector statistics
+        of the previous runs.
+        """
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.request_dropped, signal=signals.request_dropped)
+        crawler.signals.connect(spider.articles_stored, signal=scrahp_signals.articles_stored)
+        crawler.signals.connect(spider.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(spider.item_error, signal=signals.item_error)
+        crawler.signals.connect(spider.spider_error, signal=signals.spider_error)
+
+        settings = crawler.settings
+        spider.adaptive_selectors = settings.getbool("SELECTOR_ADAPTIVE", True)
+        spider.selector_stats = SelectorStats(
+            path=settings.get("SELECTOR_STATS_FILE", "data/selector_stats.json"),
+            min_samples=settings.getint("SELECTOR_MIN_SAMPLES", 20),
+            decay=settings.getfloat("SELECTOR_DECAY", 0.99),
+        )
+        spider.selector_stats.load()
+
+        if settings.get("ARTICLES_SOURCE", "file") == "frontier":
+            spider.frontier = open_frontier(
+                settings.get("FRONTIER", "data/frontier.db"),
+                lease_timeout=settings.getfloat("FRONTIER_LEASE_TIMEOUT", 300.0),
+                max_attempts=settings.getint("FRONTIER_MAX_ATTEMPTS", 3),
+                token=settings.get("FRONTIER_TOKEN"),
+            )
+            crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        return spider
+
     def start_requests(self) -> Any:
         """
-        Generate initial requests from URLs loaded from a JSONL file.
+        Generate initial requests by streaming URLs from a JSONL file.
+
+        The file is read lazily from the last checkpointed byte offset, and URLs
+        already stored in the articles table are skipped in bulk, one query per batch.
+        The URLs of the frontier are leased by ``sync_frontier`` instead, from the
+        first spider_idle signal on.
+        """
+        if self.frontier is not None:
+            return
+
+        resume = self.settings.getbool("ARTICLES_RESUME", True)
+        skip_existing = self.settings.getbool("ARTICLES_SKIP_EXISTING", True)
+        batch_size = self.settings.getint("ARTICLES_BATCH_SIZE", 500)
+
+        self.read_offset = self.read_checkpoint() if resume else 0
+        if skip_existing:
+            self.db_conn = self.open_database()
+
+        for batch in self.iter_url_batches(self.url_location, self.read_offset, batch_size):
+            existing = self.existing_urls([url for _, _, url in batch])
+
+            for start, end, url in batch:
+                self.read_offset = end
+                if url in existing:
+                    self.crawler.stats.inc_value("articles/skipped_existing")
+                    continue
+                self.pending_offsets.add(start)
+                yield scrapy.Request(url=url, callback=self.parse, errback=self.errback, meta={"urls_offset": start})
+
+    def iter_url_batches(self, file_path: str, offset: int, batch_size: int) -> Iterator[List[Tuple[int, int, str]]]:
+        """
+        Lazily read URLs from a JSONL file in batches, starting at a byte offset.
+
+        A trailing line without a newline is treated as still being written and left for the next run.
+
+        Args:
+            file_path (str): Path to the JSONL file.
+            offset (int): Byte offset to start reading from.
+            batch_size (int): Number of URLs per batch.
+
+        Yields:
+            List[Tuple[int, int, str]]: Batches of (line start offset, line end offset, url).
+        """
+        if not os.path.exists(file_path):
+            self.logger.warning(f"URL file {file_path} does not exist, nothing to crawl")
+            return
+
+        batch: List[Tuple[int, int, str]] = []
+        with open(file_path, "rb") as file:
+            file.seek(offset)
+            position = offset
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                start, position = position, position + len(line)
+                try:
+                    url = json.loads(line)["url"]
+                except (ValueError, KeyError):
+                    self.logger.warning(f"Skipping malformed line at offset {start} of {file_path}")
+                    continue
+                batch.append((start, position, url))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def open_database(self) -> Optional[sqlite3.Connection]:
+        """
+        Open a read-only connection to the articles database, if it exists.
+
+        Returns:
+            Optional[sqlite3.Connection]: The connection, or None if the database is not available.
+        """
+        db_file = self.settings.get("SQLITE_DB_FILE", "db/scrahp.db")
+        try:
+            return sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        except sqlite3.OperationalError:
+            self.logger.warning(f"Database file '{db_file}' is not available, existing articles will not be skipped")
+            return None
+
+    def existing_urls(self, urls: List[str]) -> Set[str]:
+        """
+        Find which of the given URLs are already stored in the articles table.
+
+        Args:
+            urls (List[str]): The URLs to check.
+
+        Returns:
+            Set[str]: The URLs already stored.
+        """
+        if self.db_conn is None or not urls:
+            return set()
+
+        existing: Set[str] = set()
+        # Stay below SQLite's default limit of 999 host parameters per statement
+        for index in range(0, len(urls), 900):
+            chunk = urls[index : index + 900]
+            placeholders = ",".join("?" * len(chunk))
+            try:
+                rows = self.db_conn.execute(f"SELECT url FROM articles WHERE url IN ({placeholders})", chunk)
+            except sqlite3.OperationalError:
+                return existing
+            existing.update(row[0] for row in rows)
+        return existing
+
+    def checkpoint_file(self) -> str:
+        """
+        Return the path of the file storing the URL file offset checkpoint.
+        """
+        return f"{self.url_location}.checkpoint"
+
+    def read_checkpoint(self) -> int:
+        """
+        Read the checkpointed offset of the URL file.
+
+        Returns:
+            int: The offset to resume from, 0 if there is no usable checkpoint.
+        """
+        try:
+            with open(self.checkpoint_file(), "r") as file:
+                offset = int(json.load(file)["offset"])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+        # The URL file was truncated or replaced since the checkpoint was written
+        if not os.path.exists(self.url_location) or os.path.getsize(self.url_location) < offset:
+            return 0
+
+        self.logger.info(f"Resuming {self.url_location} from offset {offset}")
+        return offset
+
+    def write_checkpoint(self) -> None:
+        """
+        Write the offset before which every URL of the file has been handled.
+        """
+        offset = min(self.pending_offsets) if self.pending_offsets else self.read_offset
+        temporary = f"{self.checkpoint_file()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"offset": offset}, file)
+        os.replace(temporary, self.checkpoint_file())
+        self.completed_since_checkpoint = 0
+
+    def complete(self, request: Request) -> None:
+        """
+        Mark the URL file line of a request as handled and checkpoint periodically.
+
+        Args:
+            request (Request): The request that was handled.
+        """
+        if "frontier_url" in request.meta:
+            self.report_lease(request.meta["frontier_url"], done=True)
+            return
+
+        offset = request.meta.get("urls_offset")
+        if offset is None or offset not in self.pending_offsets:
+            return
+
+        self.pending_offsets.discard(offset)
+        self.completed_since_checkpoint += 1
+        if self.completed_since_checkpoint >= self.settings.getint("ARTICLES_CHECKPOINT_INTERVAL", 100):
+            self.write_checkpoint()
+
+    def errback(self, failure: Failure) -> None:
+        """
+        Handle a failed request so that it does not block the checkpoint.
+
+        Args:
+            failure (Failure): The failure of the request.
+        """
+        self.request_handled(failure.request)
+        # Ignored requests (e.g. pages unchanged since the last crawl) are handled, not failed
+        if "frontier_url" in failure.request.meta and not failure.check(IgnoreRequest):
+            self.report_lease(failure.request.meta["frontier_url"], done=False)
+            return
+        self.complete(failure.request)
+
+    def request_dropped(self, request: Request, spider: Spider) -> None:
+        """
+        Handle a request dropped by the scheduler (e.g. a duplicate URL).
+
+        Args:
+            request (Request): The dropped request.
+            spider (Spider): The spider the request belongs to.
+        """
+        if spider is self:
+            self.request_handled(request)
+            self.complete(request)
+
+    def articles_stored(self, urls: List[str], spider: Spider) -> None:
+        """
+        Complete the requests of the pages whose article was stored.
+
+        Args:
+            urls (List[str]): The URLs of the stored articles.
+            spider (Spider): The spider that scraped the articles.
+        """
+        if spider is not self:
+            return
+        for url in urls:
+            for request in self.awaiting_storage.pop(url, []):
+                self.complete(request)
+
+    def item_dropped(self, item: Any, response: Response, exception: Exception, spider: Spider) -> None:
+        """
+        Complete the request of a page whose article was dropped by the pipelines (e.g. a near-duplicate).
+
+        Args:
+            item (Any): The dropped item.
+            response (Response): The response the item was scraped from.
+            exception (Exception): The DropItem exception.
+            spider (Spider): The spider that scraped the item.
+        """
+        if spider is self and isinstance(item, Article):
+            for request in self.awaiting_storage.pop(response.url, []):
+                self.complete(request)
+
+    def item_error(self, item: Any, response: Response, spider: Spider, failure: Failure) -> None:
+        """
+        Handle a page whose article failed in the pipelines.
+
+        Leased URLs are reported as failed, to be retried by the frontier up to its maximum
+        number of attempts. The line of the URL file is completed like a page that could not
+        be parsed: the error would most likely happen again, and keeping the line pending
+        would pin the checkpoint before it on every later run.
+
+        Args:
+            item (Any): The failed item.
+            response (Response): The response the item was scraped from.
+            spider (Spider): The spider that scraped the item.
+            failure (Failure): The error of the pipeline.
+        """
+        if spider is not self or not isinstance(item, Article):
+            return
+        for request in self.awaiting_storage.pop(response.url, []):
+            if "frontier_url" in request.meta:
+                self.report_lease(request.meta["frontier_url"], done=False)
+            else:
+                self.complete(request)
+
+    def spider_error(self, failure: Failure, response: Response, spider: Spider) -> None:
+        """
+        Complete the request of a page that could not be parsed, parsing it again would fail the same way.
+
+        Args:
+            failure (Failure): The error of the spider.
+            response (Response): The response being parsed.
+            spider (Spider): The spider that failed.
+        """
+        if spider is self:
+            for request in self.awaiting_storage.pop(response.url, [response.request]):
+                self.complete(request)
+
+    def frontier_request(self, url: str) -> Request:
+        """
+        Build the request of a URL leased from the frontier.
+
+        Args:
+            url (str): The leased URL.
+
+        Returns:
+            Request: The request, exempt from the duplicate filter since the frontier already deduplicates.
+        """
+        return scrapy.Request(url=url, callback=self.parse, errback=self.errback, dont_filter=True, meta={"frontier_url": url})
+
+    def report_lease(self, url: str, done: bool) -> None:
+        """
+        Buffer the outcome of a leased URL, and call the frontier once enough outcomes are buffered.
+
+        Args:
+            url (str): The leased URL.
+            done (bool): Whether the URL was crawled, or failed.
+        """
+        (self.frontier_done if done else self.frontier_failed).append(url)
+        if self.needs_report():
+            self.sync_frontier()
+
+    def request_handled(self, request: Request) -> None:
+        """
+        Count a leased URL as handled once its page is parsed or its request failed, and lease
+        a new batch once the leased URLs run low.
+
+        The article of the page may still wait for its storage: the next batch is leased
+        meanwhile, so that the crawl does not stall on the writer flushes.
+
+        Args:
+            request (Request): The handled request.
+        """
+        if "frontier_url" not in request.meta:
+            return
+        self.frontier_outstanding -= 1
+        if self.needs_lease():
+            self.sync_frontier()
+
+    def needs_report(self) -> bool:
+        """
+        Check whether enough outcomes are buffered to report them.
+        """
+        return len(self.frontier_done) + len(self.frontier_failed) >= self.settings.getint("FRONTIER_REPORT_INTERVAL", 50)
+
+    def needs_lease(self) -> bool:
+        """
+        Check whether a new batch should be leased: less than half a batch of the leased URLs is left.
+        """
+        return not self.frontier_exhausted and self.frontier_outstanding <= self.settings.getint("FRONTIER_BATCH_SIZE", 100) // 2
+
+    def sync_frontier(self) -> None:
+        """
+        Report the buffered outcomes, renew the leases and lease a new batch if needed, in a thread.
+
+        Only one call is in flight at a time: the outcomes buffered meanwhile are
+        reported by the next one.
+        """
+        if self.frontier is None or self.frontier_call is not None:
+            return
+        done, failed = self.frontier_done, self.frontier_failed
+        self.frontier_done, self.frontier_failed = [], []
+        size = self.settings.getint("FRONTIER_BATCH_SIZE", 100) if self.needs_lease() else 0
+        self.frontier_call = threads.deferToThread(self.exchange_frontier, done, failed, size)
+        self.frontier_call.addCallbacks(self.frontier_synced, self.frontier_sync_failed, callbackArgs=(done, failed), errbackArgs=(done, failed))
+
+    def exchange_frontier(self, done: List[str], failed: List[str], size: int) -> Tuple[List[str], Optional[Dict[str, int]]]:
+        """
+        Report outcomes, renew the leases of the worker and lease URLs. Runs in a thread of the reactor thread pool.
+
+        Args:
+            done (List[str]): The crawled URLs.
+            failed (List[str]): The URLs that could not be crawled.
+            size (int): The number of URLs to lease, 0 for none.
+
+        Returns:
+            Tuple[List[str], Optional[Dict[str, int]]]: The leased URLs, and the counts of the frontier when nothing
+            could be leased.
+        """
+        assert self.frontier is not None
+        if done:
+            self.frontier.complete(self.worker_id, done)
+        if failed:
+            self.frontier.fail(self.worker_id, failed)
+        self.frontier.renew(self.worker_id)
+        urls = self.frontier.lease(self.worker_id, size) if size else []
+        return urls, self.frontier.counts() if size and not urls else None
+
+    def frontier_synced(self, result: Tuple[List[str], Optional[Dict[str, int]]], done: List[str], failed: List[str]) -> None:
+        """
+        Schedule the requests of the leased URLs, in the reactor thread.
+
+        Args:
+            result (Tuple[List[str], Optional[Dict[str, int]]]): The result of ``exchange_frontier``.
+            done (List[str]): The URLs reported as crawled.
+            failed (List[str]): The URLs reported as failed.
+        """
+        self.frontier_call = None
+        urls, counts = result
+        self.crawler.stats.inc_value("frontier/completed", len(done))
+        self.crawler.stats.inc_value("frontier/failed", len(failed))
+        if urls:
+            self.crawler.stats.inc_value("frontier/leased", len(urls))
+            self.frontier_outstanding += len(urls)
+            for url in urls:
+                self.crawler.engine.crawl(self.frontier_request(url))
+        # Done once no URL is pending nor leased, including the leases of this worker not reported yet
+        if counts is not None:
+            self.frontier_exhausted = not counts["pending"] and not counts["leased"]
+        # Outcomes buffered during the call, or a short batch
+        if self.needs_report() or (urls and self.needs_lease()):
+            self.sync_frontier()
+
+    def frontier_sync_failed(self, failure: Failure, done: List[str], failed: List[str]) -> None:
+        """
+        Log a failed frontier call and buffer its outcomes again, for the next call.
+
+        Args:
+            failure (Failure): The error of the call.
+            done (List[str]): The URLs that were to be reported as crawled.
+            failed (List[str]): The URLs that were to be reported as failed.
+        """
+        self.frontier_call = None
+        self.crawler.stats.inc_value("frontier/call_errors")
+        self.logger.error(f"Frontier call failed: {failure.getErrorMessage()}")
+        self.frontier_done = done + self.frontier_done
+        self.frontier_failed = failed + self.frontier_failed
+
+    def spider_idle(self, spider: Spider) -> None:
+        """
+        Lease more URLs when the spider runs out of requests.
+
+        The spider stays open while other workers hold leases, so that it picks up
+        the URLs of a worker that crashed once their lease expires.
+
+        Args:
+            spider (Spider): The idle spider.
+
+        Raises:
+            DontCloseSpider: If URLs are being leased or may still need to be crawled.
+        """
+        if spider is not self or self.frontier is None:
+            return
+        if self.frontier_done or self.frontier_failed or self.needs_lease():
+            self.sync_frontier()
+        if self.frontier_call is not None or not self.frontier_exhausted:
+            raise DontCloseSpider
+
+    def closed(self, reason: str) -> None:
+        """
+        Write the final checkpoint or frontier report, close the database connection and persist the selector statistics.
+
+        Args:
+            reason (str): The reason the spider was closed.
         """
-        articles_urls: List[str] = self.load_jsonl_file(self.url_location)
+        if self.frontier is not None:
+            # The reactor is stopping, the last report is sent from its thread
+            if self.frontier_done:
+                self.frontier.complete(self.worker_id, self.frontier_done)
+            if self.frontier_failed:
+                self.frontier.fail(self.worker_id, self.frontier_failed)
+            self.frontier.close()
+        else:
+            self.write_checkpoint()
+        if self.db_conn is not None:
+            self.db_conn.close()
 
-        for url in articles_urls:
-            yield scrapy.Request(url=url, callback=self.parse)
+        self.selector_stats.save()
+        self.crawler.stats.set_value("selectors/hit_rates", self.selector_stats.hit_rates())
+        for prefix, field, miss_rate in self.selector_stats.alerts(self.settings.getfloat("SELECTOR_MAX_MISS_RATE", 0.5)):
+            self.logger.warning(f"{miss_rate:.0%} of the {prefix} pages fell back to 'n/a' for {field}, the page layout may have changed")
 
     def parse(self, response: Response, **kwargs: Any) -> Any:
         """
         Parse the response and extract article information using the defined Loader.
 
+        With PARSE_PROCESSES set, the extraction and the cleaning of the article run in
+        the parse pool, and the article is returned once a worker process is done with it.
+        The request is completed once the article is stored or dropped, see ``articles_stored``.
+
         Args:
             response (Response): The response object to parse.
 
-        Yields:
-            Item: The extracted article item.
+        Returns:
+            Union[Iterator[Article], Deferred]: The extracted article item, or a Deferred firing with it.
         """
-        self.save_page_offline(response=response)
+        self.request_handled(response.request)
+        archive_page(self, response, ArticlesSpider.name)
+        if not self.is_usable_url(response.url):
+            self.complete(response.request)
+            return []
+        self.awaiting_storage.setdefault(response.url, []).append(response.request)
 
-        loader: Loader = Loader(item=Article(), selector=response)
+        prefix = self.selector_stats.prefix(response.url)
+        order = self.selector_stats.order(prefix, self.extractor.fields) if self.adaptive_selectors else None
+        parse_pool: Optional[ParsePool] = getattr(self, "parse_pool", None)
+        if parse_pool is not None:
+            deferred = parse_pool.submit(parse_article, response.url, response.body, response.encoding, order)
+            return deferred.addCallback(self.parsed_article, response, prefix)
 
-        if self.is_usable_url(response.url):
-            loader.add_css("title", "h1::text")
-            loader.add_value("url", response.url)
-            self.add_key(response=response, loader=loader, queries=self.author_queries, key="author")
-            self.add_key(response=response, loader=loader, queries=self.content_queries, key="content")
-            yield loader.load_item()
+        return self.extract_article(response, prefix, order)
 
-    def save_page_offline(self, response: Response) -> None:
-        page = response.url.split("/")[-2]
-        directory = "./pages/"
-        filename = f"{directory}Articles2-{page}.html"
+    def extract_article(self, response: Response, prefix: str, order: Optional[Dict[str, List[int]]]) -> Iterator[Article]:
+        """
+        Extract the article of a page in the crawl process, lazily so that ScrahpSpiderMiddleware times the extraction.
 
-        # Create the directory if it doesn"t exist
-        Path(directory).mkdir(parents=True, exist_ok=True)
+        Args:
+            response (Response): The response object to parse.
+            prefix (str): The path prefix of the page.
+            order (Optional[Dict[str, List[int]]]): The order of the queries of every field, or None for the declared order.
 
-        with open(filename, "wb") as file:
-            file.write(response.body)
+        Yields:
+            Article: The extracted article item.
+        """
+        extraction = self.extractor.extract(response.selector.root, order)
+        self.record_extraction(prefix, {field: matched_query(match) for field, match in extraction.items()})
+        start = time.perf_counter()
+        article = self.load_article(response.url, extraction)
+        observe(self.crawler.stats, "parse/loader_seconds", time.perf_counter() - start)
+        yield article
 
-        self.local_urls.append(filename)
-        self.log(f"Saved file {filename}")
+    def parsed_article(self, result: Tuple[Dict[str, Optional[int]], Article, float], response: Response, prefix: str) -> List[Article]:
+        """
+        Handle an article parsed by the parse pool.
 
-    def load_jsonl_file(self, file_path: str) -> List[str]:
+        Args:
+            result (Tuple[Dict[str, Optional[int]], Article, float]): The queries that filled every field, the cleaned article
+            and the worker parse time.
+            response (Response): The parsed response.
+            prefix (str): The path prefix of the page.
+
+        Returns:
+            List[Article]: The article item.
         """
-        Simple load of URLs from a JSONL file.
+        matches, article, parse_time = result
+        self.record_extraction(prefix, matches)
+        # Reported by ScrahpSpiderMiddleware, which only sees the time spent on the reactor thread
+        response.meta["parse_time"] = parse_time
+        return [article]
+
+    def load_article(self, url: str, extraction: Extraction) -> Article:
+        """
+        Load the values extracted from a page into an Article item.
+
+        Also used by the offline re-parse (scrahp.reparse), which runs without a crawler.
 
         Args:
-            file_path (str): Path to the JSONL file.
+            url (str): The URL of the page.
+            extraction (Extraction): The result of the extraction engine.
 
         Returns:
-            List[str]: A list of URLs.
+            Article: The loaded article item.
         """
-        data: List[Dict[str, str]] = []
-        with open(file_path, "r") as file:
-            for line in file:
-                item = json.loads(line)
-                data.append(item)
-        return [line["url"] for line in data]
+        loader: Loader = Loader(item=Article())
+        self.add_key(loader=loader, extraction=extraction, key="title", default=None)
+        loader.add_value("url", url)
+        self.add_key(loader=loader, extraction=extraction, key="author")
+        self.add_key(loader=loader, extraction=extraction, key="content")
+        return loader.load_item()
 
     def is_usable_url(self, url: str) -> bool:
         """
@@ -128,31 +668,33 @@ class ArticlesSpider(scrapy.Spider):
         else:
             return True
 
-    def extractable_content(self, response: Response, css_queries: List[str]) -> Optional[str]:
+    def record_extraction(self, prefix: str, matches: Dict[str, Optional[int]]) -> None:
         """
-        Determine if content is extractable using provided CSS queries.
-        Args
-            response (Response): The response object to query
-            css_queries (List[str]): A list of CSS queries to test.
-        Returns
-            Optional[str]: The first successful CSS query, or None if none are successful.
+        Record which query filled every field, in the selector statistics and the crawl stats.
+
+        Args:
+            prefix (str): The path prefix of the page.
+            matches (Dict[str, Optional[int]]): The query that filled every field, None for the fields falling back to "n/a",
+            see ``matched_query``.
         """
-        for query in css_queries:
-            if len(response.css(query)) > 0:
-                return query
-        return None
+        name = prefix.strip("/") or "root"
+        for field, query_index in matches.items():
+            query = self.extractor.fields[field][query_index] if query_index is not None else None
+            self.selector_stats.record(prefix, field, query)
+            outcome = f"hit/{query_index}" if query_index is not None else "miss"
+            self.crawler.stats.inc_value(f"selectors/{name}/{field}/{outcome}")
 
-    def add_key(self, response: Response, loader: Loader, queries: List[str], key: str) -> None:
+    def add_key(self, loader: Loader, extraction: Extraction, key: str, default: Optional[str] = "n/a") -> None:
         """
-        Add data to the loader based on the first successful CSS query
+        Add the values extracted for a key to the loader.
         Args:
-            response (Response): The response object to query.
             loader (Loader): The loader to add data to.
-            queries (List[str]): A list of CSS queries to try.
+            extraction (Extraction): The result of the extraction engine.
             key (str): The key to add to the loader.
+            default (Optional[str]): The value added when no query matched, or None to leave the key unset.
         """
-        potential_key = self.extractable_content(response, queries)
-        if potential_key is not None:
-            loader.add_css(key, potential_key)
-        else:
-            loader.add_value(key, "n/a")
+        _, values = extraction[key]
+        if values:
+            loader.add_value(key, values)
+        elif default is not None:
+            loader.add_value(key, default)
@@ -0,0 +1,239 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Iterator, List, Optional
+
+import scrapy
+from lxml import etree
+from scrapy.http import Request, Response
+from scrapy.utils.gz import gunzip, gzip_magic_number
+
+from scrahp.items import Url
+from scrahp.loaders import Loader
+
+from .stream import StreamSpider
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse the RFC 822 date of an RSS feed or the W3C date of a sitemap.
+
+    Args:
+        value (Optional[str]): The date to parse.
+
+    Returns:
+        Optional[datetime]: The timezone aware date, or None if it is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if value[:4].isdigit():
+            date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        else:
+            date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return date if date.tzinfo is not None else date.replace(tzinfo=timezone.utc)
+
+
+class FeedsSpider(StreamSpider):
+    """
+    Spider discovering articles from RSS feeds and sitemaps instead of section pages.
+
+    A feed entry costs a few hundred bytes where a section page costs hundreds of
+    kilobytes for a few dozen links, and feeds also list the articles that are not
+    promoted on the section pages. Entries are dated by their publication or
+    modification time: those older than FEEDS_MAX_AGE are skipped, as are the
+    sitemaps of a sitemap index last modified before then, and the article requests
+    of the others are prioritized newest first.
+
+    As for the stream spider, the discovered URLs go through the URL pipelines and
+    their articles are fetched in the same crawl.
+    """
+
+    name: str = "feeds"
+    feeds: List[str] = [
+        "https://feeds.bbci.co.uk/news/rss.xml",
+        "https://feeds.bbci.co.uk/news/world/rss.xml",
+        "https://feeds.bbci.co.uk/news/uk/rss.xml",
+        "https://feeds.bbci.co.uk/news/business/rss.xml",
+        "https://feeds.bbci.co.uk/news/technology/rss.xml",
+        "https://feeds.bbci.co.uk/news/science_and_environment/rss.xml",
+        "https://feeds.bbci.co.uk/news/health/rss.xml",
+        "https://feeds.bbci.co.uk/news/entertainment_and_arts/rss.xml",
+    ]
+    sitemaps: List[str] = [
+        "https://www.bbc.com/sitemaps/https-index-com-news.xml",
+    ]
+
+    def index_requests(self) -> Iterator[Request]:
+        """
+        Generate the requests of the feeds and sitemaps, fetched before any article request.
+
+        Yields:
+            Request: The requests of the feeds and sitemaps.
+        """
+        for url in self.feeds + self.sitemaps:
+            yield scrapy.Request(url=url, callback=self.parse, priority=100, dont_filter=True)
+
+    def parse(self, response: Response, **kwargs: Any) -> Any:
+        """
+        Parse an RSS feed, a sitemap or a sitemap index.
+
+        Args:
+            response (Response): The response object to parse.
+
+        Yields:
+            Union[Url, Request]: The URL items of the recent articles, and the requests of the recent sitemaps.
+        """
+        body = response.body
+        if gzip_magic_number(response):
+            body = gunzip(body)
+        self.crawler.stats.inc_value("feeds/bytes", len(body))
+
+        parser = etree.XMLParser(recover=True, remove_comments=True, resolve_entities=False)
+        root = etree.fromstring(body, parser=parser)
+        if root is None:
+            self.logger.warning(f"Could not parse the feed {response.url}")
+            return
+
+        tag = etree.QName(root).localname
+        if tag == "sitemapindex":
+            yield from self.parse_sitemap_index(root)
+        elif tag == "urlset":
+            yield from self.parse_sitemap(root, response)
+        else:
+            yield from self.parse_rss(root, response)
+
+    def parse_rss(self, root: Any, response: Response) -> Iterator[Url]:
+        """
+        Read the items of an RSS feed.
+
+        Args:
+            root (Any): The root element of the feed.
+            response (Response): The response of the feed.
+
+        Yields:
+            Url: The URL items of the recent articles.
+        """
+        for entry in root.iterfind(".//item"):
+            item = self.feed_item(entry.findtext("link"), entry.findtext("title"), parse_date(entry.findtext("pubDate")), response)
+            if item is not None:
+                yield item
+
+    def parse_sitemap(self, root: Any, response: Response) -> Iterator[Url]:
+        """
+        Read the entries of a sitemap, including the publication date and title of news sitemaps.
+
+        Args:
+            root (Any): The root element of the sitemap.
+            response (Response): The response of the sitemap.
+
+        Yields:
+            Url: The URL items of the recent articles.
+        """
+        for entry in root.iterfind("{*}url"):
+            published = parse_date(entry.findtext("{*}news/{*}publication_date")) or parse_date(entry.findtext("{*}lastmod"))
+            item = self.feed_item(entry.findtext("{*}loc"), entry.findtext("{*}news/{*}title"), published, response)
+            if item is not None:
+                yield item
+
+    def parse_sitemap_index(self, root: Any) -> Iterator[Request]:
+        """
+        Follow the sitemaps of a sitemap index modified within FEEDS_MAX_AGE.
+
+        Like the feeds themselves, the sitemaps are fetched again on every refresh of
+        the index, so their requests bypass the duplicate filter.
+
+        Args:
+            root (Any): The root element of the sitemap index.
+
+        Yields:
+            Request: The requests of the recent sitemaps.
+        """
+        for entry in root.iterfind("{*}sitemap"):
+            location = (entry.findtext("{*}loc") or "").strip()
+            if not location:
+                continue
+            if self.is_stale(parse_date(entry.findtext("{*}lastmod"))):
+                self.crawler.stats.inc_value("feeds/stale_sitemaps")
+                continue
+            yield scrapy.Request(url=location, callback=self.parse, priority=100, dont_filter=True)
+
+    def feed_item(self, link: Optional[str], title: Optional[str], published: Optional[datetime], response: Response) -> Optional[Url]:
+        """
+        Build the URL item of a feed entry, unless it is stale or not an article.
+
+        Args:
+            link (Optional[str]): The URL of the entry.
+            title (Optional[str]): The title of the entry.
+            published (Optional[datetime]): The publication or modification date of the entry.
+            response (Response): The response of the feed.
+
+        Returns:
+            Optional[Url]: The URL item, or None if the entry is skipped.
+        """
+        link = (link or "").strip()
+        if not link or not self.is_usable_url(link):
+            return None
+        if self.is_stale(published):
+            self.crawler.stats.inc_value("feeds/stale_entries")
+            return None
+
+        self.crawler.stats.inc_value("feeds/discovered")
+        url_loader: Loader = Loader(item=Url())
+        url_loader.add_value("title", (title or "").strip())
+        url_loader.add_value("base_url", self.extract_base_url(response))
+        url_loader.add_value("url", link)
+        if published is not None:
+            url_loader.add_value("published", published.astimezone(timezone.utc).isoformat())
+        return url_loader.load_item()
+
+    def is_stale(self, published: Optional[datetime]) -> bool:
+        """
+        Check whether a dated entry is older than FEEDS_MAX_AGE. Undated entries are never stale.
+
+        Args:
+            published (Optional[datetime]): The date of the entry.
+
+        Returns:
+            bool: True if the entry is too old to be crawled.
+        """
+        max_age = self.settings.getfloat("FEEDS_MAX_AGE", 48 * 3600)
+        return published is not None and max_age > 0 and (datetime.now(timezone.utc) - published).total_seconds() > max_age
+
+    def article_request(self, item: Url) -> Request:
+        """
+        Build the request of an article, prioritized by freshness.
+
+        The priority drops by one every FEEDS_PRIORITY_STEP seconds of age, so that
+        the scheduler fetches the newest articles first; undated ones come last.
+
+        Args:
+            item (Url): The cleaned URL item of the article.
+
+        Returns:
+            Request: The article request.
+        """
+        request = super().article_request(item)
+        step = self.settings.getfloat("FEEDS_PRIORITY_STEP", 900)
+        max_age = self.settings.getfloat("FEEDS_MAX_AGE", 48 * 3600)
+        published = parse_date(item.get("published"))
+        if published is None:
+            age = max_age + step
+        else:
+            age = max(0.0, (datetime.now(timezone.utc) - published).total_seconds())
+        return request.replace(priority=-int(age // step))
+
+    def closed(self, reason: str) -> None:
+        """
+        Report the feed bytes downloaded per discovered URL and close the spider.
+
+        Args:
+            reason (str): The reason the spider was closed.
+        """
+        stats = self.crawler.stats
+        discovered = stats.get_value("feeds/discovered", 0)
+        if discovered:
+            stats.set_value("feeds/bytes_per_url", round(stats.get_value("feeds/bytes", 0) / discovered, 1))
+        super().closed(reason)
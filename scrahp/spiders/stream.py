@@ -0,0 +1,127 @@
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import scrapy
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+
+from ..items import Url
+from .articles import ArticlesSpider
+from .urls import UrlsSpider
+
+
+class StreamSpider(UrlsSpider, ArticlesSpider):
+    """
+    Spider fusing the URL discovery of UrlsSpider and the article extraction of ArticlesSpider.
+
+    Every URL found on an index page goes through the UrlPipeline cleaning and the
+    UrlFilterPipeline deduplication, then the ArticleRequestPipeline schedules its
+    article request in the same crawl: new stories reach the database seconds after
+    they are discovered instead of at the next articles crawl. Writing the URLs to
+    'data/urls.jsonl' is kept as an optional side output (JSONL_WRITE_URLS).
+
+    With STREAM_REFRESH_INTERVAL set, the index pages are fetched again at this
+    interval and the spider runs until it is stopped.
+    """
+
+    name: str = "stream"
+    custom_settings: Optional[Dict[str, Any]] = {
+        "ITEM_PIPELINES": {
+            "scrahp.pipelines.UrlPipeline": 300,
+            "scrahp.pipelines.UrlFilterPipeline": 320,
+            "scrahp.pipelines.ArticleRequestPipeline": 340,
+            "scrahp.pipelines.ArticlePipeline": 360,
+            "scrahp.pipelines.NearDuplicatePipeline": 380,
+            "scrahp.pipelines.JsonWriterPipeline": 400,
+            "scrahp.pipelines.SQLitePipeline": 500,
+        },
+        # Article URLs come from the index pages, never from the URL file or the frontier
+        "ARTICLES_SOURCE": "file",
+        # The URLs of the stored articles, not the ones the urls spider discovered for a later articles crawl
+        "URL_FILTER_FILE": "data/stream.bloom",
+    }
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Initialize the spider and the time of the last index pages refresh.
+        """
+        super().__init__(*args, **kwargs)
+        self.last_refresh = 0.0
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler, *args: Any, **kwargs: Any) -> "StreamSpider":
+        """
+        Create the spider and listen to the idle signal to refresh the index pages.
+        """
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.refresh_index, signal=signals.spider_idle)
+        return spider
+
+    def start_requests(self) -> Any:
+        """
+        Generate the requests of the index pages.
+        """
+        self.last_refresh = time.monotonic()
+        return self.index_requests()
+
+    def index_requests(self) -> Iterator[Request]:
+        """
+        Generate the requests of the pages listing the articles.
+
+        Yields:
+            Request: The requests of the index pages.
+        """
+        for url in self.urls:
+            yield scrapy.Request(url=url, callback=self.parse, dont_filter=True)
+
+    def article_request(self, item: Url) -> Request:
+        """
+        Build the request of an article discovered on an index page.
+
+        Args:
+            item (Url): The cleaned URL item of the article.
+
+        Returns:
+            Request: The article request, fetched before the next index pages.
+        """
+        return scrapy.Request(url=item["url"], callback=self.parse_article, errback=self.errback, priority=1)
+
+    def parse_article(self, response: Response, **kwargs: Any) -> Any:
+        """
+        Parse an article page with the ArticlesSpider extraction.
+
+        Args:
+            response (Response): The response object to parse.
+
+        Yields:
+            Item: The extracted article item.
+        """
+        return ArticlesSpider.parse(self, response, **kwargs)
+
+    def write_checkpoint(self) -> None:
+        """
+        Do nothing, the stream spider does not read the URL file checkpointed by the articles spider.
+        """
+
+    def refresh_index(self, spider: Spider) -> None:
+        """
+        Fetch the index pages again once STREAM_REFRESH_INTERVAL has elapsed since the last refresh.
+
+        Args:
+            spider (Spider): The idle spider.
+
+        Raises:
+            DontCloseSpider: If the index pages are refreshed periodically.
+        """
+        interval = self.settings.getfloat("STREAM_REFRESH_INTERVAL", 0)
+        if spider is not self or interval <= 0:
+            return
+        if time.monotonic() - self.last_refresh >= interval:
+            self.last_refresh = time.monotonic()
+            self.crawler.stats.inc_value("stream/index_refreshes")
+            for request in self.index_requests():
+                self.crawler.engine.crawl(request)
+        raise DontCloseSpider
@@ -1,13 +1,13 @@
 #
 
 import re
-from pathlib import Path
 from typing import Any, List
 
 import scrapy
 from scrapy.http import Response
 from scrapy.selector import SelectorList
 
+from scrahp.archive import archive_page
 from scrahp.items import Url
 from scrahp.loaders import Loader
 
@@ -24,11 +24,11 @@ class UrlsSpider(scrapy.Spider):
     custom_settings = {
         "ITEM_PIPELINES": {
             "scrahp.pipelines.UrlPipeline": 300,
+            "scrahp.pipelines.UrlFilterPipeline": 350,
             "scrahp.pipelines.JsonWriterPipeline": 400,
         }
     }
     name: str = "urls"
-    local_urls: List[str] = []
     urls: List[str] = [
         # 'https://www.bbc.com/',
         "https://www.bbc.com/news",
@@ -41,6 +41,15 @@ class UrlsSpider(scrapy.Spider):
         # 'https://www.bbc.com/future'
     ]
 
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Initialize the spider. The pages to crawl can be given as a comma separated
+        spider argument, e.g. ``scrapy crawl urls -a urls=https://www.bbc.com/news,https://www.bbc.com/sport``.
+        """
+        super().__init__(*args, **kwargs)
+        if isinstance(self.urls, str):
+            self.urls = [url.strip() for url in self.urls.split(",") if url.strip()]
+
     def start_requests(self) -> Any:
         """
         Generates Scrapy Requests from the list of URLs to be crawled.
@@ -58,7 +67,7 @@ class UrlsSpider(scrapy.Spider):
         Yields:
             Item: The extracted URL item.
         """
-        self.save_page_offline(response=response)
+        archive_page(self, response, UrlsSpider.name)
         available_urls: SelectorList = response.css("a.gs-c-promo-heading")
 
         for url in available_urls:
@@ -68,26 +77,6 @@ class UrlsSpider(scrapy.Spider):
             url_loader.add_css("url", "a::attr(href)")
             yield url_loader.load_item()
 
-    def save_page_offline(self, response: Response) -> None:
-        """
-        Save a copy of the crawled page for offline analysis and eventual backup.
-
-        Args:
-            response (Response): The response object to save.
-        """
-        page = response.url.split("/")[-2]
-        directory = "./pages/"
-        filename = f"{directory}Articles2-{page}.html"
-
-        # Create the directory if it doesn't exist
-        Path(directory).mkdir(parents=True, exist_ok=True)
-
-        with open(filename, "wb") as file:
-            file.write(response.body)
-
-        self.local_urls.append(filename)
-        self.log(f"Saved file {filename}")
-
     def extract_base_url(self, response: Response) -> str:
         """
         Extract the base URL from the response object because it's needed futher in the process.
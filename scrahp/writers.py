@@ -0,0 +1,504 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timezone
+from typing import IO, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from scrapy.statscollectors import StatsCollector
+from twisted.internet.defer import Deferred
+
+from scrahp.metrics import COUNT_BUCKETS, observe
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ArticleRow = Tuple[Any, Any, Any, Any]
+
+
+def json_line_encoder() -> Callable[[Dict[str, Any]], bytes]:
+    """
+    Return the fastest available encoder turning a dict into a JSON line.
+
+    Returns:
+        Callable[[Dict[str, Any]], bytes]: orjson when installed, the standard json module otherwise.
+    """
+    if orjson is not None:
+        return lambda obj: orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return lambda obj: (json.dumps(obj) + "\n").encode("utf-8")
+
+
+class BatchingWriter(threading.Thread, ABC):
+    """
+    Base class for background writers consuming a bounded queue in batches.
+
+    Subclasses implement ``write_batch``. A batch is written whenever it is full
+    or the flush interval has elapsed, and ``on_tick`` is called after each wake-up
+    so that time based work (rotation, commits) also happens when the queue is idle.
+
+    Producers running in the reactor thread use ``offer``, which never blocks: when
+    the queue is full the record waits in line and a Deferred is returned, fired
+    from the reactor by the writer thread once the record entered the queue. No
+    thread is held while waiting, unlike a blocking ``put`` in the reactor thread pool.
+    """
+
+    _STOP = object()
+
+    def __init__(self, name: str, batch_size: int, flush_interval: float, queue_size: int) -> None:
+        """
+        Initialize the writer thread.
+
+        Args:
+            name (str): Name of the thread.
+            batch_size (int): Number of records that triggers a flush.
+            flush_interval (float): Maximum number of seconds a record can stay buffered.
+            queue_size (int): Maximum number of pending records before producers are blocked.
+        """
+        super().__init__(name=name, daemon=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.stats: Optional[StatsCollector] = None
+        # Records offered while the queue was full, in order, with the Deferred of their producer
+        self.waiting: Deque[Tuple[Any, Optional[Deferred]]] = deque()
+        self.waiting_lock = threading.Lock()
+
+    def put(self, record: Any, block: bool = True) -> None:
+        """
+        Queue a record for writing.
+
+        Args:
+            record (Any): The record to write.
+            block (bool): Whether to wait for a free slot when the queue is full.
+
+        Raises:
+            queue.Full: If ``block`` is False and the queue is full.
+        """
+        self.queue.put(record, block=block)
+
+    def offer(self, record: Any) -> Optional[Deferred]:
+        """
+        Queue a record for writing without blocking.
+
+        Args:
+            record (Any): The record to write.
+
+        Returns:
+            Optional[Deferred]: None if the record was queued, otherwise a Deferred fired in the reactor thread once it is.
+        """
+        with self.waiting_lock:
+            # Records already waiting go first, to keep the order of the records
+            if not self.waiting:
+                try:
+                    self.queue.put_nowait(record)
+                    return None
+                except queue.Full:
+                    pass
+            deferred: Deferred = Deferred()
+            self.waiting.append((record, deferred))
+            return deferred
+
+    def admit_waiting(self) -> None:
+        """
+        Move the waiting records into the queue while it has room, firing the Deferred of their producer.
+        """
+        from twisted.internet import reactor
+
+        with self.waiting_lock:
+            while self.waiting:
+                record, deferred = self.waiting[0]
+                try:
+                    self.queue.put_nowait(record)
+                except queue.Full:
+                    return
+                self.waiting.popleft()
+                if deferred is not None:
+                    reactor.callFromThread(deferred.callback, None)
+
+    def close(self) -> None:
+        """
+        Flush the remaining records and stop the thread.
+        """
+        with self.waiting_lock:
+            # Stop after the waiting records, if any
+            stop_waits = bool(self.waiting)
+            if stop_waits:
+                self.waiting.append((self._STOP, None))
+        if not stop_waits:
+            self.queue.put(self._STOP)
+        self.join()
+
+    def run(self) -> None:
+        """
+        Collect records from the queue and flush them until the writer is closed.
+        """
+        batch: List[Any] = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            if self.waiting:
+                self.admit_waiting()
+
+            if record is self._STOP:
+                if batch:
+                    self.flush(batch)
+                self.on_close()
+                return
+
+            if record is not None:
+                batch.append(record)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self.flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+                self.on_tick()
+
+    def flush(self, batch: List[Any]) -> None:
+        """
+        Write a batch of records, recording its duration, its size and the depth of the queue behind it.
+
+        Args:
+            batch (List[Any]): The records to write.
+        """
+        start = time.perf_counter()
+        self.write_batch(batch)
+        observe(self.stats, f"writer/{self.name}/flush_seconds", time.perf_counter() - start)
+        observe(self.stats, f"writer/{self.name}/batch_size", len(batch), COUNT_BUCKETS)
+        observe(self.stats, f"writer/{self.name}/queue_depth", self.queue.qsize(), COUNT_BUCKETS)
+
+    @abstractmethod
+    def write_batch(self, batch: List[Any]) -> None:
+        """
+        Write a batch of records.
+
+        Args:
+            batch (List[Any]): The records to write.
+        """
+
+    def on_tick(self) -> None:
+        """
+        Hook called after every flush deadline, even when nothing was written.
+        """
+
+    def on_close(self) -> None:
+        """
+        Hook called from the writer thread once the last batch has been written.
+        """
+
+
+INSERT_ARTICLE = "INSERT OR IGNORE INTO articles (title, url, author, content) VALUES (?, ?, ?, ?)"
+UPSERT_ARTICLE = (
+    "INSERT INTO articles (title, url, author, content) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(url) DO UPDATE SET title = excluded.title, author = excluded.author, content = excluded.content"
+)
+
+
+class SQLiteBatchWriter(BatchingWriter):
+    """
+    Background thread writing article rows into SQLite in batches.
+
+    Rows are buffered in a bounded queue and flushed with a single ``executemany``
+    call whenever the batch is full or the flush interval has elapsed. Every flush
+    is committed, so a crash only loses the rows that were still buffered.
+
+    The rows of a failed flush (e.g. a locked database) are kept and written with
+    the next flush, or on the next tick when the queue is idle. They are dropped
+    after ``max_retries`` failed attempts and counted in ``sqlite/rows_lost``.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        queue_size: int = 10000,
+        upsert: bool = False,
+        max_retries: int = 3,
+        on_written: Optional[Callable[[List[ArticleRow]], None]] = None,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
+        """
+        Initialize the writer thread.
+
+        Args:
+            conn (sqlite3.Connection): Connection of ``db.storage.connect_writer``, with ``check_same_thread=False``, owned by the writer.
+            batch_size (int): Number of rows that triggers a flush.
+            flush_interval (float): Maximum number of seconds a row can stay buffered.
+            queue_size (int): Maximum number of pending rows before producers are blocked.
+            upsert (bool): Whether rows whose URL is already stored update it instead of being ignored.
+            max_retries (int): Number of times the rows of a failed flush are written again before being dropped.
+            on_written (Optional[Callable[[List[ArticleRow]], None]]): Called from the writer thread with the rows of every committed flush.
+            stats (Optional[StatsCollector]): Scrapy stats collector used to report flush metrics.
+        """
+        super().__init__("sqlite-writer", batch_size, flush_interval, queue_size)
+        self.conn = conn
+        self.statement = UPSERT_ARTICLE if upsert else INSERT_ARTICLE
+        self.max_retries = max_retries
+        self.on_written = on_written
+        self.stats = stats
+        self.flush_count = 0
+        self.flush_time_total = 0.0
+        self.rows_written = 0
+        self.rows_lost = 0
+        # Rows of the last failed flush and number of failed attempts to write them
+        self.failed: List[ArticleRow] = []
+        self.failed_attempts = 0
+        # Whether a flush was attempted since the last tick
+        self.attempted = False
+
+    def close(self) -> None:
+        """
+        Flush the remaining rows, stop the thread and close the connection.
+        """
+        super().close()
+        self.conn.close()
+
+    def write_batch(self, batch: List[ArticleRow]) -> None:
+        """
+        Insert a batch of rows, after the rows of a previously failed flush, in a single transaction and record the flush latency.
+
+        Args:
+            batch (List[ArticleRow]): The (title, url, author, content) rows to insert.
+        """
+        rows = self.failed + batch
+        self.attempted = True
+        start = time.perf_counter()
+        try:
+            with self.conn:
+                self.conn.executemany(self.statement, rows)
+        except sqlite3.Error:
+            self.failed_attempts += 1
+            if self.stats is not None:
+                self.stats.inc_value("sqlite/flush_errors")
+            if self.failed_attempts > self.max_retries:
+                logger.exception("Failed to flush %d rows to the database, dropping them", len(rows))
+                self.drop_failed(rows)
+            else:
+                logger.exception("Failed to flush %d rows to the database, retrying with the next flush", len(rows))
+                self.failed = rows
+            return
+        latency = time.perf_counter() - start
+        self.failed = []
+        self.failed_attempts = 0
+
+        self.flush_count += 1
+        self.flush_time_total += latency
+        self.rows_written += len(rows)
+        if self.on_written is not None:
+            self.on_written(rows)
+
+        if self.stats is not None:
+            self.stats.inc_value("sqlite/flushes")
+            self.stats.inc_value("sqlite/rows_flushed", len(rows))
+            self.stats.set_value("sqlite/flush_latency_last_ms", round(latency * 1000, 3))
+            self.stats.max_value("sqlite/flush_latency_max_ms", round(latency * 1000, 3))
+            self.stats.set_value("sqlite/flush_latency_avg_ms", round(self.flush_time_total / self.flush_count * 1000, 3))
+
+    def drop_failed(self, rows: List[ArticleRow]) -> None:
+        """
+        Give up on rows that could not be written and count them as lost.
+
+        Args:
+            rows (List[ArticleRow]): The rows that could not be written.
+        """
+        self.rows_lost += len(rows)
+        if self.stats is not None:
+            self.stats.inc_value("sqlite/rows_lost", len(rows))
+        self.failed = []
+        self.failed_attempts = 0
+
+    def on_tick(self) -> None:
+        """
+        Retry the rows of a failed flush when no new row triggered a flush since the last tick.
+        """
+        if self.failed and not self.attempted:
+            self.write_batch([])
+        self.attempted = False
+
+    def on_close(self) -> None:
+        """
+        Make a last attempt at writing the rows of a failed flush, counting them as lost if it fails.
+        """
+        if self.failed:
+            self.failed_attempts = self.max_retries
+            self.write_batch([])
+        if self.failed:
+            self.drop_failed(self.failed)
+
+
+class SegmentedFeedWriter(BatchingWriter):
+    """
+    Background thread streaming items into rotated, compressed JSONL segments.
+
+    Items are encoded in batches and appended to ``<prefix>-<timestamp>-<seq>.jsonl.<ext>.part``.
+    A segment is rotated once it holds ``max_segment_bytes`` of uncompressed JSON or
+    is older than ``max_segment_age`` seconds: it is then renamed without the ``.part``
+    suffix and recorded in ``<prefix>.manifest.jsonl``, so that readers only pick up
+    complete segments and can resume from the last manifest line they processed.
+    """
+
+    extensions: Dict[str, str] = {"gzip": "gz", "zstd": "zst"}
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str,
+        compression: str = "gzip",
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float = 3600.0,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        queue_size: int = 10000,
+        stats: Optional[StatsCollector] = None,
+    ) -> None:
+        """
+        Initialize the writer thread.
+
+        Args:
+            directory (str): Directory receiving the segments and the manifest.
+            prefix (str): Prefix of the segment and manifest file names.
+            compression (str): Either "gzip" or "zstd" (requires the zstandard package).
+            max_segment_bytes (int): Uncompressed size after which a segment is rotated.
+            max_segment_age (float): Age in seconds after which a segment is rotated.
+            batch_size (int): Number of items encoded and written together.
+            flush_interval (float): Maximum number of seconds an item can stay buffered.
+            queue_size (int): Maximum number of pending items before producers are blocked.
+            stats (Optional[StatsCollector]): Scrapy stats collector used to report segment metrics.
+
+        Raises:
+            ValueError: If the compression is unknown or its library is not installed.
+        """
+        super().__init__(f"feed-writer-{prefix}", batch_size, flush_interval, queue_size)
+        if compression not in self.extensions:
+            raise ValueError(f"Unsupported feed compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd feed compression requires the 'zstandard' package")
+
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.stats = stats
+        self.encode = json_line_encoder()
+        self.manifest_path = os.path.join(directory, f"{prefix}.manifest.jsonl")
+
+        self.sequence = 0
+        self.segment_path: Optional[str] = None
+        self.segment_raw: Optional[IO[bytes]] = None
+        self.segment_file: Optional[IO[bytes]] = None
+        self.segment_opened_at = 0.0
+        self.segment_created = ""
+        self.segment_records = 0
+        self.segment_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Encode a batch of items and append it to the current segment.
+
+        Args:
+            batch (List[Dict[str, Any]]): The items to write.
+        """
+        payload = b"".join(self.encode(item) for item in batch)
+
+        if self.segment_file is None:
+            self.open_segment()
+        assert self.segment_file is not None
+        self.segment_file.write(payload)
+        self.segment_file.flush()
+
+        self.segment_records += len(batch)
+        self.segment_bytes += len(payload)
+        if self.stats is not None:
+            self.stats.inc_value(f"feed/{self.prefix}/items", len(batch))
+            self.stats.inc_value(f"feed/{self.prefix}/bytes", len(payload))
+
+        if self.segment_bytes >= self.max_segment_bytes:
+            self.close_segment()
+
+    def on_tick(self) -> None:
+        """
+        Rotate the current segment when it is older than the maximum age.
+        """
+        if self.segment_file is not None and time.monotonic() - self.segment_opened_at >= self.max_segment_age:
+            self.close_segment()
+
+    def on_close(self) -> None:
+        """
+        Finalize the segment being written.
+        """
+        self.close_segment()
+
+    def open_segment(self) -> None:
+        """
+        Open a new ``.part`` segment file with the configured compression.
+        """
+        self.sequence += 1
+        self.segment_created = datetime.now(timezone.utc).isoformat()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        name = f"{self.prefix}-{stamp}-{self.sequence:06d}.jsonl.{self.extensions[self.compression]}"
+        self.segment_path = os.path.join(self.directory, name)
+
+        self.segment_raw = open(f"{self.segment_path}.part", "wb")
+        if self.compression == "zstd":
+            self.segment_file = zstandard.ZstdCompressor().stream_writer(self.segment_raw)
+        else:
+            self.segment_file = gzip.GzipFile(fileobj=self.segment_raw, mode="wb")
+
+        self.segment_opened_at = time.monotonic()
+        self.segment_records = 0
+        self.segment_bytes = 0
+
+    def close_segment(self) -> None:
+        """
+        Close the current segment, publish it and append it to the manifest.
+        """
+        if self.segment_file is None or self.segment_raw is None or self.segment_path is None:
+            return
+
+        self.segment_file.close()
+        if not self.segment_raw.closed:
+            self.segment_raw.close()
+        os.replace(f"{self.segment_path}.part", self.segment_path)
+
+        entry = {
+            "segment": os.path.basename(self.segment_path),
+            "records": self.segment_records,
+            "bytes": self.segment_bytes,
+            "compressed_bytes": os.path.getsize(self.segment_path),
+            "created": self.segment_created,
+            "closed": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(self.manifest_path, "a") as manifest:
+            manifest.write(json.dumps(entry) + "\n")
+
+        if self.stats is not None:
+            self.stats.inc_value(f"feed/{self.prefix}/segments")
+
+        self.segment_file = None
+        self.segment_raw = None
+        self.segment_path = None
@@ -0,0 +1,170 @@
+import importlib
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pytest
+
+from db.db_service import create_articles, create_author_stats, create_search_index
+from db.storage import connect_writer
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+
+ARTICLES = [
+    ("https://www.bbc.com/news/articles/c1", "Election results", "Jane Doe", "The election results are in."),
+    ("https://www.bbc.com/news/articles/c2", "Football final", "Jane Doe", "The final was played last night."),
+    ("https://www.bbc.com/news/articles/c3", "Weather warning", "John Smith", "Storms are expected after the election."),
+    ("https://www.bbc.com/news/articles/c4", "Market update", "n/a", "Shares rose on Monday."),
+    ("https://www.bbc.com/news/articles/c5", "Council vote", "Ann Lee", "Voters elect their councils in the local elections."),
+]
+
+
+def insert_articles(database: str, articles: List[Tuple[str, str, str, str]]) -> None:
+    conn = connect_writer(database)
+    conn.executemany("INSERT INTO articles (url, title, author, content) VALUES (?, ?, ?, ?)", articles)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Tuple[Any, str]]:
+    database = str(tmp_path_factory.mktemp("api") / "scrahp.db")
+    conn = connect_writer(database)
+    create_articles(conn)
+    create_search_index(conn)
+    create_author_stats(conn)
+    conn.close()
+    insert_articles(database, ARTICLES)
+
+    # The application reads its database when imported, like in benchmarks/run.py
+    os.environ["SCRAHP_DATABASE_URI"] = f"sqlite:///{database}"
+    sys.path.insert(0, API_DIR)
+    try:
+        app = importlib.import_module("app").app
+    finally:
+        sys.path.remove(API_DIR)
+    # The tests commit between two requests, the version is read by every request
+    app.config["RESPONSE_CACHE_CHECK_INTERVAL"] = 0.0
+    yield app.test_client(), database
+    del os.environ["SCRAHP_DATABASE_URI"]
+
+
+def top_authors(client: Any, days: Optional[int] = None) -> List[Tuple[str, int]]:
+    response = client.get("/top_authors?limit=10" + (f"&days={days}" if days else ""))
+    assert response.status_code == 200
+    return [(author["author"], author["article_count"]) for author in response.get_json()["top_authors"]]
+
+
+def test_articles_are_listed_by_pages(api) -> None:
+    client, _ = api
+    urls, after = [], None
+    while True:
+        response = client.get("/articles?limit=2&fields=title" + (f"&after={after}" if after else ""))
+        page = response.get_json()
+        assert all(set(article) == {"url", "title"} for article in page["articles"])
+        urls += [article["url"] for article in page["articles"]]
+        after = page["next"]
+        if after is None:
+            break
+    assert urls == [article[0] for article in ARTICLES]
+
+    assert client.get("/articles?limit=0").status_code == 400
+    assert client.get("/articles?fields=body").status_code == 400
+    response = client.get(f"/articles?url={ARTICLES[2][0]}")
+    assert response.get_json()["articles"] == [dict(zip(("url", "title", "author", "content"), ARTICLES[2]))]
+
+
+def test_unchanged_responses_are_not_modified(api) -> None:
+    client, database = api
+    response = client.get("/top_authors")
+    etag = response.headers["ETag"]
+    assert client.get("/top_authors", headers={"If-None-Match": etag}).status_code == 304
+
+    # A commit of the crawlers makes the cached responses stale
+    insert_articles(database, [("https://www.bbc.com/news/articles/c6", "Budget", "Ann Lee", "The budget was announced.")])
+    response = client.get("/top_authors", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+
+def test_response_cache_is_bounded_in_bytes(api) -> None:
+    cache = sys.modules["app"].ResponseCache()
+    for index in range(4):
+        cache.put(f"/articles?page={index}", 1, b"x" * 400, 1000)
+    # The two least recently used bodies were evicted
+    assert list(cache.entries) == ["/articles?page=2", "/articles?page=3"] and cache.size == 800
+    # Larger than the whole cache, served but not cached
+    assert cache.put("/articles?limit=1000", 1, b"x" * 2000, 1000)["etag"]
+    assert "/articles?limit=1000" not in cache.entries and cache.size == 800
+
+
+def test_database_version_is_read_once_per_interval(api) -> None:
+    _, database = api
+    cache = sys.modules["app"].ResponseCache()
+    version = cache.version(60.0)
+    insert_articles(database, [("https://www.bbc.com/news/articles/c7", "Budget", "Ann Lee", "The budget was announced.")])
+    assert cache.version(60.0) == version
+    assert cache.version(0.0) != version
+
+
+def test_search_ranks_and_pages_the_matches(api) -> None:
+    client, _ = api
+    response = client.get("/search?q=election&limit=1")
+    page = response.get_json()
+    # The match in the title ranks first, stemmed: "election" also matches "elections"
+    assert [article["url"] for article in page["articles"]] == [ARTICLES[0][0]]
+    assert page["next"] == 1
+    urls = [article["url"] for article in client.get("/search?q=election&offset=1").get_json()["articles"]]
+    assert sorted(urls) == [ARTICLES[2][0], ARTICLES[4][0]]
+
+    assert client.get("/search?q=elect*+councils").get_json()["articles"][0]["url"] == ARTICLES[4][0]
+    assert client.get("/search?q=U.S.").status_code == 200
+    assert client.get("/search?q=").status_code == 400
+
+
+def test_batch_returns_found_and_missing_urls(api) -> None:
+    client, _ = api
+    missing = "https://www.bbc.com/news/articles/unknown"
+    response = client.post("/articles/batch", json={"urls": [ARTICLES[3][0], missing, ARTICLES[0][0]], "fields": ["author"]})
+    assert response.get_json() == {
+        "articles": [{"url": ARTICLES[3][0], "author": "n/a"}, {"url": ARTICLES[0][0], "author": "Jane Doe"}],
+        "missing": [missing],
+    }
+    assert client.post("/articles/batch", json={"urls": "https://www.bbc.com"}).status_code == 400
+    assert client.post("/articles/batch", json={"urls": ["https://www.bbc.com"] * 1001}).status_code == 400
+
+
+def test_author_counts_follow_the_articles(api) -> None:
+    client, database = api
+    before = dict(top_authors(client))
+    assert "n/a" not in before and before["Jane Doe"] == 2
+
+    conn = connect_writer(database)
+    conn.execute("UPDATE articles SET author = 'John Smith' WHERE url = ?", (ARTICLES[1][0],))
+    conn.execute("DELETE FROM articles WHERE url = ?", (ARTICLES[0][0],))
+    conn.commit()
+    conn.close()
+
+    after = dict(top_authors(client))
+    assert "Jane Doe" not in after and after["John Smith"] == before["John Smith"] + 1
+    # The articles were all stored today
+    assert top_authors(client, days=1) == top_authors(client)
+    with sqlite3.connect(database) as conn:
+        expected = conn.execute("SELECT COUNT(*) FROM articles WHERE author IS NOT NULL AND author != 'n/a'").fetchone()[0]
+    assert sum(count for _, count in after.items()) == expected
+
+
+def test_export_resumes_after_the_last_id(api) -> None:
+    client, database = api
+    lines = [json.loads(line) for line in client.get("/export?fields=title").data.splitlines()]
+    assert len(lines) > 2 and [line["id"] for line in lines] == sorted(line["id"] for line in lines)
+    assert all(set(line) == {"id", "url", "title"} for line in lines)
+
+    # The ids survive a VACUUM, the export resumes at the same article
+    conn = connect_writer(database)
+    conn.execute("VACUUM")
+    conn.close()
+    resumed = [json.loads(line) for line in client.get(f"/export?fields=title&since={lines[1]['id']}").data.splitlines()]
+    assert resumed == lines[2:]
+    assert client.get("/export?since=last").status_code == 400
@@ -0,0 +1,67 @@
+import sqlite3
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrahp.archive import PageArchive, PageArchiveReader, archive_page
+from scrahp.spiders.stream import StreamSpider
+
+ARTICLE = "https://www.bbc.com/news/articles/1"
+SECTION = "https://www.bbc.com/news"
+
+
+def test_pages_round_trip_with_their_spider(tmp_path) -> None:
+    archive = PageArchive(directory=str(tmp_path))
+    archive.open()
+    spider = Spider("articles")
+    spider.page_archive = archive  # type: ignore[attr-defined]
+    archive_page(spider, HtmlResponse(url=ARTICLE, body=b"<html>article</html>"), "articles")
+    archive_page(spider, HtmlResponse(url=f"{ARTICLE}?copy", body=b"<html>article</html>"), "articles")
+    archive_page(spider, HtmlResponse(url=SECTION, body=b"<html>section</html>"), "urls")
+    archive.close()
+
+    reader = PageArchiveReader(str(tmp_path))
+    assert reader.get(ARTICLE) == b"<html>article</html>"
+    assert dict(reader) == {ARTICLE: b"<html>article</html>", f"{ARTICLE}?copy": b"<html>article</html>", SECTION: b"<html>section</html>"}
+    spiders = dict(reader.conn.execute("SELECT url, spider FROM urls"))
+    reader.close()
+    assert spiders == {ARTICLE: "articles", f"{ARTICLE}?copy": "articles", SECTION: "urls"}
+    # Identical bodies are stored once
+    with sqlite3.connect(str(tmp_path / "index.db")) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bodies").fetchone() == (2,)
+
+
+def test_stream_pages_are_recorded_with_their_parser(tmp_path) -> None:
+    archive = PageArchive(directory=str(tmp_path))
+    archive.open()
+    spider = StreamSpider.from_crawler(get_crawler(StreamSpider))
+    spider.page_archive = archive  # type: ignore[attr-defined]
+    list(spider.parse(HtmlResponse(url=SECTION, body=b"<html>section</html>")))
+    spider.parse_article(HtmlResponse(url=ARTICLE, body=b"<html><h1>Title</h1></html>", request=Request(ARTICLE)))
+    archive.close()
+
+    reader = PageArchiveReader(str(tmp_path))
+    assert [(url, spider) for url, _, _, _, spider in reader.locations(["articles"])] == [(ARTICLE, "articles")]
+    assert [(url, spider) for url, _, _, _, spider in reader.locations(["urls"])] == [(SECTION, "urls")]
+    reader.close()
+
+
+def test_full_queue_drops_pages_without_blocking(tmp_path) -> None:
+    stats = MemoryStatsCollector(get_crawler())
+    archive = PageArchive(directory=str(tmp_path), queue_size=2, stats=stats)
+    # The writer thread is not started: nothing drains the queue
+    assert [archive.put_page(f"{ARTICLE}/{i}", b"body", "articles") for i in range(4)] == [True, True, False, False]
+    assert stats.get_value("archive/dropped") == 2
+
+
+def test_indexes_without_spider_column_are_upgraded(tmp_path) -> None:
+    with sqlite3.connect(str(tmp_path / "index.db")) as conn:
+        conn.execute("CREATE TABLE urls (url TEXT PRIMARY KEY, digest TEXT, fetched_at TEXT)")
+    archive = PageArchive(directory=str(tmp_path))
+    archive.open()
+    archive.put_page(ARTICLE, b"body", "articles")
+    archive.close()
+    with sqlite3.connect(str(tmp_path / "index.db")) as conn:
+        assert conn.execute("SELECT spider FROM urls").fetchall() == [("articles",)]
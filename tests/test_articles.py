@@ -0,0 +1,76 @@
+import json
+
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from scrahp import signals as scrahp_signals
+from scrahp.items import Article
+from scrahp.pipelines import ArticlePipeline
+from scrahp.spiders.articles import ArticlesSpider
+
+PAGE = b"<html><body><h1>Title</h1><div class='qa-story-body'><p>Content</p></div></body></html>"
+
+
+def articles_spider(tmp_path) -> ArticlesSpider:
+    crawler = get_crawler(ArticlesSpider, {"SELECTOR_STATS_FILE": str(tmp_path / "selector_stats.json")})
+    return ArticlesSpider.from_crawler(crawler, url_location=str(tmp_path / "urls.jsonl"))
+
+
+def parse(spider: ArticlesSpider, url: str, offset: int) -> Article:
+    spider.pending_offsets.add(offset)
+    request = Request(url, meta={"urls_offset": offset})
+    response = HtmlResponse(url, body=PAGE, request=request)
+    (article,) = spider.parse(response)
+    return article
+
+
+def test_pages_are_done_once_their_article_is_stored(tmp_path) -> None:
+    spider = articles_spider(tmp_path)
+    url = "https://www.bbc.com/news/articles/c1"
+    parse(spider, url, 0)
+    # Parsed, but the article may still be buffered by the writer
+    assert spider.pending_offsets == {0}
+
+    spider.crawler.signals.send_catch_log(scrahp_signals.articles_stored, urls=[url], spider=spider)
+    assert spider.pending_offsets == set()
+    assert spider.awaiting_storage == {}
+
+
+def test_dropped_and_failed_articles_are_done(tmp_path) -> None:
+    spider = articles_spider(tmp_path)
+    dropped, failed, stored = "https://www.bbc.com/news/articles/c1", "https://www.bbc.com/news/articles/c2", "https://www.bbc.com/news/articles/c3"
+    article = parse(spider, dropped, 0)
+    response = HtmlResponse(dropped, body=PAGE, request=Request(dropped))
+    spider.crawler.signals.send_catch_log(signals.item_dropped, item=article, response=response, exception=DropItem(), spider=spider)
+
+    # A pipeline error would happen again on every run, the checkpoint must not stay before the line
+    article = parse(spider, failed, 100)
+    response = HtmlResponse(failed, body=PAGE, request=Request(failed))
+    spider.crawler.signals.send_catch_log(signals.item_error, item=article, response=response, spider=spider, failure=Failure(KeyError("title")))
+
+    parse(spider, stored, 200)
+    assert spider.pending_offsets == {200}
+    spider.write_checkpoint()
+    with open(spider.checkpoint_file()) as file:
+        assert json.load(file) == {"offset": 200}
+
+
+def test_pages_without_title_are_cleaned(tmp_path) -> None:
+    spider = articles_spider(tmp_path)
+    url = "https://www.bbc.com/news/articles/c1"
+    request = Request(url, meta={"urls_offset": 0})
+    page = b"<html><body><div class='qa-story-body'><p>Content</p></div></body></html>"
+    (article,) = spider.parse(HtmlResponse(url, body=page, request=request))
+    article = ArticlePipeline().cleanup_item(article, spider)
+    assert article["title"] == "n/a" and article["author"] == "n/a"
+
+
+def test_unusable_pages_are_done_at_once(tmp_path) -> None:
+    spider = articles_spider(tmp_path)
+    spider.pending_offsets.add(0)
+    request = Request("https://www.bbc.com/news/av/c1", meta={"urls_offset": 0})
+    assert spider.parse(HtmlResponse(request.url, body=PAGE, request=request)) == []
+    assert spider.pending_offsets == set()
@@ -0,0 +1,29 @@
+import pytest
+
+from scrahp.bloom import BloomFilter
+
+KEYS = [f"https://www.bbc.com/news/articles/c{i}" for i in range(1000)]
+
+
+def test_keys_are_kept_after_reopening(tmp_path) -> None:
+    path = str(tmp_path / "seen.bloom")
+    bloom = BloomFilter(path, capacity=10_000, error_rate=0.001)
+    assert all(bloom.add(key) for key in KEYS)
+    assert not bloom.add(KEYS[0])
+    bloom.close()
+
+    # The size parameters of the file take precedence
+    reopened = BloomFilter(path, capacity=10, error_rate=0.5)
+    assert len(reopened) == len(KEYS)
+    assert (reopened.num_bits, reopened.num_hashes) == (bloom.num_bits, bloom.num_hashes)
+    assert all(key in reopened for key in KEYS)
+    false_positives = sum(f"https://www.bbc.com/sport/articles/c{i}" in reopened for i in range(1000))
+    assert false_positives <= 10
+    reopened.close()
+
+
+def test_other_files_are_rejected(tmp_path) -> None:
+    path = tmp_path / "seen.bloom"
+    path.write_bytes(b"not a bloom filter" * 4)
+    with pytest.raises(ValueError):
+        BloomFilter(str(path))
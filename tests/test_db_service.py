@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from db.authors import normalize_author
+from db.db_service import create_articles, create_author_stats, create_search_index
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("By Jane Doe", "Jane Doe"),
+        ("Reporting by Jane Doe", "Jane Doe"),
+        ("JANE DOE", "Jane Doe"),
+        ("Jane Doe, BBC News", "Jane Doe"),
+        ("Jane  Doe – Political editor", "Jane Doe"),
+        ("By", "n/a"),
+        ("", "n/a"),
+        (None, "n/a"),
+    ],
+)
+def test_normalize_author(name, expected: str) -> None:
+    assert normalize_author(name) == expected
+
+
+def test_author_stats_count_the_normalized_authors_of_existing_articles() -> None:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE articles (url TEXT PRIMARY KEY, title TEXT, author TEXT, content TEXT)")
+    # Authors stored by crawlers older than the normalization
+    articles = [("a", "By Jane Doe"), ("b", "JANE DOE"), ("c", "Jane Doe, BBC News"), ("d", "John Smith"), ("e", None)]
+    conn.executemany("INSERT INTO articles (url, title, author, content) VALUES (?, 'Title', ?, 'Content')", articles)
+    create_articles(conn)
+    create_search_index(conn)
+
+    create_author_stats(conn)
+    assert conn.execute("SELECT name, article_count FROM authors ORDER BY name").fetchall() == [("Jane Doe", 3), ("John Smith", 1)]
+    # The search index follows the normalized authors
+    assert conn.execute("SELECT COUNT(*) FROM articles_search WHERE articles_search MATCH 'author:jane'").fetchone() == (3,)
+
+    # Running it again does nothing
+    create_author_stats(conn)
+    assert conn.execute("SELECT SUM(article_count) FROM authors").fetchone() == (4,)
+
+
+def test_legacy_articles_keep_their_rowid_as_id(tmp_path) -> None:
+    conn = sqlite3.connect(str(tmp_path / "scrahp.db"))
+    conn.execute("CREATE TABLE articles (url TEXT PRIMARY KEY, title TEXT, author TEXT, content TEXT)")
+    urls = [f"https://www.bbc.com/news/articles/c{i}" for i in range(5)]
+    conn.executemany("INSERT INTO articles (url, title, author, content) VALUES (?, 'Title', 'Jane Doe', ?)", [(url, url[-2:]) for url in urls])
+    conn.execute("DELETE FROM articles WHERE url = ?", (urls[1],))
+    conn.commit()
+    rowids = conn.execute("SELECT rowid, url FROM articles ORDER BY rowid").fetchall()
+
+    create_articles(conn)
+    create_search_index(conn)
+    create_articles(conn)
+    assert conn.execute("SELECT id, url FROM articles ORDER BY id").fetchall() == rowids
+
+    # VACUUM keeps the ids the search index refers to
+    conn.execute("VACUUM")
+    rows = conn.execute(
+        "SELECT articles.url FROM articles_search JOIN articles ON articles.id = articles_search.rowid WHERE articles_search MATCH 'c3'"
+    )
+    assert rows.fetchall() == [(urls[3],)]
+    conn.close()
+
+
+def test_author_days_follow_the_articles_after_vacuum(tmp_path) -> None:
+    conn = sqlite3.connect(str(tmp_path / "scrahp.db"))
+    create_articles(conn)
+    create_search_index(conn)
+    create_author_stats(conn)
+    articles = [(f"https://www.bbc.com/news/articles/c{i}", "Jane Doe" if i % 2 else "John Smith") for i in range(6)]
+    conn.executemany("INSERT INTO articles (url, title, author, content) VALUES (?, 'Title', ?, 'Content')", articles)
+    conn.execute("DELETE FROM articles WHERE url = ?", (articles[0][0],))
+    conn.commit()
+    conn.execute("VACUUM")
+
+    conn.execute("UPDATE articles SET author = 'Ann Lee' WHERE url = ?", (articles[1][0],))
+    conn.execute("DELETE FROM articles WHERE url = ?", (articles[2][0],))
+    conn.commit()
+    expected = [("Ann Lee", 1), ("Jane Doe", 2), ("John Smith", 1)]
+    assert conn.execute("SELECT name, article_count FROM authors ORDER BY name").fetchall() == expected
+    assert conn.execute("SELECT name, article_count FROM author_days ORDER BY name").fetchall() == expected
+    conn.close()
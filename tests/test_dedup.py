@@ -0,0 +1,37 @@
+import random
+
+from scrahp.dedup import SimHashIndex
+
+WORDS = [f"word{i}" for i in range(500)]
+
+
+def article(seed: int, length: int = 300) -> str:
+    generator = random.Random(seed)
+    return " ".join(generator.choice(WORDS) for _ in range(length))
+
+
+def test_near_duplicates_are_found_after_reopening(tmp_path) -> None:
+    path = str(tmp_path / "simhash.idx")
+    original, other = article(1), article(2)
+    # The same article with a word replaced
+    edited = original.replace(original.split()[150], "edited", 1)
+
+    index = SimHashIndex(path)
+    index.open()
+    fingerprint = index.fingerprint(original)
+    assert fingerprint is not None
+    index.add(fingerprint, "https://www.bbc.com/news/articles/c1")
+    index.close()
+
+    reopened = SimHashIndex(path)
+    reopened.open()
+    assert len(reopened) == 1
+    assert reopened.fingerprint(original) == fingerprint
+    assert reopened.find(reopened.fingerprint(edited)) == "https://www.bbc.com/news/articles/c1"
+    assert reopened.find(reopened.fingerprint(other)) is None
+    reopened.close()
+
+
+def test_short_texts_are_not_fingerprinted() -> None:
+    index = SimHashIndex(min_tokens=20)
+    assert index.fingerprint(article(1, length=19)) is None
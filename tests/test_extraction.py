@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+from scrapy.http import HtmlResponse
+
+from benchmarks.corpus import synthetic_corpus
+from scrahp.extraction import SelectorEngine, SelectorStats, matched_query
+from scrahp.spiders.articles import ArticlesSpider
+
+FIELDS: Dict[str, List[str]] = {
+    "title": ArticlesSpider.title_queries,
+    "author": ArticlesSpider.author_queries,
+    "content": ArticlesSpider.content_queries,
+}
+
+EDGE_PAGES: List[Tuple[str, bytes]] = [
+    # An empty block of the first author query, the second one has the author
+    (
+        "https://www.bbc.com/news/articles/empty-author",
+        b'<html><body><h1>Title</h1><div class="ssrcss-68pt20-Text-TextContributorName"></div>'
+        b'<div class="author-unit">Jane</div><div class="qa-story-body"><p>Text</p></div></body></html>',
+    ),
+    # No query matches at all
+    ("https://www.bbc.com/news/articles/bare", b"<html><body><p>Nothing to see</p></body></html>"),
+    # Headings of the content union nested in the rich text, between its paragraphs
+    (
+        "https://www.bbc.com/news/articles/nested-union",
+        b'<html><body><h1>Title</h1><div class="ssrcss-11r1m41-RichTextComponentWrapper"><p>One</p>'
+        b'<h2 class="ssrcss-y2fd7s-StyledHeading">Heading</h2><p>Two</p></div>'
+        b'<h2 class="ssrcss-y2fd7s-StyledHeading">Last</h2></body></html>',
+    ),
+]
+
+
+def legacy_extract(response: HtmlResponse, queries: List[str]) -> Tuple[Optional[int], List[str]]:
+    """
+    The query chain of the spider before the SelectorEngine: the first query selecting anything wins.
+    """
+    for index, query in enumerate(queries):
+        if len(response.css(query)) > 0:
+            return index, response.css(query).getall()
+    return None, []
+
+
+@pytest.mark.parametrize(
+    "url, body", [pytest.param(url, body, id=url.rsplit("/", 1)[-1]) for url, body in synthetic_corpus(40, page_bytes=4000) + EDGE_PAGES]
+)
+def test_engine_matches_the_legacy_query_chain(url: str, body: bytes) -> None:
+    response = HtmlResponse(url=url, body=body, encoding="utf-8")
+    extraction = SelectorEngine(FIELDS).extract(response.selector.root)
+    assert extraction == {field: legacy_extract(response, queries) for field, queries in FIELDS.items()}
+
+
+def test_empty_match_falls_through_to_the_next_query() -> None:
+    url, body = EDGE_PAGES[0]
+    response = HtmlResponse(url=url, body=body, encoding="utf-8")
+    assert SelectorEngine(FIELDS).extract(response.selector.root)["author"] == (1, ["Jane"])
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        # Text children of the outer block surround the inner block
+        ("div.outer::text, div.inner ::text", ["a1", "b1", "b2", "a2"]),
+        ("div.outer ::text, div.inner::text", ["a1", "b1", "b2", "a2"]),
+        ("div.inner ::text, div.outer::text", ["a1", "b1", "b2", "a2"]),
+        # Every descendant text of the outer block, once
+        ("div.outer ::text, div.inner ::text", ["a1", "b1", "b2", "a2"]),
+        # Elements and texts mixed
+        ("div.outer ::text, span", ["a1", "b1", "<span>b2</span>", "b2", "a2"]),
+        ("div.inner, div.outer::text", ["a1", '<div class="inner">b1<span>b2</span></div>', "a2"]),
+    ],
+)
+def test_union_values_are_in_document_order(query: str, expected: List[str]) -> None:
+    body = b'<html><body><div class="outer">a1<div class="inner">b1<span>b2</span></div>a2</div></body></html>'
+    response = HtmlResponse(url="https://www.bbc.com/news/articles/union", body=body, encoding="utf-8")
+    assert response.css(query).getall() == expected
+    assert SelectorEngine({"field": [query]}).extract(response.selector.root)["field"] == (0, expected)
+
+
+@pytest.mark.parametrize(
+    "url, body", [pytest.param(url, body, id=url.rsplit("/", 1)[-1]) for url, body in synthetic_corpus(12, page_bytes=4000) + EDGE_PAGES]
+)
+def test_learned_order_never_changes_the_winner(url: str, body: bytes) -> None:
+    response = HtmlResponse(url=url, body=body, encoding="utf-8")
+    engine = SelectorEngine(FIELDS)
+    expected = engine.extract(response.selector.root)
+    # Every query learned as the winner, including queries of lower priority than the actual winner
+    for winner in range(len(ArticlesSpider.author_queries)):
+        order = {field: [min(winner, len(queries) - 1)] for field, queries in FIELDS.items()}
+        assert engine.extract(response.selector.root, order) == expected
+
+
+def test_learned_lower_priority_query_does_not_shadow_a_higher_one() -> None:
+    body = b'<html><body><h1>Title</h1><div class="author-unit">Priority</div><div class="qa-contributor-name">Learned</div></body></html>'
+    response = HtmlResponse(url="https://www.bbc.com/news/articles/both", body=body, encoding="utf-8")
+    order = {"title": [0], "author": [3, 0, 1, 2, 4], "content": [0]}
+    assert SelectorEngine(FIELDS).extract(response.selector.root, order)["author"] == (1, ["Priority"])
+
+
+def test_blank_values_are_recorded_as_misses() -> None:
+    assert matched_query((0, ["Jane"])) == 0
+    assert matched_query((0, [" \n ", ""])) is None
+    assert matched_query((None, [])) is None
+
+
+def test_selector_stats_learn_the_winning_query() -> None:
+    stats = SelectorStats(min_samples=3)
+    for _ in range(3):
+        stats.record("/news/", "author", ArticlesSpider.author_queries[2])
+        stats.record("/news/", "content", None)
+    # A field never filled has no order
+    assert stats.order("/news/", {"author": ArticlesSpider.author_queries, "content": ArticlesSpider.content_queries}) is None
+    assert stats.order("/news/", {"author": ArticlesSpider.author_queries}) == {"author": [2, 0, 1, 3, 4]}
+    assert stats.hit_rates()["/news/"]["content"] == {"n/a": 1.0}
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+from scrapy.http import Request, XmlResponse
+from scrapy.utils.test import get_crawler
+
+from scrahp.items import Url
+from scrahp.spiders.feeds import FeedsSpider
+
+
+def feeds_spider() -> FeedsSpider:
+    crawler = get_crawler(FeedsSpider, {"FEEDS_MAX_AGE": 3600})
+    return FeedsSpider.from_crawler(crawler)
+
+
+def test_sitemap_index_refresh_bypasses_the_duplicate_filter() -> None:
+    recent = datetime.now(timezone.utc).isoformat()
+    stale = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+    body = f"""<?xml version="1.0" encoding="UTF-8"?>
+    <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+      <sitemap><loc>https://www.bbc.com/sitemaps/news-1.xml</loc><lastmod>{recent}</lastmod></sitemap>
+      <sitemap><loc>https://www.bbc.com/sitemaps/news-2.xml</loc><lastmod>{stale}</lastmod></sitemap>
+    </sitemapindex>""".encode()
+    spider = feeds_spider()
+    response = XmlResponse(url=spider.sitemaps[0], body=body)
+
+    # The index is parsed again on every refresh: its sitemaps must be fetched again too
+    for _ in range(2):
+        requests = list(spider.parse(response))
+        assert [request.url for request in requests] == ["https://www.bbc.com/sitemaps/news-1.xml"]
+        assert all(isinstance(request, Request) and request.dont_filter for request in requests)
+    assert spider.crawler.stats.get_value("feeds/stale_sitemaps") == 2
+
+
+def test_rss_entries_are_dated_urls() -> None:
+    published = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+    body = f"""<?xml version="1.0"?><rss><channel>
+      <item><title>Story</title><link>https://www.bbc.co.uk/news/articles/c1?at_medium=RSS</link><pubDate>{published}</pubDate></item>
+      <item><title>Old</title><link>https://www.bbc.co.uk/news/articles/c0</link><pubDate>Mon, 01 Jan 2001 00:00:00 GMT</pubDate></item>
+    </channel></rss>""".encode()
+    spider = feeds_spider()
+    response = XmlResponse(url=spider.feeds[0], body=body, request=Request(spider.feeds[0]))
+    items = list(spider.parse(response))
+    assert len(items) == 1 and isinstance(items[0], Url)
+    assert items[0]["url"] == ["https://www.bbc.co.uk/news/articles/c1?at_medium=RSS"]
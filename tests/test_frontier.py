@@ -0,0 +1,140 @@
+import threading
+import urllib.error
+from typing import List
+
+import pytest
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import Request
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer, threads
+
+from scrahp.frontier import Frontier, FrontierServer, RemoteFrontier, open_frontier
+from scrahp.spiders.articles import ArticlesSpider
+
+URLS = [f"https://www.bbc.com/news/articles/c{i}" for i in range(5)]
+
+
+def test_lease_complete_and_fail(tmp_path) -> None:
+    frontier = Frontier(str(tmp_path / "frontier.db"), max_attempts=2)
+    assert frontier.add(URLS) == 5
+    assert frontier.add(URLS[:2]) == 0
+
+    first = frontier.lease("w1", 3)
+    second = frontier.lease("w2", 3)
+    assert len(first) == 3 and sorted(first + second) == sorted(URLS)
+    assert frontier.lease("w3", 3) == []
+
+    frontier.complete("w1", first)
+    frontier.fail("w2", second)
+    assert frontier.counts() == {"pending": 2, "leased": 0, "done": 3, "failed": 0}
+    # Second and last attempt
+    assert sorted(frontier.lease("w1", 5)) == sorted(second)
+    frontier.fail("w1", second)
+    assert frontier.counts() == {"pending": 0, "leased": 0, "done": 3, "failed": 2}
+    frontier.close()
+
+
+def test_expired_leases_count_as_attempts(tmp_path) -> None:
+    # Every lease expires at once
+    frontier = Frontier(str(tmp_path / "frontier.db"), lease_timeout=-1, max_attempts=2)
+    frontier.add(URLS[:1])
+    assert frontier.lease("w1", 1) == URLS[:1]
+    assert frontier.renew("w1") == 1
+    assert frontier.lease("w2", 1) == URLS[:1]
+    # The worker crashed on it twice, the URL is given up instead of being leased forever
+    assert frontier.lease("w3", 1) == []
+    assert frontier.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    frontier.close()
+
+
+def test_expired_leases_only_report_to_their_new_worker(tmp_path) -> None:
+    frontier = Frontier(str(tmp_path / "frontier.db"), lease_timeout=-1, max_attempts=3)
+    frontier.add(URLS[:1])
+    assert frontier.lease("w1", 1) == URLS[:1]
+    # w1 was too slow, the URL is leased again by w2
+    assert frontier.lease("w2", 1) == URLS[:1]
+    frontier.complete("w1", URLS[:1])
+    frontier.fail("w1", URLS[:1])
+    assert frontier.counts() == {"pending": 0, "leased": 1, "done": 0, "failed": 0}
+    frontier.complete("w2", URLS[:1])
+    assert frontier.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 0}
+    frontier.close()
+
+
+def test_server_requires_its_token(tmp_path) -> None:
+    frontier = Frontier(str(tmp_path / "frontier.db"))
+    with pytest.raises(ValueError):
+        FrontierServer(("127.0.0.1", 0), frontier, "")
+    server = FrontierServer(("127.0.0.1", 0), frontier, "secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        remote = open_frontier(url, token="secret")
+        assert isinstance(remote, RemoteFrontier)
+        assert remote.add(URLS) == 5
+        assert len(remote.lease("w1", 2)) == 2
+        assert remote.counts()["leased"] == 2
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            RemoteFrontier(url, "guess").counts()
+        assert error.value.code == 401
+    finally:
+        server.shutdown()
+        server.server_close()
+        frontier.close()
+
+    with pytest.raises(ValueError):
+        open_frontier(url)
+
+
+class Engine:
+    def __init__(self) -> None:
+        self.requests: List[Request] = []
+
+    def crawl(self, request: Request) -> None:
+        self.requests.append(request)
+
+
+def test_spider_leases_reports_and_stops(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Run the frontier calls inline instead of in the reactor thread pool
+    monkeypatch.setattr(threads, "deferToThread", defer.maybeDeferred)
+    crawler = get_crawler(
+        ArticlesSpider,
+        {
+            "ARTICLES_SOURCE": "frontier",
+            "FRONTIER": str(tmp_path / "frontier.db"),
+            "FRONTIER_BATCH_SIZE": 4,
+            "FRONTIER_REPORT_INTERVAL": 10,
+            "SELECTOR_STATS_FILE": str(tmp_path / "selector_stats.json"),
+        },
+    )
+    spider = ArticlesSpider.from_crawler(crawler)
+    assert spider.frontier is not None
+    spider.frontier.add(URLS)
+    crawler.engine = Engine()
+
+    with pytest.raises(DontCloseSpider):
+        spider.spider_idle(spider)
+    requests = crawler.engine.requests
+    assert len(requests) == 4 and spider.frontier_outstanding == 4
+
+    # Half of the batch is parsed: the rest of the frontier is leased while the articles wait for their storage
+    for request in requests[:2]:
+        spider.request_handled(request)
+    assert len(requests) == 5 and spider.frontier_outstanding == 3
+    assert spider.frontier.counts() == {"pending": 0, "leased": 5, "done": 0, "failed": 0}
+
+    for request in requests[2:]:
+        spider.request_handled(request)
+    # Every URL is parsed, the spider stays open while the articles wait for their storage
+    assert spider.frontier_outstanding == 0 and not spider.frontier_exhausted
+    for request in requests:
+        spider.complete(request)
+    assert len(spider.frontier_done) == 5
+
+    # The next idle reports them, and finds the frontier done
+    spider.spider_idle(spider)
+    assert spider.frontier.counts() == {"pending": 0, "leased": 0, "done": 5, "failed": 0}
+    assert crawler.stats.get_value("frontier/completed") == 5
+    spider.frontier.close()
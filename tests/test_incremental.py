@@ -0,0 +1,95 @@
+import sqlite3
+from typing import List
+
+import pytest
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse, Request
+from scrapy.spiders import Spider
+from scrapy.utils.test import get_crawler
+
+from benchmarks.database import CREATE_ARTICLES
+from scrahp import signals as scrahp_signals
+from scrahp.incremental import ValidatorStore
+from scrahp.items import Article
+from scrahp.middlewares import ScrahpDownloaderMiddleware, ScrahpSpiderMiddleware
+from scrahp.pipelines import SQLitePipeline
+
+ARTICLE = "https://www.bbc.com/news/articles/c1"
+DUPLICATE = "https://www.bbc.com/news/articles/c2"
+SECTION = "https://www.bbc.com/news"
+
+
+def stored_validators(path: str) -> List[str]:
+    with sqlite3.connect(path) as conn:
+        return [url for (url,) in conn.execute("SELECT url FROM validators ORDER BY url")]
+
+
+def test_validators_are_staged_until_committed(tmp_path) -> None:
+    path = str(tmp_path / "validators.db")
+    store = ValidatorStore(path)
+    store.open()
+    store.stage(ARTICLE, '"v1"', None, "hash", 100)
+    store.update_parse_time(ARTICLE, 0.5)
+    store.stage(DUPLICATE, '"v2"', None, "hash", 100)
+    store.discard(DUPLICATE)
+    store.close()
+    assert stored_validators(path) == []
+
+    store.open()
+    store.stage(ARTICLE, '"v1"', None, "hash", 100)
+    store.update_parse_time(ARTICLE, 0.5)
+    store.commit(ARTICLE)
+    store.close()
+    store.open()
+    validators = store.get(ARTICLE)
+    store.close()
+    assert validators is not None and validators.etag == '"v1"' and validators.parse_time == 0.5
+
+
+def test_middleware_commits_the_validators_of_stored_articles(tmp_path) -> None:
+    path = str(tmp_path / "validators.db")
+    crawler = get_crawler(Spider, {"INCREMENTAL_STORE_FILE": path})
+    spider = Spider("articles")
+    downloader = ScrahpDownloaderMiddleware.from_crawler(crawler)
+    downloader.spider_opened(spider)
+    responses = {}
+    for url in (ARTICLE, DUPLICATE, SECTION):
+        request = Request(url)
+        responses[url] = downloader.process_response(
+            request, HtmlResponse(url, body=b"<html></html>", headers={"ETag": url}, request=request), spider
+        )
+
+    # Section pages are committed once parsed, article pages once their article is stored
+    middleware = ScrahpSpiderMiddleware(crawler.stats)
+    list(middleware.process_spider_output(responses[SECTION], [Request(ARTICLE)], spider))
+    list(middleware.process_spider_output(responses[ARTICLE], [Article(url=ARTICLE)], spider))
+    list(middleware.process_spider_output(responses[DUPLICATE], [Article(url=DUPLICATE)], spider))
+    crawler.signals.send_catch_log(
+        signals.item_dropped, item=Article(url=DUPLICATE), response=responses[DUPLICATE], exception=DropItem(), spider=spider
+    )
+    crawler.signals.send_catch_log(scrahp_signals.articles_stored, urls=[ARTICLE], spider=spider)
+    downloader.spider_closed(spider)
+
+    assert stored_validators(path) == [SECTION, ARTICLE]
+
+
+@pytest.mark.parametrize("mode", ["sync", "batched"])
+def test_sqlite_pipeline_signals_committed_articles(tmp_path, monkeypatch: pytest.MonkeyPatch, mode: str) -> None:
+    from twisted.internet import reactor
+
+    monkeypatch.setattr(reactor, "callFromThread", lambda function, *args: function(*args))
+    database = str(tmp_path / "scrahp.db")
+    with sqlite3.connect(database) as conn:
+        conn.execute(CREATE_ARTICLES)
+    crawler = get_crawler(Spider, {"SQLITE_DB_FILE": database, "SQLITE_WRITER_MODE": mode})
+    stored: List[str] = []
+    crawler.signals.connect(lambda urls, spider: stored.extend(urls), signal=scrahp_signals.articles_stored, weak=False)
+    spider = Spider("articles")
+    pipeline = SQLitePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    pipeline.process_item(Article(title="Title", url=ARTICLE, author="Jane Doe", content="Content."), spider)
+    # Buffered, or inserted but not committed yet
+    assert stored == []
+    pipeline.close_spider(spider)
+    assert stored == [ARTICLE]
@@ -0,0 +1,33 @@
+import threading
+
+from scrapy.utils.test import get_crawler
+
+from scrahp.metrics import MetricsStatsCollector, render_prometheus
+
+
+def test_concurrent_increments_are_not_lost() -> None:
+    stats = MetricsStatsCollector(get_crawler())
+
+    def increment() -> None:
+        for _ in range(10000):
+            stats.inc_value("sqlite/rows_flushed")
+            stats.max_value("sqlite/flush_latency_max_ms", 1.0)
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats.get_value("sqlite/rows_flushed") == 40000
+
+
+def test_get_stats_is_a_snapshot() -> None:
+    stats = MetricsStatsCollector(get_crawler())
+    stats.set_value("items", 1)
+    snapshot = stats.get_stats()
+    stats.set_value("writer/new_key", 2)
+    assert snapshot == {"items": 1}
+
+    stats.observe("parse/page_seconds", 0.01)
+    text = render_prometheus("articles", snapshot, stats.get_histograms())
+    assert "scrahp_items" in text
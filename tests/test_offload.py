@@ -0,0 +1,22 @@
+from scrahp.offload import ParsePool, parse_article
+from scrahp.spiders.articles import ArticlesSpider
+
+PAGE = b"""<html><body>
+<h1>Rain expected</h1>
+<div class="ssrcss-68pt20-Text-TextContributorName">By JANE DOE</div>
+<div class="ssrcss-11r1m41-RichTextComponentWrapper"><p>Bring an umbrella.</p></div>
+</body></html>"""
+
+
+def test_pool_workers_are_not_forked_from_the_crawl_process() -> None:
+    pool = ParsePool(1)
+    pool.open(ArticlesSpider)
+    try:
+        assert pool.executor is not None
+        assert pool.executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        matches, article, _ = pool.executor.submit(parse_article, "https://www.bbc.com/news/articles/1", PAGE, "utf-8", None).result(timeout=60)
+    finally:
+        pool.close()
+    assert article["title"] == "Rain expected"
+    assert article["author"] == "Jane Doe"
+    assert matches == {"title": 0, "author": 0, "content": 0}
@@ -0,0 +1,67 @@
+import pytest
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from scrahp import signals as scrahp_signals
+from scrahp.items import Article, Url
+from scrahp.pipelines import UrlFilterPipeline, UrlPipeline
+from scrahp.spiders.stream import StreamSpider
+from scrahp.spiders.urls import UrlsSpider
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://www.bbc.com/news/articles/c1", "https://www.bbc.com/news/articles/c1"),
+        ("http://WWW.BBC.COM:80/news/articles/c1#comments", "https://www.bbc.com/news/articles/c1"),
+        ("www.bbc.com/news/articles/c1", "https://www.bbc.com/news/articles/c1"),
+        ("https://www.bbc.com/news?b=2&utm_source=x&a=1&at_medium=RSS&fbclid=y", "https://www.bbc.com/news?a=1&b=2"),
+        ("https://www.bbc.com", "https://www.bbc.com/"),
+        ("http://localhost:8765/news/a1.html", "http://localhost:8765/news/a1.html"),
+        # The RSS feeds link to bbc.co.uk, the section pages to bbc.com
+        ("https://www.bbc.co.uk/news/articles/c1?at_medium=RSS&at_campaign=KARANGA", "https://www.bbc.com/news/articles/c1"),
+        ("https://bbc.co.uk/news/articles/c1", "https://www.bbc.com/news/articles/c1"),
+        ("https://bbc.com/news/articles/c1", "https://www.bbc.com/news/articles/c1"),
+    ],
+)
+def test_canonicalize_url(url: str, expected: str) -> None:
+    assert UrlPipeline().canonicalize_url(url) == expected
+
+
+def test_stream_urls_are_seen_once_their_article_is_stored(tmp_path) -> None:
+    crawler = get_crawler(StreamSpider)
+    spider = StreamSpider.from_crawler(crawler)
+    stored, failed, dropped = (f"https://www.bbc.com/news/articles/c{i}" for i in range(3))
+    pipeline = UrlFilterPipeline.from_crawler(crawler)
+    assert pipeline.filter_file == "data/stream.bloom"
+    pipeline.filter_file = str(tmp_path / "stream.bloom")
+    pipeline.open_spider(spider)
+    for url in (stored, failed, dropped):
+        assert pipeline.process_item(Url(url=url), spider)
+
+    crawler.signals.send_catch_log(scrahp_signals.articles_stored, urls=[stored], spider=spider)
+    response = HtmlResponse(dropped, body=b"", request=Request(dropped))
+    crawler.signals.send_catch_log(signals.item_dropped, item=Article(url=dropped), response=response, exception=DropItem(), spider=spider)
+    pipeline.close_spider(spider)
+
+    # The next run fetches the article whose download failed again
+    pipeline.open_spider(spider)
+    for url in (stored, dropped):
+        with pytest.raises(DropItem):
+            pipeline.process_item(Url(url=url), spider)
+    assert pipeline.process_item(Url(url=failed), spider)
+    pipeline.close_spider(spider)
+
+
+def test_discovered_urls_are_seen_at_once(tmp_path) -> None:
+    crawler = get_crawler(UrlsSpider, {"URL_FILTER_FILE": str(tmp_path / "urls.bloom")})
+    spider = UrlsSpider.from_crawler(crawler)
+    pipeline = UrlFilterPipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    url = "https://www.bbc.com/news/articles/c1"
+    assert pipeline.process_item(Url(url=url), spider)
+    with pytest.raises(DropItem):
+        pipeline.process_item(Url(url=url), spider)
+    pipeline.close_spider(spider)
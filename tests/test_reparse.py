@@ -0,0 +1,44 @@
+import random
+import sqlite3
+
+from scrapy.settings import Settings
+
+from benchmarks.corpus import render_article, render_index
+from benchmarks.database import CREATE_ARTICLES
+from scrahp.archive import PageArchive
+from scrahp.reparse import reparse
+
+ARTICLE = "https://www.bbc.com/news/articles/c1"
+LEGACY_ARTICLE = "https://www.bbc.com/news/articles/c2"
+SECTION = "https://www.bbc.com/news"
+LEGACY_SECTION = "https://www.bbc.com/sport"
+
+
+def test_only_article_pages_are_reparsed(tmp_path) -> None:
+    rng = random.Random(0)
+    archive = PageArchive(directory=str(tmp_path / "pages"))
+    archive.open()
+    archive.put_page(ARTICLE, render_article(1, rng, page_bytes=0).encode(), "articles")
+    archive.put_page(LEGACY_ARTICLE, render_article(2, rng, page_bytes=0).encode(), "articles")
+    archive.put_page(SECTION, render_index([(ARTICLE, "Title")]).encode(), "urls")
+    archive.put_page(LEGACY_SECTION, render_index([(LEGACY_ARTICLE, "Title")], seed=1).encode(), "urls")
+    archive.close()
+    # Pages archived before the spider was recorded
+    with sqlite3.connect(str(tmp_path / "pages" / "index.db")) as conn:
+        conn.execute("UPDATE urls SET spider = NULL WHERE url IN (?, ?)", (LEGACY_ARTICLE, LEGACY_SECTION))
+
+    database = str(tmp_path / "scrahp.db")
+    with sqlite3.connect(database) as conn:
+        conn.execute(CREATE_ARTICLES)
+    settings = Settings(
+        {
+            "SQLITE_DB_FILE": database,
+            "JSONL_DIRECTORY": str(tmp_path / "data"),
+            "NEAR_DUPLICATE_INDEX_FILE": "",
+        }
+    )
+    counts = reparse(str(tmp_path / "pages"), None, workers=1, chunk_size=1, settings=settings)
+
+    assert counts == {"parsed": 2, "not_article": 1, "stored": 2}
+    with sqlite3.connect(database) as conn:
+        assert [url for (url,) in conn.execute("SELECT url FROM articles ORDER BY url")] == [ARTICLE, LEGACY_ARTICLE]
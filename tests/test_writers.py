@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+from typing import Any, List
+
+import pytest
+from twisted.internet import reactor
+
+from scrahp.writers import BatchingWriter, SQLiteBatchWriter
+
+ROWS = [("Title", f"https://www.bbc.com/news/articles/{i}", "Jane Doe", "Content") for i in range(3)]
+
+
+class RecordingWriter(BatchingWriter):
+    """
+    Writer keeping the records it writes, held back until ``release`` is set.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        super().__init__("recording-writer", batch_size=1, flush_interval=60.0, queue_size=queue_size)
+        self.release = threading.Event()
+        self.written: List[Any] = []
+
+    def write_batch(self, batch: List[Any]) -> None:
+        self.release.wait()
+        self.written.extend(batch)
+
+
+def articles_connection(path: str = ":memory:") -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("CREATE TABLE articles (title TEXT, url TEXT UNIQUE, author TEXT, content TEXT)")
+    return conn
+
+
+def stored_urls(conn: sqlite3.Connection) -> List[str]:
+    return [url for (url,) in conn.execute("SELECT url FROM articles ORDER BY url")]
+
+
+def test_batching_writer_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        BatchingWriter("writer", batch_size=1, flush_interval=1.0, queue_size=1)  # type: ignore[abstract]
+
+
+def test_failed_flush_is_retried() -> None:
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    writer = SQLiteBatchWriter(conn, max_retries=2)
+
+    # The table does not exist yet: the rows are kept for the next flush
+    writer.write_batch(ROWS[:2])
+    assert writer.failed == ROWS[:2]
+
+    conn.execute("CREATE TABLE articles (title TEXT, url TEXT UNIQUE, author TEXT, content TEXT)")
+    writer.write_batch(ROWS[2:])
+    assert writer.failed == []
+    assert writer.rows_written == 3
+    assert stored_urls(conn) == [row[1] for row in ROWS]
+
+
+def test_failed_flush_is_counted_once_dropped() -> None:
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    writer = SQLiteBatchWriter(conn, max_retries=1)
+
+    writer.write_batch(ROWS[:1])
+    writer.write_batch(ROWS[1:])
+    assert writer.failed == []
+    assert writer.rows_lost == 3
+
+
+def test_idle_tick_retries_failed_rows() -> None:
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    writer = SQLiteBatchWriter(conn)
+    writer.write_batch(ROWS)
+
+    # The tick following the failed flush does not retry it at once
+    writer.on_tick()
+    assert writer.failed_attempts == 1
+
+    conn.execute("CREATE TABLE articles (title TEXT, url TEXT UNIQUE, author TEXT, content TEXT)")
+    writer.on_tick()
+    assert writer.failed == []
+    assert len(stored_urls(conn)) == 3
+
+
+def test_writer_thread_flushes_on_close(tmp_path) -> None:
+    path = str(tmp_path / "scrahp.db")
+    articles_connection(path).close()
+    writer = SQLiteBatchWriter(sqlite3.connect(path, check_same_thread=False), batch_size=100, flush_interval=60.0)
+    writer.start()
+    for row in ROWS:
+        writer.put(row)
+    writer.close()
+
+    with sqlite3.connect(path) as conn:
+        assert stored_urls(conn) == [row[1] for row in ROWS]
+
+
+def test_offer_waits_in_order_without_blocking(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Fire the Deferreds at once instead of in a running reactor
+    monkeypatch.setattr(reactor, "callFromThread", lambda function, *args: function(*args))
+    writer = RecordingWriter(queue_size=1)
+    writer.start()
+
+    assert writer.offer(0) is None
+    deferreds = [writer.offer(record) for record in range(1, 5)]
+    # The writer thread holds record 0 and at most one record is queued, the others wait
+    assert all(deferred is not None for deferred in deferreds[1:])
+    assert not any(deferred.called for deferred in deferreds[1:] if deferred is not None)
+
+    writer.release.set()
+    writer.close()
+    assert writer.written == list(range(5))
+    assert all(deferred is None or deferred.called for deferred in deferreds)